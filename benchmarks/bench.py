@@ -0,0 +1,151 @@
+"""
+Benchmarks of the build hook against synthetic projects
+
+    python -m benchmarks --sizes 10 100 1000 5000 --json bench.json
+"""
+
+import argparse
+import copy
+import json
+import os
+import shutil
+import tempfile
+from statistics import mean, median
+from time import perf_counter
+from types import SimpleNamespace
+
+from benchmarks.project import ProjectSpec, generate
+from hatch_cython.config import parse_from_dict
+from hatch_cython.plugin import CythonBuildHook
+from hatch_cython.temp import setup_py
+from hatch_cython.utils import QuietApplication, cwd
+
+SIZES = (10, 100, 1000, 5000)
+
+
+def new_hook(root: str, config: dict, spec: ProjectSpec) -> CythonBuildHook:
+    # parsing consumes parts of the config
+    return CythonBuildHook(
+        root,
+        copy.deepcopy(config),
+        {},
+        SimpleNamespace(name=spec.name),
+        directory=os.path.join(root, "dist"),
+        target_name="wheel",
+        app=QuietApplication(),
+    )
+
+
+def timed(fn, repeat: int, setup=None) -> dict:
+    samples = []
+    for _ in range(repeat):
+        # setup is excluded from the measurement, and its result passed to fn
+        args = () if setup is None else (setup(),)
+        start = perf_counter()
+        fn(*args)
+        samples.append(perf_counter() - start)
+    return {"min": min(samples), "median": median(samples), "mean": mean(samples), "repeat": repeat}
+
+
+def bench_project(root: str, spec: ProjectSpec, *, repeat: int, build: bool, build_repeat: int) -> dict:
+    config = generate(root, spec)
+    results = {}
+    with cwd(root):
+        hook = new_hook(root, config, spec)
+        results["config"] = timed(
+            parse_from_dict,
+            repeat,
+            setup=lambda: SimpleNamespace(config=copy.deepcopy(config), app=hook.app),
+        )
+        results["hook"] = timed(lambda: new_hook(root, config, spec), repeat)
+        results["discovery"] = timed(
+            lambda fresh: fresh.grouped_included_files,
+            repeat,
+            setup=lambda: new_hook(root, config, spec),
+        )
+        results["templates"] = timed(hook.render_templates, repeat)
+
+        extensions = hook.extensions
+
+        def generate_setup():
+            setup_py(
+                *extensions,
+                options=hook.options,
+                sdist=False,
+                bundles=hook.bundles,
+                variants=hook.variants,
+            )
+
+        results["setup.py"] = timed(generate_setup, repeat)
+
+        if build:
+
+            def clean():
+                fresh = new_hook(root, config, spec)
+                fresh.clean([])
+                return fresh
+
+            def run_build(fresh: CythonBuildHook):
+                fresh.initialize("standard", {"artifacts": [], "force_include": {}})
+
+            results["full build"] = timed(run_build, build_repeat, setup=clean)
+            results["no-op build"] = timed(run_build, build_repeat, setup=lambda: new_hook(root, config, spec))
+    return results
+
+
+def print_results(spec: ProjectSpec, results: dict):
+    print(f"\n{spec.label}")  # noqa: T201
+    print(f"  {'phase':<14} {'min':>10} {'median':>10} {'mean':>10}")  # noqa: T201
+    for phase, r in results.items():
+        print(f"  {phase:<14} {r['min']:>9.4f}s {r['median']:>9.4f}s {r['mean']:>9.4f}s")  # noqa: T201
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(SIZES), help="module counts")
+    parser.add_argument("--depth", type=int, default=3, help="package tree depth")
+    parser.add_argument("--fanout", type=int, default=3, help="subpackages per package")
+    parser.add_argument("--pyx-ratio", type=float, default=0.5, help="share of .pyx modules")
+    parser.add_argument("--excludes", type=int, default=10, help="files.exclude patterns")
+    parser.add_argument("--templates", type=int, default=10, help="templates.index entries")
+    parser.add_argument("--repeat", type=int, default=5, help="runs of each discovery / config benchmark")
+    parser.add_argument(
+        "--build-max",
+        type=int,
+        default=100,
+        help="largest project built end to end; compiling thousands of modules takes a long time",
+    )
+    parser.add_argument("--build-repeat", type=int, default=1, help="runs of each end to end build")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--keep", help="generate the projects below this directory, and keep them")
+    args = parser.parse_args(argv)
+
+    out = []
+    for size in args.sizes:
+        spec = ProjectSpec(
+            modules=size,
+            depth=args.depth,
+            fanout=args.fanout,
+            pyx_ratio=args.pyx_ratio,
+            excludes=args.excludes,
+            templates=args.templates,
+        )
+        root = os.path.join(args.keep, f"project_{size}") if args.keep else tempfile.mkdtemp(prefix="hatch_cython_")
+        try:
+            results = bench_project(
+                os.path.realpath(root),
+                spec,
+                repeat=args.repeat,
+                build=size <= args.build_max,
+                build_repeat=args.build_repeat,
+            )
+        finally:
+            if not args.keep:
+                shutil.rmtree(root, ignore_errors=True)
+        print_results(spec, results)
+        out.append({"spec": vars(spec), "results": results})
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(out, f, indent=2)
+    return out
@@ -0,0 +1,122 @@
+"""
+Synthetic projects for benchmarking the build hook
+"""
+
+import os
+from dataclasses import dataclass
+from textwrap import dedent
+
+PYX = """
+def f_{i}(int n):
+    cdef int j, s = 0
+    for j in range(n):
+        s += j
+    return s
+"""
+
+PY = """
+def f_{i}(n):
+    s = 0
+    for j in range(n):
+        s += j
+    return s
+"""
+
+TEMPLATE = """
+{{{{for t in supported}}}}
+def g_{k}_{{{{t}}}}({{{{t}}}} v):
+    return v * 2
+{{{{endfor}}}}
+"""
+
+
+@dataclass
+class ProjectSpec:
+    # compiled modules, spread over the package tree
+    modules: int = 100
+    # nesting of the package tree & subpackages per package
+    depth: int = 3
+    fanout: int = 3
+    # share of `.pyx` modules, the others are `.py`
+    pyx_ratio: float = 0.5
+    # `files.exclude` patterns; one matches an excluded package, the others match nothing
+    excludes: int = 10
+    # `templates.index` entries, each with a templated module
+    templates: int = 10
+    name: str = "benchlib"
+
+    @property
+    def label(self) -> str:
+        return f"{self.modules} modules, depth {self.depth}, {self.excludes} excludes, {self.templates} templates"
+
+
+def packages(spec: ProjectSpec) -> list:
+    """Relative package directories, breadth first"""
+    tree = [[]]
+    level = [[]]
+    for _ in range(spec.depth):
+        level = [[*parent, f"p{n}"] for parent in level for n in range(spec.fanout)]
+        tree.extend(level)
+    return [os.path.join(*parts) if parts else "" for parts in tree]
+
+
+def write(file: str, content: str):
+    os.makedirs(os.path.dirname(file), exist_ok=True)
+    with open(file, "w", encoding="utf-8") as f:
+        f.write(content)
+
+
+def generate(root: str, spec: ProjectSpec) -> dict:
+    """Writes the project below `root`
+
+    Returns:
+        dict: the hook config
+    """
+    base = os.path.join(root, "src", spec.name)
+    dirs = packages(spec)
+    for d in dirs:
+        write(os.path.join(base, d, "__init__.py"), "")
+
+    pyx = round(spec.modules * spec.pyx_ratio)
+    for i in range(spec.modules):
+        ext, source = (".pyx", PYX) if i < pyx else (".py", PY)
+        write(os.path.join(base, dirs[i % len(dirs)], f"m{i}{ext}"), dedent(source.format(i=i)))
+
+    for k in range(spec.templates):
+        write(os.path.join(base, dirs[k % len(dirs)], f"tmpl_{k}.pyx.in"), dedent(TEMPLATE.format(k=k)))
+
+    write(os.path.join(base, "no_compile", "__init__.py"), "")
+    write(os.path.join(base, "no_compile", "skipped.py"), dedent(PY.format(i="skipped")))
+
+    write(
+        os.path.join(root, "pyproject.toml"),
+        dedent(f"""
+            [build-system]
+            requires = ["hatchling", "hatch-cython"]
+            build-backend = "hatchling.build"
+
+            [project]
+            name = "{spec.name}"
+            version = "0.0.1"
+            """).lstrip(),
+    )
+
+    return {
+        "options": {
+            "src": spec.name,
+            "files": {
+                "exclude": [
+                    {"matches": "*/no_compile/*"},
+                    *({"matches": f"*/unmatched_{n}/*"} for n in range(max(spec.excludes - 1, 0))),
+                ]
+            },
+            "templates": {
+                "index": [
+                    {"keyword": "global", "matches": "*"},
+                    *({"keyword": f"t{k}", "matches": f"*/tmpl_{k}.pyx.in"} for k in range(spec.templates)),
+                ],
+                "global": {"supported": ["int"]},
+                **{f"t{k}": {"supported": ["int", "long"]} for k in range(spec.templates)},
+            },
+        }
+    }
@@ -0,0 +1,32 @@
+import re
+from dataclasses import dataclass, field
+from typing import Optional
+
+from hatch_cython.types import ListStr
+from hatch_cython.utils import parse_user_glob
+
+
+@dataclass
+class AnnotationArgs:
+    enabled: bool = field(default=False)
+    # dotted module globs which must not gain python interaction lines
+    hot: ListStr = field(default_factory=list)
+    fail_on_regression: bool = field(default=True)
+    # a committed report to compare against. defaults to the last accepted build
+    baseline: Optional[str] = field(default=None)  # noqa: UP007
+    # report directory, relative to the project root. defaults to {cache_dir}/annotations
+    output: Optional[str] = field(default=None)  # noqa: UP007
+    top: int = field(default=10)
+
+    def __post_init__(self):
+        if isinstance(self.hot, str):
+            self.hot = [self.hot]
+
+    def is_hot(self, module: str) -> bool:
+        return any(re.fullmatch(parse_user_glob(h), module) for h in self.hot)
+
+
+def parse_annotations(val) -> AnnotationArgs:
+    if isinstance(val, dict):
+        return AnnotationArgs(**{"enabled": True, **val})
+    return AnnotationArgs(enabled=bool(val))
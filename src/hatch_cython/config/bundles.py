@@ -0,0 +1,86 @@
+import re
+from dataclasses import dataclass, field
+
+from hatch_cython.config.platform import PlatformBase
+from hatch_cython.constants import INIT
+from hatch_cython.types import DictT, ListStr, ListT, UnionT
+from hatch_cython.utils import parse_user_glob
+
+
+@dataclass
+class BundleGroup(PlatformBase):
+    name: str = None
+    matches: UnionT[str, ListStr] = field(default_factory=list)
+
+    def __post_init__(self):
+        super().__post_init__()
+        if not self.name:
+            msg = f"bundle groups require a module name (given {self.matches!r})"
+            raise ValueError(msg)
+        matches = self.matches
+        if isinstance(matches, str):
+            matches = [matches]
+        self.matches = [parse_user_glob(m) for m in matches]
+
+    def module_match(self, module: str) -> bool:
+        return any(re.fullmatch(patt, module) for patt in self.matches)
+
+
+@dataclass
+class BundleArgs:
+    packages: bool = field(default=False)
+    name: str = field(default="_bundle")
+    groups: ListT[BundleGroup] = field(default_factory=list)
+
+    def __post_init__(self):
+        self.groups = [BundleGroup(**g) if isinstance(g, dict) else g for g in self.groups]
+
+    @property
+    def enabled(self):
+        return self.packages or len(self.groups) > 0
+
+    def bundle_for(self, module: str) -> UnionT[str, None]:
+        if module.rsplit(".", 1)[-1] == INIT:
+            # packages must stay importable to reach the finder
+            return None
+        for group in self.groups:
+            if group.applies() and group.module_match(module):
+                return group.name
+        if self.packages and "." in module:
+            return f"{module.rsplit('.', 1)[0]}.{self.name}"
+        return None
+
+    def group(self, modules: ListStr) -> DictT[str, ListStr]:
+        """Assigns modules to bundles
+
+        Args:
+            modules (ListStr): dotted names of the extensions being built
+
+        Raises:
+            ValueError: two modules in a bundle share an init symbol (`PyInit_<last name>`)
+
+        Returns:
+            DictT[str, ListStr]: bundle name -> member module names. bundles of a single module are dropped
+        """
+        bundles: DictT[str, ListStr] = {}
+        for module in sorted(modules):
+            bundle = self.bundle_for(module)
+            if bundle is not None:
+                bundles.setdefault(bundle, []).append(module)
+
+        out = {}
+        for bundle, members in bundles.items():
+            if len(members) < 2:  # noqa: PLR2004
+                continue
+            seen: DictT[str, str] = {}
+            for member in members:
+                init = member.rsplit(".", 1)[-1]
+                if init in seen:
+                    msg = (
+                        f"{member} and {seen[init]} cannot share the bundle {bundle} "
+                        f"as both export PyInit_{init}. bundle them separately."
+                    )
+                    raise ValueError(msg)
+                seen[init] = member
+            out[bundle] = members
+        return out
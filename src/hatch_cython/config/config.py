@@ -1,32 +1,80 @@
 from collections.abc import Generator
 from dataclasses import asdict, dataclass, field
 from importlib import import_module
-from os import path
+from os import makedirs, path
 from typing import Optional
 
+from Cython import __version__ as __cythonversion__
 from hatch.utils.ci import running_in_ci
 from hatchling.builders.hooks.plugin.interface import BuildHookInterface
+from packaging.version import Version
 
+from hatch_cython.config.annotations import AnnotationArgs, parse_annotations
 from hatch_cython.config.autoimport import Autoimport
+from hatch_cython.config.bundles import BundleArgs
+from hatch_cython.config.costs import CostArgs, parse_costs
+from hatch_cython.config.daemon import DaemonArgs, parse_daemon
 from hatch_cython.config.defaults import brew_path, get_default_compile, get_default_link
+from hatch_cython.config.fallback import FallbackArgs, parse_fallback
 from hatch_cython.config.files import FileArgs
 from hatch_cython.config.flags import EnvFlags, parse_env_args
+from hatch_cython.config.helpers import HelperLibrary, parse_helpers
+from hatch_cython.config.history import HistoryArgs, parse_history
+from hatch_cython.config.hotspots import HotspotArgs, parse_hotspots
 from hatch_cython.config.includes import parse_includes
-from hatch_cython.config.macros import DefineMacros, parse_macros
+from hatch_cython.config.lto import LTO_MODES, LTO_OFF, lto_candidates
+from hatch_cython.config.macros import DefineMacros, merge_macros, parse_macros
+from hatch_cython.config.multiversion import MultiversionArgs
+from hatch_cython.config.overrides import ModuleOverride, parse_overrides
+from hatch_cython.config.pch import PchArgs, parse_pch
 from hatch_cython.config.platform import ListedArgs, PlatformArgs, parse_platform_args
+from hatch_cython.config.profiles import apply_profile
+from hatch_cython.config.remote import RemoteArgs, parse_remote
 from hatch_cython.config.templates import Templates, parse_template_kwds
-from hatch_cython.constants import DIRECTIVES, EXIST_TRIM, INCLUDE, LTPY311, MUST_UNIQUE
-from hatch_cython.types import CallableT, ListStr
+from hatch_cython.config.tiers import TierArgs, parse_tiers
+from hatch_cython.config.toolchain import MSVC, compiler_command, compiler_family, supports_flags
+from hatch_cython.constants import (
+    DIRECTIVES,
+    EXIST_TRIM,
+    INCLUDE,
+    LTPY311,
+    MSVC_OPTIMIZE,
+    MUST_UNIQUE,
+    SHARED_UTILITY,
+    SHARED_UTILITY_CYTHON,
+)
+from hatch_cython.reports.trace import span
+from hatch_cython.types import CallableT, DictT, ListStr, ListT, TupleT, UnionT
 
 # fields tracked by this plugin
 __known__ = frozenset(
     (
+        "lto",
         "src",
         "env",
         "files",
+        "fallback",
+        "hotspots",
+        "tiers",
+        "tuned",
+        "daemon",
+        "remote",
+        "pch",
+        "lazy",
+        "bundles",
+        "profile",
+        "overrides",
+        "costs",
+        "trace",
+        "history",
+        "annotations",
+        "multiversion",
         "includes",
         "libraries",
+        "helpers",
         "templates",
+        "cache_dir",
+        "shared_utility",
         "compile_py",
         "directives",
         "library_dirs",
@@ -41,7 +89,7 @@ __known__ = frozenset(
 
 
 def parse_from_dict(cls: BuildHookInterface):
-    given = cls.config.get("options", {})
+    given = apply_profile(cls.config.get("options", {}))
 
     passed = given.copy()
     kwargs = {}
@@ -51,6 +99,45 @@ def parse_from_dict(cls: BuildHookInterface):
             if key == "files":
                 val: dict
                 parsed: FileArgs = FileArgs(**val)
+            elif key == "fallback":
+                val: UnionT[bool, dict]
+                parsed: FallbackArgs = parse_fallback(val)
+            elif key == "hotspots":
+                val: UnionT[bool, str, dict]
+                parsed: HotspotArgs = parse_hotspots(val)
+            elif key == "tiers":
+                val: UnionT[bool, dict]
+                parsed: TierArgs = parse_tiers(val)
+            elif key == "daemon":
+                val: UnionT[bool, dict]
+                parsed: DaemonArgs = parse_daemon(val)
+            elif key == "remote":
+                val: UnionT[bool, list, dict]
+                parsed: RemoteArgs = parse_remote(val)
+            elif key == "pch":
+                val: UnionT[bool, list, dict]
+                parsed: PchArgs = parse_pch(val)
+            elif key == "bundles":
+                val: dict
+                parsed: BundleArgs = BundleArgs(**val)
+            elif key == "overrides":
+                val: list
+                parsed: ListT[ModuleOverride] = parse_overrides(val)
+            elif key == "annotations":
+                val: UnionT[bool, dict]
+                parsed: AnnotationArgs = parse_annotations(val)
+            elif key == "history":
+                val: UnionT[bool, dict]
+                parsed: HistoryArgs = parse_history(val)
+            elif key == "costs":
+                val: UnionT[bool, dict]
+                parsed: CostArgs = parse_costs(val)
+            elif key == "multiversion":
+                val: dict
+                parsed: MultiversionArgs = MultiversionArgs(**val)
+            elif key == "helpers":
+                val: list
+                parsed: ListT[HelperLibrary] = parse_helpers(val)
             elif key == "define_macros":
                 val: list
                 parsed: DefineMacros = parse_macros(val)
@@ -72,10 +159,11 @@ def parse_from_dict(cls: BuildHookInterface):
     for maybe_dep, spec in passed.copy().items():
         is_include = maybe_dep.startswith(INCLUDE)
         if is_include and spec:
-            cfg.resolve_pkg(
-                cls,
-                parse_includes(maybe_dep, spec),
-            )
+            with span("autoimport", package=maybe_dep):
+                cfg.resolve_pkg(
+                    cls,
+                    parse_includes(maybe_dep, spec),
+                )
             passed.pop(maybe_dep)
             continue
         elif is_include:
@@ -139,6 +227,9 @@ def parse_from_dict(cls: BuildHookInterface):
 class Config:
     src: Optional[str] = field(default=None)  # noqa: UP007
     files: FileArgs = field(default_factory=FileArgs)
+    fallback: FallbackArgs = field(default_factory=FallbackArgs)
+    hotspots: HotspotArgs = field(default_factory=HotspotArgs)
+    tiers: TierArgs = field(default_factory=TierArgs)
     includes: ListStr = field(default_factory=list)
     define_macros: DefineMacros = field(default_factory=list)
     libraries: ListStr = field(default_factory=list)
@@ -153,9 +244,40 @@ class Config:
     envflags: EnvFlags = field(default_factory=EnvFlags)
     compile_py: bool = field(default=True)
     templates: Templates = field(default_factory=Templates)
+    lto: str = field(default=LTO_OFF)
+    cache_dir: Optional[str] = field(default=None)  # noqa: UP007
+    bundles: BundleArgs = field(default_factory=BundleArgs)
+    shared_utility: UnionT[bool, str] = field(default=False)
+    multiversion: MultiversionArgs = field(default_factory=MultiversionArgs)
+    overrides: ListT[ModuleOverride] = field(default_factory=list)
+    tuned: UnionT[bool, str] = field(default=False)
+    profile: Optional[str] = field(default=None)  # noqa: UP007
+    annotations: AnnotationArgs = field(default_factory=AnnotationArgs)
+    costs: CostArgs = field(default_factory=CostArgs)
+    trace: UnionT[bool, str] = field(default=False)
+    history: HistoryArgs = field(default_factory=HistoryArgs)
+    daemon: DaemonArgs = field(default_factory=DaemonArgs)
+    remote: RemoteArgs = field(default_factory=RemoteArgs)
+    pch: PchArgs = field(default_factory=PchArgs)
+    lazy: bool = field(default=False)
+    helpers: ListT[HelperLibrary] = field(default_factory=list)
 
     def __post_init__(self):
         self.directives = {**DIRECTIVES, **self.directives}
+        if self.annotations.enabled:
+            self.cythonize_kwargs = {"annotate": True, **self.cythonize_kwargs}
+        if self.lto not in LTO_MODES:
+            msg = f"lto = '{self.lto}' is invalid. must be one of {LTO_MODES!r}"
+            raise ValueError(msg)
+
+    @property
+    def instrument(self) -> bool:
+        # build events feed the cost report, the trace & the build history
+        return self.costs.enabled or bool(self.trace) or self.history.enabled
+
+    @property
+    def annotate(self) -> bool:
+        return bool(self.cythonize_kwargs.get("annotate"))
 
     @property
     def compile_args_for_platform(self):
@@ -230,12 +352,127 @@ class Config:
             else:
                 cls.app.display_warning(f"{im.pkg}.{im.required_call} is invalid")
 
+    def resolve_lto(self, cls: BuildHookInterface, cache_dir: str):
+        if self.lto == LTO_OFF:
+            return
+        command = compiler_command(self.envflags.env)
+        family = compiler_family(command)
+        for comp, link in lto_candidates(self.lto, family, cache_dir):
+            # msvc is not invocable outside of a developer prompt, so we trust it
+            if family == MSVC or supports_flags(command, comp, link, env=self.envflags.env):
+                makedirs(cache_dir, exist_ok=True)
+                self.compile_args.extend(comp)
+                self.extra_link_args.extend(link)
+                cls.app.display_info(f"lto ({self.lto}, {family}): {[*comp, *link]!r}")
+                return
+        cls.app.display_warning(
+            f"lto = '{self.lto}' is not supported by {' '.join(command)} ({family}), building without lto"
+        )
+
+    def resolve_shared_utility(
+        self,
+        cls: BuildHookInterface,
+        package: str,
+        cache_dir: str,
+    ) -> UnionT[TupleT[str, str], None]:
+        if not self.shared_utility:
+            return None
+        if Version(__cythonversion__) < Version(SHARED_UTILITY_CYTHON):
+            cls.app.display_warning(
+                f"shared_utility requires Cython >= {SHARED_UTILITY_CYTHON} (found {__cythonversion__}), "
+                "each extension will embed its own utility code"
+            )
+            return None
+        name = self.shared_utility if isinstance(self.shared_utility, str) else f"{package}.{SHARED_UTILITY}"
+        makedirs(cache_dir, exist_ok=True)
+        # cython names the generated module after the file
+        return name, path.join(cache_dir, f"{name.rsplit('.', 1)[-1]}.c")
+
+    def extension_args(self, ext: dict) -> dict:
+        """Merges the optimization tier's args & the overrides matching any of the extension's files
+        into its arguments
+
+        Args:
+            ext (dict): ExtensionArg
+
+        Returns:
+            dict: ExtensionArg, with per-extension arguments set if any override applies
+        """
+        matched = [o for o in self.overrides if o.applies() and any(o.file_match(f) for f in ext["files"])]
+        tier_args = self.tiers.args(self.tiers.tier(ext["name"])[0]) if self.tiers.enabled else []
+        if not matched and not tier_args:
+            return ext
+        compile_args = [*self.compile_args, *tier_args]
+        link_args = [*self.extra_link_args]
+        directives = {}
+        for override in matched:
+            # later args win for flags in MUST_UNIQUE, e.g. -O3 replaces -O2
+            compile_args.extend(override.compile_args)
+            link_args.extend(override.extra_link_args)
+            directives.update(override.directives)
+        out = {
+            **ext,
+            "extra_compile_args": self._arg_impl(compile_args),
+            "extra_link_args": self._arg_impl(link_args),
+            "define_macros": merge_macros(self.define_macros, *(o.define_macros for o in matched)),
+        }
+        if directives:
+            out["directives"] = {**self.directives, **directives}
+        return out
+
+    def unify_bundles(self, extensions: ListT[dict], bundles: DictT[str, ListStr]) -> ListStr:
+        """Gives the members of each bundle the same compile & link args, as a bundle is built with one set.
+        Where members resolve a flag of MUST_UNIQUE differently (e.g. -O3 & -O2), the last member's applies
+
+        Args:
+            extensions (ListT[dict]): ExtensionArgs, updated in place
+            bundles (DictT[str, ListStr]): bundle -> member modules
+
+        Returns:
+            ListStr: the conflicts, to report
+        """
+        conflicts = []
+        defaults = {
+            "extra_compile_args": self.compile_args_for_platform,
+            "extra_link_args": self.compile_links_for_platform,
+        }
+        for bundle, names in bundles.items():
+            members = [ex for ex in extensions if ex["name"] in names]
+            for key, default in defaults.items():
+                args = {ex["name"]: ex.get(key, default) for ex in members}
+                merged = self._arg_impl([arg for member in args.values() for arg in member])
+                for unique in MUST_UNIQUE:
+                    values = {
+                        name: next((a for a in member if a.startswith(unique)), None) for name, member in args.items()
+                    }
+                    if len(set(values.values())) > 1:
+                        given = ", ".join(f"{name} {value or '(none)'}" for name, value in values.items())
+                        chosen = next((a for a in merged if a.startswith(unique)), None)
+                        conflicts.append(
+                            f"bundle {bundle} builds its members with one {unique}: {given}; using {chosen}"
+                        )
+                for ex in members:
+                    ex[key] = merged
+        return conflicts
+
+    def helper_build_info(self, helper: HelperLibrary, sources: ListStr, depends: ListStr) -> dict:
+        """build_clib arguments of the helper library, compiled like the extensions it is linked into"""
+        return {
+            "sources": sources,
+            "include_dirs": [*self.includes, *helper.include_dirs],
+            "macros": merge_macros(self.define_macros, helper.define_macros),
+            "cflags": self._arg_impl([*self.compile_args, *helper.compile_args]),
+            "obj_deps": {"": depends},
+        }
+
     def _arg_impl(self, target: ListedArgs):
         args = {"any": []}
 
         def with_argvalue(arg: str):
             # be careful with e.g. -Ox flags
             matched = list(filter(lambda s: arg.startswith(s), MUST_UNIQUE))
+            if not matched and arg in MSVC_OPTIMIZE:
+                matched = ["-O"]
             if len(matched):
                 m = matched[0]
                 args[m] = arg.split(" ")
@@ -262,7 +499,8 @@ class Config:
 
         # side effect
         list(map(flush, args.values()))
-        return list({*flat})
+        # ordered, so the same configuration gives the same commands & argument digests
+        return list(dict.fromkeys(flat))
 
     def asdict(self):
         d = asdict(self)
@@ -0,0 +1,16 @@
+from dataclasses import dataclass, field
+from typing import Optional
+
+
+@dataclass
+class CostArgs:
+    enabled: bool = field(default=False)
+    # report directory, relative to the project root. defaults to {cache_dir}/costs
+    output: Optional[str] = field(default=None)  # noqa: UP007
+    top: int = field(default=10)
+
+
+def parse_costs(val) -> CostArgs:
+    if isinstance(val, dict):
+        return CostArgs(**{"enabled": True, **val})
+    return CostArgs(enabled=bool(val))
@@ -0,0 +1,21 @@
+from dataclasses import dataclass, field
+
+
+@dataclass
+class DaemonArgs:
+    enabled: bool = field(default=False)
+    # seconds without requests before the daemon exits
+    idle_timeout: int = field(default=900)
+    # start a daemon when none serves the project
+    autostart: bool = field(default=True)
+
+    def __post_init__(self):
+        if self.idle_timeout < 1:
+            msg = "daemon.idle_timeout must be at least 1"
+            raise ValueError(msg)
+
+
+def parse_daemon(val) -> DaemonArgs:
+    if isinstance(val, dict):
+        return DaemonArgs(**{"enabled": True, **val})
+    return DaemonArgs(enabled=bool(val))
@@ -0,0 +1,105 @@
+import hashlib
+import os
+from dataclasses import dataclass, field
+
+from hatch_cython.speedups import ModuleSpeedup, read_speedups
+from hatch_cython.types import DictT, ListStr, ListT, TupleT
+
+HEADER = """\
+# Modules shipped as pure python, as compiling them does not pay off at runtime.
+# Generated by hatch-cython from measured speedups; review & commit this file.
+# Lines may be added or removed by hand; set fallback.update = false to stop regeneration.
+"""
+DIGEST = "# speedups: "
+
+
+@dataclass
+class FallbackArgs:
+    enabled: bool = field(default=False)
+    # measured speedups, as written by `python -m hatch_cython.speedups`. relative to the project root
+    speedups: str = field(default=os.path.join(".hatch", "cython", "speedups.json"))
+    # the generated exclude list, relative to the project root
+    file: str = field(default="cython-fallback.txt")
+    # compiled modules are kept when the low end of their speedup's confidence interval exceeds this
+    min_speedup: float = field(default=1.0)
+    # regenerate the list when the measured speedups change, else only read it
+    update: bool = field(default=True)
+
+
+def parse_fallback(val) -> FallbackArgs:
+    if isinstance(val, dict):
+        return FallbackArgs(**{"enabled": True, **val})
+    return FallbackArgs(enabled=bool(val))
+
+
+def select_fallback(results: ListT[ModuleSpeedup], min_speedup: float) -> DictT[str, str]:
+    """Measured modules which do not pay off, with the measurement as the note
+
+    Returns:
+        DictT[str, str]: module -> note
+    """
+    return {
+        r.module: f"{r.speedup:.2f}x [{r.low:.2f}x, {r.high:.2f}x] {r.verdict}"
+        for r in results
+        # modules which were not imported from extensions were not measured
+        if r.compiled and r.low <= min_speedup
+    }
+
+
+def read_fallback(file: str) -> TupleT[str, DictT[str, str]]:
+    """Reads the exclude list
+
+    Returns:
+        TupleT[str, DictT[str, str]]: (digest of the speedups it was generated from, module -> note)
+    """
+    digest = ""
+    modules = {}
+    if not os.path.exists(file):
+        return digest, modules
+    with open(file, encoding="utf-8") as f:
+        for line in f:
+            if line.startswith(DIGEST):
+                digest = line[len(DIGEST) :].strip()
+                continue
+            module, _, note = line.partition("#")
+            module = module.strip()
+            if module:
+                modules[module] = note.strip()
+    return digest, modules
+
+
+def write_fallback(file: str, digest: str, modules: DictT[str, str]):
+    os.makedirs(os.path.dirname(os.path.abspath(file)), exist_ok=True)
+    width = max((len(m) for m in modules), default=0)
+    with open(file, "w", encoding="utf-8") as f:
+        f.write(HEADER)
+        f.write(f"{DIGEST}{digest}\n")
+        for module in sorted(modules):
+            note = modules[module]
+            f.write(f"{module:<{width}}  # {note}\n" if note else f"{module}\n")
+
+
+def update_fallback(args: FallbackArgs, root: str) -> TupleT[ListStr, ListStr, ListStr]:
+    """Regenerates the exclude list from new speedups. Modules which were not measured again keep
+    their entry, so the selection only changes with new measurements.
+
+    Returns:
+        TupleT[ListStr, ListStr, ListStr]: (modules falling back, added, removed)
+    """
+    file = os.path.join(root, args.file)
+    speedups = os.path.join(root, args.speedups)
+    digest, modules = read_fallback(file)
+    if not args.update or not os.path.exists(speedups):
+        return sorted(modules), [], []
+
+    with open(speedups, "rb") as f:
+        current = hashlib.sha256(f.read()).hexdigest()
+    if current == digest:
+        return sorted(modules), [], []
+
+    results = read_speedups(speedups)
+    measured = {r.module for r in results}
+    selected = {m: note for m, note in modules.items() if m not in measured}
+    selected.update(select_fallback(results, args.min_speedup))
+    write_fallback(file, current, selected)
+    return sorted(selected), sorted(set(selected) - set(modules)), sorted(set(modules) - set(selected))
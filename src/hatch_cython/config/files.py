@@ -1,10 +1,25 @@
+import os
 import re
 from dataclasses import dataclass, field
+from fnmatch import fnmatchcase
 
 from hatch_cython.config.platform import PlatformBase
-from hatch_cython.types import DictT, ListT, UnionT
+from hatch_cython.types import DictT, ListStr, ListT, Set, TupleT, UnionT
 from hatch_cython.utils import parse_user_glob
 
+# comma separated module patterns, taking precedence over `files.only`
+ONLY_ENV = "HATCH_CYTHON_ONLY"
+
+
+# sources a module is compiled from; the .c Cython generates from them is not one
+SOURCE_SUFFIXES = ("py", "pyx")
+
+
+def module_glob(module: str, base: str, suffixes: UnionT[TupleT[str, ...], None] = None) -> str:
+    # the module's sources & artifacts, or those of the package's __init__; only the sources given `suffixes`
+    suffix = f"({'|'.join(suffixes)})$" if suffixes else "*"
+    return f"{base}/{module.replace('.', '/')}(/__init__)?\\.{suffix}"
+
 
 @dataclass
 class OptExclude(PlatformBase):
@@ -21,6 +36,10 @@ class FileArgs:
     targets: ListT[UnionT[str, OptInclude]] = field(default_factory=list)
     exclude: ListT[UnionT[str, OptExclude]] = field(default_factory=list)
     aliases: DictT[str, str] = field(default_factory=dict)
+    # module patterns to compile; the other modules keep the extensions built before
+    only: ListStr = field(default_factory=list)
+    # modules shipped as pure python, see `fall_back`
+    fallback: ListStr = field(default_factory=list, init=False)
 
     def __post_init__(self):
         rep = {}
@@ -36,6 +55,36 @@ class FileArgs:
             *[OptInclude(matches=s) for s in self.targets if isinstance(s, str)],
         ]
 
+    def fall_back(self, modules: ListStr, base: str):
+        """Excludes the modules, a package by its `__init__`, from compilation
+
+        Args:
+            modules (ListStr): dotted module names
+            base (str): directory containing the top level package, e.g. `./src`
+        """
+        self.fallback.extend(modules)
+        self.exclude.extend(OptExclude(matches=module_glob(module, base)) for module in modules)
+
+    def compile_only(self, modules: ListStr, base: str):
+        """Makes the modules explicit targets. Without other targets, `.pyx` sources remain targets,
+        as they have no python fallback
+
+        Args:
+            modules (ListStr): dotted module names
+            base (str): directory containing the top level package, e.g. `./src`
+        """
+        if not self.explicit_targets:
+            self.targets.append(OptInclude(matches=f"{base}/*.pyx"))
+        self.targets.extend(OptInclude(matches=module_glob(module, base, SOURCE_SUFFIXES)) for module in modules)
+
+    def select(self, modules: ListStr) -> UnionT[Set[str], None]:
+        """Modules matching the `only` patterns, e.g. `pkg.kernels.*`. None when the build is not restricted"""
+        env = os.environ.get(ONLY_ENV)
+        patterns = [p.strip() for p in env.split(",") if p.strip()] if env is not None else self.only
+        if not patterns:
+            return None
+        return {module for module in modules if any(fnmatchcase(module, p) for p in patterns)}
+
     @property
     def explicit_targets(self):
         return len(self.targets) > 0
@@ -0,0 +1,42 @@
+import re
+from dataclasses import dataclass, field
+
+from hatch_cython.config.macros import DefineMacros, parse_macros
+from hatch_cython.config.platform import ListedArgs, PlatformArgs, parse_to_plat
+from hatch_cython.types import ListStr, ListT
+
+CXX_SUFFIXES = (".cc", ".cpp", ".cxx", ".C")
+
+
+@dataclass
+class HelperLibrary:
+    """C/C++ sources shared by several extensions, compiled once into a static library linked into each"""
+
+    name: str
+    # globs relative to the project root
+    sources: ListStr = field(default_factory=list)
+    # headers the sources include; a change recompiles the library
+    depends: ListStr = field(default_factory=list)
+    include_dirs: ListStr = field(default_factory=list)
+    compile_args: ListedArgs = field(default_factory=list)
+    define_macros: DefineMacros = field(default_factory=list)
+
+    def __post_init__(self):
+        if not re.fullmatch(r"[A-Za-z_][\w.-]*", self.name):
+            msg = f"helpers: {self.name!r} is not a valid library name"
+            raise ValueError(msg)
+        if not self.sources:
+            msg = f"helpers: {self.name} has no sources"
+            raise ValueError(msg)
+        for i, arg in enumerate(self.compile_args):
+            parse_to_plat(PlatformArgs, arg, self.compile_args, i, require_argform=False)
+        self.define_macros = parse_macros(self.define_macros)
+
+
+def parse_helpers(val: ListT[dict]) -> ListT[HelperLibrary]:
+    helpers = [HelperLibrary(**h) if isinstance(h, dict) else h for h in val]
+    names = [h.name for h in helpers]
+    if len(set(names)) != len(names):
+        msg = "helpers: library names must be unique"
+        raise ValueError(msg)
+    return helpers
@@ -0,0 +1,26 @@
+from dataclasses import dataclass, field
+
+
+@dataclass
+class HistoryArgs:
+    enabled: bool = field(default=False)
+    # the baseline is the median of this many previous builds of the same kind, on the same machine class
+    builds: int = field(default=10)
+    # builds required before the gate applies
+    min_builds: int = field(default=3)
+    # relative increase over the baseline, e.g. 0.25 == 25% slower
+    max_time_increase: float = field(default=0.25)
+    max_size_increase: float = field(default=0.05)
+    # fail the build on regression, else warn
+    fail: bool = field(default=False)
+
+    def __post_init__(self):
+        if self.builds < 1 or self.min_builds < 1:
+            msg = "history.builds & history.min_builds must be at least 1"
+            raise ValueError(msg)
+
+
+def parse_history(val) -> HistoryArgs:
+    if isinstance(val, dict):
+        return HistoryArgs(**{"enabled": True, **val})
+    return HistoryArgs(enabled=bool(val))
@@ -0,0 +1,129 @@
+import os
+import pstats
+import re
+from dataclasses import dataclass, field
+from typing import Optional
+
+from hatch_cython.types import DictT, ListStr, TupleT
+
+PSTATS = "pstats"
+COLLAPSED = "collapsed"
+COLLAPSED_SUFFIXES = (".txt", ".collapsed", ".folded")
+
+# py-spy frames read `function (path/to/file.py:12)`
+PYSPY_FRAME = re.compile(r"\((?P<file>[^()]+?)(?::\d+)?\)\s*$")
+
+
+def profile_format(profile: Optional[str], fmt: Optional[str], option: str) -> Optional[str]:  # noqa: UP007
+    if fmt is None and profile:
+        return COLLAPSED if profile.endswith(COLLAPSED_SUFFIXES) else PSTATS
+    if fmt not in (None, PSTATS, COLLAPSED):
+        msg = f"{option}.format must be {PSTATS!r} or {COLLAPSED!r}"
+        raise ValueError(msg)
+    return fmt
+
+
+@dataclass
+class HotspotArgs:
+    enabled: bool = field(default=False)
+    # cProfile output (`.pstats`, `.prof`) or collapsed stacks (`.txt`, `.collapsed`, `.folded`, e.g. `py-spy record
+    # --format raw`), relative to the project root
+    profile: Optional[str] = field(default=None)  # noqa: UP007
+    # "pstats" | "collapsed". defaults to the profile's suffix
+    format: Optional[str] = field(default=None)  # noqa: UP007
+    # share of the package's self time the compiled modules must cover
+    coverage: float = field(default=0.95)
+
+    def __post_init__(self):
+        if self.enabled and not self.profile:
+            msg = "hotspots.profile is required"
+            raise ValueError(msg)
+        if not 0 < self.coverage <= 1:
+            msg = "hotspots.coverage must be within (0, 1]"
+            raise ValueError(msg)
+        self.format = profile_format(self.profile, self.format, "hotspots")
+
+
+def parse_hotspots(val) -> HotspotArgs:
+    if isinstance(val, str):
+        return HotspotArgs(enabled=True, profile=val)
+    if isinstance(val, dict):
+        return HotspotArgs(**{"enabled": True, **val})
+    return HotspotArgs(enabled=bool(val))
+
+
+def read_pstats(profile: str) -> DictT[str, float]:
+    """Self time (tottime) per source file"""
+    times = {}
+    for (file, _, _), (_, _, tottime, _, _) in pstats.Stats(profile).stats.items():
+        times[file] = times.get(file, 0.0) + tottime
+    return times
+
+
+def read_collapsed(profile: str) -> DictT[str, float]:
+    """Samples of the innermost frame per source file, from `frame;frame;... count` lines"""
+    times = {}
+    with open(profile, encoding="utf-8") as f:
+        for line in f:
+            stack, _, count = line.rstrip().rpartition(" ")
+            if not stack or not count.isdigit():
+                continue
+            leaf = stack.rpartition(";")[2]
+            matched = PYSPY_FRAME.search(leaf)
+            # otherwise `path/to/file.py:function:line`, as written by austin
+            file = matched.group("file") if matched else leaf.partition(":")[0]
+            times[file] = times.get(file, 0.0) + int(count)
+    return times
+
+
+def file_module(file: str, package: str) -> Optional[str]:  # noqa: UP007
+    """Dotted module name of a profiled file within `package`, wherever the package was installed"""
+    parts = re.split(r"[\\/]", file)
+    if package not in parts[:-1]:
+        return None
+    parts = parts[len(parts) - 1 - parts[::-1].index(package) :]
+    name = parts[-1].split(".", 1)[0]
+    if not name.isidentifier():
+        return None
+    parts[-1] = name
+    if name == "__init__":
+        parts.pop()
+    return ".".join(parts)
+
+
+def module_times(times: DictT[str, float], package: str) -> DictT[str, float]:
+    modules = {}
+    for file, seconds in times.items():
+        module = file_module(file, package)
+        if module is not None:
+            modules[module] = modules.get(module, 0.0) + seconds
+    return modules
+
+
+def select_hot(modules: DictT[str, float], coverage: float) -> TupleT[ListStr, float]:
+    """The fewest modules, by descending self time, covering `coverage` of the total
+
+    Returns:
+        TupleT[ListStr, float]: (modules, share of the total they cover)
+    """
+    total = sum(modules.values())
+    if not total:
+        return [], 0.0
+    selected = []
+    covered = 0.0
+    for module, seconds in sorted(modules.items(), key=lambda m: (-m[1], m[0])):
+        if covered >= coverage * total:
+            break
+        selected.append(module)
+        covered += seconds
+    return selected, covered / total
+
+
+def profiled_modules(profile: str, fmt: str, package: str) -> DictT[str, float]:
+    """Self time per module of `package`"""
+    times = read_collapsed(profile) if fmt == COLLAPSED else read_pstats(profile)
+    return module_times(times, package)
+
+
+def hot_modules(args: HotspotArgs, root: str, package: str) -> TupleT[ListStr, float]:
+    return select_hot(profiled_modules(os.path.join(root, args.profile), args.format, package), args.coverage)
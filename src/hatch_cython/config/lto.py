@@ -0,0 +1,52 @@
+from hatch_cython.config.toolchain import CLANG, GCC, MSVC
+from hatch_cython.types import ListStr, ListT, TupleT
+from hatch_cython.utils import plat
+
+LTO_OFF = "off"
+LTO_THIN = "thin"
+LTO_FULL = "full"
+LTO_MODES = (LTO_OFF, LTO_THIN, LTO_FULL)
+
+LtoArgs = TupleT[ListStr, ListStr]
+"""
+(compile_args, link_args)
+"""
+
+
+def thinlto_cache_arg(cache_dir: str) -> str:
+    if plat() == "darwin":
+        # ld64
+        return f"-Wl,-cache_path_lto,{cache_dir}"
+    # lld / gold
+    return f"-Wl,--thinlto-cache-dir={cache_dir}"
+
+
+def lto_candidates(mode: str, family: str, cache_dir: str) -> ListT[LtoArgs]:
+    """Lists the (compile, link) argument sets for an lto mode, in order of preference
+
+    Args:
+        mode (str): one of `off`, `thin`, `full`
+        family (str): compiler family (see `hatch_cython.config.toolchain`)
+        cache_dir (str): directory for the ThinLTO object cache
+
+    Returns:
+        ListT[LtoArgs]: candidate flag sets; empty if the mode is off or the compiler is unknown
+    """
+    if mode == LTO_OFF:
+        return []
+    if family == GCC:
+        # gcc has no thin variant - its partitioned whole program lto is the closest equivalent
+        return [
+            (["-flto=auto"], ["-flto=auto"]),
+            (["-flto"], ["-flto"]),
+        ]
+    if family == CLANG:
+        if mode == LTO_THIN:
+            return [
+                (["-flto=thin"], ["-flto=thin", thinlto_cache_arg(cache_dir)]),
+                (["-flto=thin"], ["-flto=thin"]),
+            ]
+        return [(["-flto"], ["-flto"])]
+    if family == MSVC:
+        return [(["/GL"], ["/LTCG"])]
+    return []
@@ -29,3 +29,12 @@ def parse_macros(define: ListT[ListT[str]]) -> DefineMacros:
         else:
             define[i] = (inst[0], inst[1])
     return define
+
+
+def merge_macros(*defines: DefineMacros) -> DefineMacros:
+    """Merges macro definitions, where later definitions of the same name take priority"""
+    merged = {}
+    for define in defines:
+        for name, value in define:
+            merged[name] = value
+    return list(merged.items())
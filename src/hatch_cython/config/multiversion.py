@@ -0,0 +1,66 @@
+import re
+from dataclasses import dataclass, field
+
+from hatch_cython.config.platform import PlatformBase
+from hatch_cython.constants import INIT, ISA_LEVELS, X86_64
+from hatch_cython.types import DictT, ListStr, ListT, TupleT, UnionT
+from hatch_cython.utils import aarch, parse_user_glob, plat
+
+
+@dataclass
+class MultiversionTarget(PlatformBase):
+    matches: str = field(default="*")
+
+    def module_match(self, module: str) -> bool:
+        return re.fullmatch(parse_user_glob(self.matches), module) is not None
+
+
+@dataclass
+class MultiversionArgs:
+    levels: ListStr = field(default_factory=list)
+    targets: ListT[UnionT[str, MultiversionTarget]] = field(default_factory=list)
+
+    def __post_init__(self):
+        for level in self.levels:
+            if level not in ISA_LEVELS:
+                msg = f"multiversion level '{level}' is invalid. must be one of {list(ISA_LEVELS)!r}"
+                raise ValueError(msg)
+        # best first, so that the loader takes the first supported variant
+        self.levels = sorted(set(self.levels), key=list(ISA_LEVELS).index, reverse=True)
+        self.targets = [
+            *[MultiversionTarget(**d) for d in self.targets if isinstance(d, dict)],
+            *[MultiversionTarget(matches=s) for s in self.targets if isinstance(s, str)],
+        ]
+
+    @property
+    def enabled(self):
+        # -march levels are a gcc / clang x86-64 concept
+        return len(self.levels) > 0 and aarch() in X86_64 and plat() != "windows"
+
+    def wanted(self, module: str) -> bool:
+        targets = [t for t in self.targets if t.applies()]
+        if not targets:
+            return True
+        return any(t.module_match(module) for t in targets)
+
+    def variants(self, modules: ListStr) -> DictT[str, ListT[TupleT[str, str]]]:
+        """Lists the variants to build for each module
+
+        Args:
+            modules (ListStr): dotted names of the extensions being built
+
+        Returns:
+            DictT[str, ListT[TupleT[str, str]]]: module -> [(level, variant module name), ...], best level first
+        """
+        if not self.enabled:
+            return {}
+        return {
+            module: [(level, variant_name(module, level)) for level in self.levels]
+            for module in sorted(modules)
+            # packages are resolved before the finder is consulted
+            if module.rsplit(".", 1)[-1] != INIT and self.wanted(module)
+        }
+
+
+def variant_name(module: str, level: str) -> str:
+    return f"{module}__{level.replace('-', '_')}"
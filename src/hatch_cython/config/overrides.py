@@ -0,0 +1,50 @@
+import json
+import re
+from dataclasses import dataclass, field
+
+from hatch_cython.config.files import module_glob
+from hatch_cython.config.macros import DefineMacros, parse_macros
+from hatch_cython.config.platform import ListedArgs, PlatformArgs, PlatformBase, parse_to_plat
+from hatch_cython.types import DictT, ListStr, ListT, UnionT
+from hatch_cython.utils import parse_user_glob
+
+
+@dataclass
+class ModuleOverride(PlatformBase):
+    matches: UnionT[str, ListStr] = field(default="*")
+    compile_args: ListedArgs = field(default_factory=list)
+    extra_link_args: ListedArgs = field(default_factory=list)
+    define_macros: DefineMacros = field(default_factory=list)
+    directives: dict = field(default_factory=dict)
+
+    def __post_init__(self):
+        super().__post_init__()
+        matches = self.matches
+        if isinstance(matches, str):
+            matches = [matches]
+        self.matches = [parse_user_glob(m) for m in matches]
+        for args in (self.compile_args, self.extra_link_args):
+            for i, arg in enumerate(args):
+                parse_to_plat(PlatformArgs, arg, args, i, require_argform=False)
+        self.define_macros = parse_macros(self.define_macros)
+
+    def __hash__(self) -> int:
+        return hash(tuple(self.matches))
+
+    def file_match(self, file: str) -> bool:
+        # same semantics as files.exclude
+        return any(re.match(patt, file, re.IGNORECASE) for patt in self.matches)
+
+
+def parse_overrides(overrides: ListT[dict]) -> ListT[ModuleOverride]:
+    return [ModuleOverride(**o) if isinstance(o, dict) else o for o in overrides]
+
+
+def read_tuned(file: str) -> DictT[str, dict]:
+    """module -> directives, as written by `python -m hatch_cython.tune`"""
+    with open(file, encoding="utf-8") as f:
+        return json.load(f).get("directives", {})
+
+
+def tuned_overrides(file: str, base: str) -> ListT[ModuleOverride]:
+    return [ModuleOverride(matches=module_glob(m, base), directives=d) for m, d in read_tuned(file).items()]
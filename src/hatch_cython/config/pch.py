@@ -0,0 +1,32 @@
+from dataclasses import dataclass, field
+
+from hatch_cython.types import ListStr
+
+
+@dataclass
+class PchArgs:
+    enabled: bool = field(default=False)
+    # included after Python.h by every Cython generated unit, e.g. numpy/arrayobject.h
+    headers: ListStr = field(default_factory=list)
+    # included by C++ units only, e.g. arrow/python/pyarrow.h
+    cxx_headers: ListStr = field(default_factory=list)
+
+    def __post_init__(self):
+        for header in [*self.headers, *self.cxx_headers]:
+            if not header or header.startswith(("<", '"')) or "\n" in header:
+                msg = f"pch: headers are given as they are included, e.g. numpy/arrayobject.h, got {header!r}"
+                raise ValueError(msg)
+
+    def for_language(self, language: str) -> ListStr:
+        headers = ["Python.h", *self.headers]
+        if language == "c++":
+            headers += self.cxx_headers
+        return list(dict.fromkeys(headers))
+
+
+def parse_pch(val) -> PchArgs:
+    if isinstance(val, dict):
+        return PchArgs(**{"enabled": True, **val})
+    if isinstance(val, list):
+        return PchArgs(enabled=True, headers=val)
+    return PchArgs(enabled=bool(val))
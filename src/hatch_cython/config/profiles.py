@@ -0,0 +1,94 @@
+from os import environ
+
+from hatch_cython.constants import POSIX_CORE
+from hatch_cython.types import DictT, UnionT
+
+PROFILE_ENV = "HATCH_CYTHON_PROFILE"
+
+__profiles__: DictT[str, dict] = {
+    # maximum speed, no runtime checks
+    "fast": {
+        "directives": {
+            "boundscheck": False,
+            "wraparound": False,
+            "initializedcheck": False,
+            "nonecheck": False,
+            "cdivision": True,
+        },
+        "compile_args": [
+            {"arg": "-O3", "platforms": POSIX_CORE},
+            {"arg": "/O2", "platforms": ["windows"]},
+        ],
+        "define_macros": [["NDEBUG"]],
+    },
+    # debuggable, with every runtime check enabled
+    "debug": {
+        "directives": {
+            "boundscheck": True,
+            "wraparound": True,
+            "initializedcheck": True,
+            "nonecheck": True,
+            "overflowcheck": True,
+            "cdivision": False,
+        },
+        "compile_args": [
+            {"arg": "-O0", "platforms": POSIX_CORE},
+            {"arg": "-g", "platforms": POSIX_CORE},
+            # python's CFLAGS define NDEBUG, which would strip asserts
+            {"arg": "-UNDEBUG", "platforms": POSIX_CORE},
+            {"arg": "/Od", "platforms": ["windows"]},
+            {"arg": "/Zi", "platforms": ["windows"]},
+        ],
+        "extra_link_args": [
+            {"arg": "/DEBUG", "platforms": ["windows"]},
+        ],
+    },
+    # instrumented for cProfile & line tracers (coverage, line_profiler)
+    "profile": {
+        "directives": {
+            "profile": True,
+            "linetrace": True,
+        },
+        "define_macros": [["CYTHON_TRACE", "1"], ["CYTHON_TRACE_NOGIL", "1"]],
+    },
+}
+
+
+def selected_profile(options: dict) -> UnionT[str, None]:
+    return environ.get(PROFILE_ENV) or options.get("profile")
+
+
+def apply_profile(options: dict) -> dict:
+    """Overlays the selected profile onto the hook options. lists are extended, tables merged and
+    other values replaced. user defined profiles take priority over the built in profiles
+
+    Args:
+        options (dict): `options` of the build hook config
+
+    Raises:
+        ValueError: the profile is not defined
+
+    Returns:
+        dict: options, without `profile` & `profiles`
+    """
+    out = {k: v for k, v in options.items() if k not in ("profile", "profiles")}
+    name = selected_profile(options)
+    if not name:
+        return out
+
+    overlay = options.get("profiles", {}).get(name, __profiles__.get(name))
+    if overlay is None:
+        known = sorted({*__profiles__, *options.get("profiles", {})})
+        msg = f"profile '{name}' is not defined. known profiles are {known!r}"
+        raise ValueError(msg)
+
+    for key, value in overlay.items():
+        current = out.get(key)
+        if isinstance(current, list) and isinstance(value, list):
+            out[key] = [*current, *value]
+        elif isinstance(current, dict) and isinstance(value, dict):
+            out[key] = {**current, **value}
+        else:
+            out[key] = value
+    out["profile"] = name
+    return out
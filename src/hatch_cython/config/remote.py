@@ -0,0 +1,49 @@
+import os
+from dataclasses import dataclass, field
+
+from hatch_cython.types import ListStr, TupleT
+
+# comma separated host:port of the compile workers, taking precedence over the configured ones
+WORKERS_ENV = "HATCH_CYTHON_WORKERS"
+DEFAULT_PORT = 3632
+
+
+def parse_address(val: str) -> TupleT[str, int]:
+    host, sep, port = val.strip().rpartition(":")
+    if not sep:
+        return val.strip(), DEFAULT_PORT
+    if not port.isdigit():
+        msg = f"compile workers are given as host:port, got {val!r}"
+        raise ValueError(msg)
+    return host.strip("[]"), int(port)
+
+
+@dataclass
+class RemoteArgs:
+    enabled: bool = field(default=False)
+    # host:port of each worker, see `python -m hatch_cython.remote worker`
+    workers: ListStr = field(default_factory=list)
+    # seconds a worker may take for one translation unit before it is compiled locally
+    timeout: int = field(default=120)
+
+    def __post_init__(self):
+        if self.timeout < 1:
+            msg = "remote.timeout must be at least 1"
+            raise ValueError(msg)
+        for worker in self.workers:
+            parse_address(worker)
+
+    @property
+    def addresses(self) -> ListStr:
+        env = os.environ.get(WORKERS_ENV)
+        if env is not None:
+            return [w.strip() for w in env.split(",") if w.strip()]
+        return self.workers
+
+
+def parse_remote(val) -> RemoteArgs:
+    if isinstance(val, dict):
+        return RemoteArgs(**{"enabled": True, **val})
+    if isinstance(val, list):
+        return RemoteArgs(enabled=True, workers=val)
+    return RemoteArgs(enabled=bool(val))
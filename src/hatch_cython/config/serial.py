@@ -0,0 +1,49 @@
+"""
+Options as json, for the build daemon to return resolved options. Only the classes of hatch_cython.config are
+rebuilt, from their attributes, so decoding a message runs no code of its sender.
+"""
+
+import importlib
+
+CLASS = "__hatch_cython_class__"
+TUPLE = "__hatch_cython_tuple__"
+PACKAGE = "hatch_cython.config"
+
+
+def encode(value):
+    if isinstance(value, (str, int, float, bool, type(None))):
+        return value
+    if isinstance(value, tuple):
+        return {TUPLE: [encode(v) for v in value]}
+    if isinstance(value, list):
+        return [encode(v) for v in value]
+    if isinstance(value, dict):
+        if not all(isinstance(k, str) for k in value):
+            msg = f"keys of {value!r} are not str"
+            raise TypeError(msg)
+        return {k: encode(v) for k, v in value.items()}
+    cls = type(value)
+    if not cls.__module__.startswith(f"{PACKAGE}."):
+        msg = f"{cls.__module__}.{cls.__qualname__} is not an option"
+        raise TypeError(msg)
+    return {CLASS: f"{cls.__module__}:{cls.__qualname__}", "attrs": encode(vars(value))}
+
+
+def decode(value):
+    if isinstance(value, list):
+        return [decode(v) for v in value]
+    if not isinstance(value, dict):
+        return value
+    if TUPLE in value:
+        return tuple(decode(v) for v in value[TUPLE])
+    if CLASS not in value:
+        return {k: decode(v) for k, v in value.items()}
+    module, _, name = value[CLASS].partition(":")
+    if not module.startswith(f"{PACKAGE}.") or "." in name:
+        msg = f"{value[CLASS]} is not an option"
+        raise TypeError(msg)
+    cls = getattr(importlib.import_module(module), name)
+    # as the options were, without running __init__ or the validations of __post_init__ again
+    obj = cls.__new__(cls)
+    obj.__dict__.update(decode(value["attrs"]))
+    return obj
@@ -0,0 +1,178 @@
+import hashlib
+import json
+import os
+import shutil
+import sys
+from dataclasses import asdict, dataclass, field
+from glob import glob
+from importlib.machinery import EXTENSION_SUFFIXES
+
+from hatch_cython.types import DictT, ListStr, ListT, TupleT, UnionT
+
+SHARD_ENV = "HATCH_CYTHON_SHARD"
+SHARD_DIR_ENV = "HATCH_CYTHON_SHARD_DIR"
+MERGE_ENV = "HATCH_CYTHON_MERGE"
+MANIFEST = "manifest.json"
+
+
+@dataclass
+class Shard:
+    # 1-based
+    index: int
+    count: int
+
+    def __post_init__(self):
+        if not 1 <= self.index <= self.count:
+            msg = f"{SHARD_ENV} must be i/N with 1 <= i <= N, got {self.index}/{self.count}"
+            raise ValueError(msg)
+
+    @property
+    def name(self) -> str:
+        return f"shard-{self.index}-of-{self.count}"
+
+
+def parse_shard(val: UnionT[str, None]) -> UnionT[Shard, None]:
+    if not val:
+        return None
+    index, sep, count = val.partition("/")
+    if not sep or not index.strip().isdigit() or not count.strip().isdigit():
+        msg = f"{SHARD_ENV} must be i/N, e.g. 2/4, got {val!r}"
+        raise ValueError(msg)
+    return Shard(int(index), int(count))
+
+
+@dataclass
+class ShardManifest:
+    index: int
+    count: int
+    # identifies the sources, resolved extension arguments & interpreter the shard was built from
+    fingerprint: str
+    # identifies the split, which every shard must agree on
+    assignment: str
+    modules: ListStr = field(default_factory=list)
+    # built files, relative to the shard directory & the package base
+    files: ListStr = field(default_factory=list)
+
+
+def read_costs(costs_json: str) -> DictT[str, float]:
+    """module -> seconds, from a costs report of a previous build"""
+    if not os.path.exists(costs_json):
+        return {}
+    with open(costs_json, encoding="utf-8") as f:
+        return {row["module"]: row["total_seconds"] for row in json.load(f).get("extensions", [])}
+
+
+def estimate_costs(units: DictT[str, ListStr], sizes: DictT[str, int], known: DictT[str, float]) -> DictT[str, float]:
+    """
+    Cost of each unit (a module, or a bundle of them): the seconds of the previous build where known, else
+    source size scaled by the median seconds per byte of the known modules
+    """
+    rates = sorted(known[m] / sizes[m] for m in known if sizes.get(m))
+    rate = rates[len(rates) // 2] if rates else 1.0
+    return {
+        unit: sum(known[m] if m in known else sizes.get(m, 0) * rate for m in modules)
+        for unit, modules in units.items()
+    }
+
+
+def assign(costs: DictT[str, float], count: int) -> ListT[ListStr]:
+    """
+    Splits the units into `count` shards of similar total cost: the costliest unit goes to the least loaded
+    shard first. Deterministic for the same costs, so each node computes the same split
+    """
+    shards: ListT[ListStr] = [[] for _ in range(count)]
+    loads = [0.0] * count
+    for unit in sorted(costs, key=lambda u: (-costs[u], u)):
+        i = min(range(count), key=lambda s: (loads[s], s))
+        shards[i].append(unit)
+        loads[i] += costs[unit]
+    return [sorted(s) for s in shards]
+
+
+def digest(value) -> str:
+    return hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def fingerprint(extensions: ListT[dict], root: str) -> str:
+    # discovery order varies between processes
+    extensions = sorted(({**ex, "files": sorted(ex["files"])} for ex in extensions), key=lambda ex: ex["name"])
+    sources = {}
+    for ex in extensions:
+        for f in ex["files"]:
+            with open(os.path.join(root, f), "rb") as fh:
+                sources[f] = hashlib.sha256(fh.read()).hexdigest()
+    python = [sys.implementation.cache_tag, EXTENSION_SUFFIXES[0]]
+    return digest({"extensions": extensions, "sources": sources, "python": python})
+
+
+def export_shard(build_lib: str, output: str, manifest: ShardManifest) -> str:
+    """Copies the extensions built into `build_lib` to the shard directory within `output`"""
+    shard_dir = os.path.join(output, Shard(manifest.index, manifest.count).name)
+    if os.path.exists(shard_dir):
+        shutil.rmtree(shard_dir)
+    for f in glob(os.path.join(build_lib, "**", "*"), recursive=True):
+        if os.path.isfile(f):
+            relative = os.path.relpath(f, build_lib)
+            os.makedirs(os.path.dirname(os.path.join(shard_dir, relative)), exist_ok=True)
+            shutil.copy2(f, os.path.join(shard_dir, relative))
+            manifest.files.append(relative.replace(os.sep, "/"))
+    manifest.files.sort()
+    with open(os.path.join(shard_dir, MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(asdict(manifest), f, indent=2)
+    return shard_dir
+
+
+def read_shards(directory: str) -> ListT[TupleT[str, ShardManifest]]:
+    shards = []
+    for manifest in sorted(glob(os.path.join(directory, "*", MANIFEST))):
+        with open(manifest, encoding="utf-8") as f:
+            shards.append((os.path.dirname(manifest), ShardManifest(**json.load(f))))
+    return shards
+
+
+def merge_shards(directory: str, base: str, modules: ListStr, expected: str) -> ListStr:
+    """
+    Copies the extensions of all shards within `directory` into the package tree at `base`
+
+    Args:
+        modules: names of the extensions the shards must cover
+        expected: fingerprint of this build
+
+    Returns:
+        ListStr: the copied files
+    """
+    shards = read_shards(directory)
+    if not shards:
+        msg = f"no shards in {directory}"
+        raise ValueError(msg)
+    counts = {m.count for _, m in shards}
+    assignments = {m.assignment for _, m in shards}
+    if len(counts) != 1 or len(assignments) != 1:
+        msg = "the shards were split differently; build them from the same sources & costs"
+        raise ValueError(msg)
+    missing = sorted(set(range(1, counts.pop() + 1)) - {m.index for _, m in shards})
+    if missing:
+        msg = f"missing shards {', '.join(map(str, missing))} in {directory}"
+        raise ValueError(msg)
+    stale = [m.index for _, m in shards if m.fingerprint != expected]
+    if stale:
+        msg = f"shards {', '.join(map(str, stale))} were built from other sources, options or python"
+        raise ValueError(msg)
+    uncovered = sorted(set(modules).difference(*(m.modules for _, m in shards)))
+    if uncovered:
+        msg = f"no shard built {', '.join(uncovered)}"
+        raise ValueError(msg)
+
+    copied = []
+    for shard_dir, manifest in shards:
+        for relative in manifest.files:
+            target = os.path.join(base, relative)
+            if target in copied:
+                # e.g. the shared utility module, built by every shard
+                continue
+            os.makedirs(os.path.dirname(target) or ".", exist_ok=True)
+            temp = f"{target}.tmp"
+            shutil.copy2(os.path.join(shard_dir, relative), temp)
+            os.replace(temp, target)
+            copied.append(target)
+    return copied
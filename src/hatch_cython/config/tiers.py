@@ -0,0 +1,93 @@
+import re
+from dataclasses import dataclass, field
+from typing import Optional
+
+from hatch_cython.config.hotspots import profile_format, select_hot
+from hatch_cython.config.platform import ListedArgs, PlatformArgs, parse_to_plat
+from hatch_cython.constants import POSIX_CORE
+from hatch_cython.types import DictT, ListStr, TupleT
+from hatch_cython.utils import parse_user_glob
+
+HOT = "hot"
+DEFAULT = "default"
+COLD = "cold"
+
+
+def hot_args() -> ListedArgs:
+    return [
+        PlatformArgs(arg="-O3", platforms=POSIX_CORE),
+        PlatformArgs(arg="/O2", platforms=["windows"]),
+    ]
+
+
+def cold_args() -> ListedArgs:
+    return [
+        PlatformArgs(arg="-Os", platforms=POSIX_CORE),
+        PlatformArgs(arg="/O1", platforms=["windows"]),
+    ]
+
+
+@dataclass
+class TierArgs:
+    enabled: bool = field(default=False)
+    # dotted module globs
+    hot: ListStr = field(default_factory=list)
+    cold: ListStr = field(default_factory=list)
+    # a runtime profile, as for hotspots: the modules covering `coverage` of its self time are hot,
+    # other profiled modules keep the default args & modules missing from it are cold
+    profile: Optional[str] = field(default=None)  # noqa: UP007
+    format: Optional[str] = field(default=None)  # noqa: UP007
+    coverage: float = field(default=0.8)
+    # appended to compile_args, so the -O flag replaces the default -O2. per-module overrides apply after these
+    hot_args: ListedArgs = field(default_factory=hot_args)
+    cold_args: ListedArgs = field(default_factory=cold_args)
+    # set by the hook from the profile: module -> self time
+    profiled: DictT[str, float] = field(default_factory=dict, init=False)
+    profiled_hot: ListStr = field(default_factory=list, init=False)
+
+    def __post_init__(self):
+        if not 0 < self.coverage <= 1:
+            msg = "tiers.coverage must be within (0, 1]"
+            raise ValueError(msg)
+        self.format = profile_format(self.profile, self.format, "tiers")
+        for args in (self.hot_args, self.cold_args):
+            for i, arg in enumerate(args):
+                parse_to_plat(PlatformArgs, arg, args, i, require_argform=False)
+
+    def use_profile(self, profiled: DictT[str, float]):
+        self.profiled = profiled
+        self.profiled_hot, _ = select_hot(profiled, self.coverage)
+
+    def tier(self, module: str) -> TupleT[str, str]:
+        """Tier of the extension module
+
+        Returns:
+            TupleT[str, str]: (tier, reason)
+        """
+        if module.endswith(".__init__"):
+            module = module[: -len(".__init__")]
+        if any(re.fullmatch(parse_user_glob(g), module) for g in self.hot):
+            return HOT, "listed"
+        if any(re.fullmatch(parse_user_glob(g), module) for g in self.cold):
+            return COLD, "listed"
+        if self.profile is None:
+            return DEFAULT, "not listed"
+        total = sum(self.profiled.values())
+        if module in self.profiled_hot:
+            return HOT, f"{self.profiled[module] / total:.1%} of profiled time"
+        if module in self.profiled:
+            return DEFAULT, f"{self.profiled[module] / total:.1%} of profiled time"
+        return COLD, "not profiled"
+
+    def args(self, tier: str) -> ListedArgs:
+        if tier == HOT:
+            return self.hot_args
+        if tier == COLD:
+            return self.cold_args
+        return []
+
+
+def parse_tiers(val) -> TierArgs:
+    if isinstance(val, dict):
+        return TierArgs(**{"enabled": True, **val})
+    return TierArgs(enabled=bool(val))
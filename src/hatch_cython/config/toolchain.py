@@ -0,0 +1,79 @@
+import os
+import shlex
+import subprocess
+import sysconfig
+from subprocess import CalledProcessError, check_output
+from tempfile import TemporaryDirectory
+
+from hatch_cython.types import ListStr, UnionT
+from hatch_cython.utils import plat
+
+GCC = "gcc"
+CLANG = "clang"
+MSVC = "msvc"
+UNKNOWN = "unknown"
+
+PROBE_SOURCE = "int main(void) { return 0; }\n"
+
+
+def compiler_command(env: dict) -> ListStr:
+    """Resolves the C compiler setuptools will invoke, honouring the `CC` override in `env`
+
+    Args:
+        env (dict): environment passed to the build subprocess
+
+    Returns:
+        ListStr: the compiler command, split into arguments
+    """
+    cc = env.get("CC") or sysconfig.get_config_var("CC") or "cc"
+    return shlex.split(cc)
+
+
+def compiler_family(command: ListStr) -> str:
+    if plat() == "windows":
+        return MSVC
+    try:
+        # no user input outside of the configured compiler - S603 is false positive
+        out = check_output([*command, "--version"], stderr=subprocess.STDOUT)  # noqa: S603
+    except (CalledProcessError, FileNotFoundError, PermissionError):
+        return UNKNOWN
+    version = out.decode(errors="replace").lower()
+    if "clang" in version:
+        return CLANG
+    if "gcc" in version or "free software foundation" in version:
+        return GCC
+    return UNKNOWN
+
+
+def supports_flags(
+    command: ListStr,
+    compile_args: ListStr,
+    link_args: UnionT[ListStr, None] = None,
+    env: UnionT[dict, None] = None,
+    *,
+    source: str = PROBE_SOURCE,
+    suffix: str = ".c",
+) -> bool:
+    """Compiles & links a trivial program with the given flags to check the toolchain accepts them
+
+    Returns:
+        bool: True if the compiler (and linker) exited cleanly
+    """
+    if link_args is None:
+        link_args = []
+    with TemporaryDirectory() as temp:
+        src = os.path.join(temp, f"probe{suffix}")
+        out = os.path.join(temp, "probe")
+        with open(src, "w", encoding="utf-8") as f:
+            f.write(source)
+        try:
+            proc = subprocess.run(  # noqa: S603, PLW1510
+                [*command, *compile_args, *link_args, src, "-o", out],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                env=env,
+                cwd=temp,
+            )
+        except (FileNotFoundError, PermissionError):
+            return False
+        return proc.returncode == 0
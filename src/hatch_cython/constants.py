@@ -4,6 +4,7 @@ NORM_GLOB = r"([^\s]*)"
 UAST = "${U_AST}"
 EXIST_TRIM = 2
 ANON = "anon"
+INIT = "__init__"
 INCLUDE = "include_"
 OPTIMIZE = "-O2"
 DIRECTIVES = {
@@ -12,6 +13,22 @@ DIRECTIVES = {
 }
 LTPY311 = "python_version < '3.11'"
 MUST_UNIQUE = ["-O", "-arch", "-march"]
+# msvc optimization levels, which replace an -O level, as msvc takes either prefix
+MSVC_OPTIMIZE = ["/O1", "/O2", "/Od", "/Ox"]
+SHARED_UTILITY = "_cyutility"
+SHARED_UTILITY_CYTHON = "3.1"
+# directives written by `python -m hatch_cython.tune`
+TUNED = "cython-tuned.json"
+X86_64 = ("x86_64", "amd64")
+# flags as reported by /proc/cpuinfo, see https://gitlab.com/x86-psABIs/x86-64-ABI
+_ISA_V2 = ["cx16", "lahf_lm", "popcnt", "sse4_1", "sse4_2", "ssse3"]
+_ISA_V3 = [*_ISA_V2, "abm", "avx", "avx2", "bmi1", "bmi2", "f16c", "fma", "movbe", "xsave"]
+_ISA_V4 = [*_ISA_V3, "avx512bw", "avx512cd", "avx512dq", "avx512f", "avx512vl"]
+ISA_LEVELS = {
+    "x86-64-v2": _ISA_V2,
+    "x86-64-v3": _ISA_V3,
+    "x86-64-v4": _ISA_V4,
+}
 POSIX_CORE: ListT[CorePlatforms] = ["darwin", "linux"]
 
 precompiled_extensions: Set[str] = {
@@ -0,0 +1,468 @@
+"""
+Build daemon keeping Cython, setuptools & the compiler toolchain imported between builds. Each request runs the
+generated setup.py in a child forked from the warm daemon, so builds share no state but skip interpreter startup
+& imports. The daemon also keeps the resolved options & discovered files of each project, resolved again only
+when the files they came from change. posix only; the hook falls back to a subprocess when the daemon is
+unavailable.
+
+    python -m hatch_cython.daemon start|stop|status [--cache-dir .hatch/cython]
+"""
+
+import argparse
+import contextlib
+import hashlib
+import importlib
+import json
+import os
+import runpy
+import socket
+import stat
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+import traceback
+from glob import glob
+
+from Cython import __version__ as cython_version
+
+# a module, as it imports this one back
+from hatch_cython import plugin
+from hatch_cython.__about__ import __version__
+from hatch_cython.config.daemon import DaemonArgs
+from hatch_cython.config.serial import decode, encode
+from hatch_cython.config.shards import digest
+from hatch_cython.filewatch import watcher
+from hatch_cython.types import DictT, ListStr, ListT, Set, TupleT, UnionT
+from hatch_cython.utils import RecordingApplication, cwd
+
+CACHE_DIR = os.path.join(".hatch", "cython")
+# modules imported once by the daemon; forked builds find them in sys.modules
+WARM = (
+    "Cython.Build",
+    "Cython.Build.Dependencies",
+    "Cython.Compiler.Main",
+    "Cython.Compiler.Pipeline",
+    "Cython.Compiler.ParseTreeTransforms",
+    "Cython.Compiler.Optimize",
+    "Cython.Compiler.Code",
+    "setuptools",
+    "setuptools.command.build_ext",
+    "hatch_cython.reports.costs",
+)
+# projects whose options are kept, least recently used first
+RESOLVED_LIMIT = 8
+# set in the daemon, whose own hooks resolve their options rather than ask the daemon
+SERVING = False
+
+
+def supported() -> bool:
+    return hasattr(socket, "AF_UNIX") and hasattr(os, "fork")
+
+
+def serving() -> bool:
+    return SERVING
+
+
+def fingerprint() -> str:
+    """Identifies the code a daemon runs; a daemon serving other code refuses the request and exits"""
+    package = os.path.dirname(os.path.abspath(__file__))
+    sources = sorted(glob(os.path.join(package, "**", "*.py"), recursive=True))
+    mtime = max((os.stat(s).st_mtime_ns for s in sources), default=0)
+    return f"{__version__}-{cython_version}-{sys.executable}-{mtime}"
+
+
+def socket_path(cache_dir: str) -> str:
+    # unix socket paths are limited to ~100 bytes, so the socket lives in a directory of the user's own rather than
+    # the cache dir, keyed by cache dir & interpreter; isolated build environments get daemons of their own
+    key = hashlib.sha256(f"{os.path.realpath(cache_dir)}\0{sys.executable}".encode()).hexdigest()[:16]
+    runtime = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime and os.path.isdir(runtime):
+        return os.path.join(runtime, "hatch-cython", f"{key}.sock")
+    return os.path.join(tempfile.gettempdir(), f"hatch-cython-{os.getuid()}", f"{key}.sock")
+
+
+def private(path: str) -> bool:
+    """Whether only this user can bind `path`, i.e. its directory is theirs & writable by no one else"""
+    try:
+        directory = os.lstat(os.path.dirname(path))
+    except OSError:
+        return False
+    return (
+        stat.S_ISDIR(directory.st_mode)
+        and directory.st_uid == os.getuid()
+        and not directory.st_mode & (stat.S_IWGRP | stat.S_IWOTH)
+    )
+
+
+def peer_uid(conn: socket.socket) -> UnionT[int, None]:
+    """The user of the process at the other end of `conn`, where the platform tells"""
+    if not hasattr(socket, "SO_PEERCRED"):
+        return None
+    creds = conn.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i"))
+    _, uid, _ = struct.unpack("3i", creds)
+    return uid
+
+
+def send(conn: socket.socket, message: dict):
+    conn.sendall(json.dumps(message).encode() + b"\n")
+
+
+def receive(conn: socket.socket) -> UnionT[dict, None]:
+    data = b""
+    while not data.endswith(b"\n"):
+        chunk = conn.recv(65536)
+        if not chunk:
+            return None
+        data += chunk
+    return json.loads(data)
+
+
+def run_child(request: dict, output: int) -> int:
+    """Runs setup.py in the forked child, as `python setup.py ...` would, writing its output to the fd `output`"""
+    os.dup2(output, 1)
+    os.dup2(output, 2)
+    os.chdir(request["cwd"])
+    os.environ.clear()
+    os.environ.update(request["env"])
+    setup_file, *args = request["argv"]
+    sys.argv = [setup_file, *args]
+    sys.path[0] = os.path.dirname(os.path.abspath(setup_file))
+    code = 0
+    try:
+        runpy.run_path(setup_file, run_name="__main__")
+    except SystemExit as e:
+        code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+        if not isinstance(e.code, (int, type(None))):
+            print(e.code, file=sys.stderr)  # noqa: T201
+    except BaseException:
+        traceback.print_exc()
+        code = 1
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+    return code
+
+
+def mtimes(files: ListStr) -> DictT[str, UnionT[int, None]]:
+    return {f: os.stat(f).st_mtime_ns if os.path.exists(f) else None for f in files}
+
+
+def site_stamp() -> DictT[str, UnionT[int, None]]:
+    # installing or upgrading a package changes its site dir, e.g. the include dir of an autoimport
+    return mtimes([p for p in sys.path if p and os.path.isdir(p)])
+
+
+@contextlib.contextmanager
+def environ(env: dict):
+    previous = dict(os.environ)
+    os.environ.clear()
+    os.environ.update(env)
+    try:
+        yield
+    finally:
+        os.environ.clear()
+        os.environ.update(previous)
+
+
+class Resolved:
+    """The options of one project & configuration, and the files discovered with them"""
+
+    def __init__(self, hook, app: RecordingApplication):
+        self.hook = hook
+        self.app = app
+        self.options_messages = list(app.messages)
+        # the options are resolved from these files, e.g. the tuned directives or the fallback list
+        self.inputs = mtimes(hook.option_inputs())
+        # adding, removing or renaming a source changes the discovered files; editing one does not
+        self.watch = watcher([(os.path.realpath(hook.project_dir), True)])
+        self.files: UnionT[ListStr, None] = None
+        self.files_messages = []
+        self.discovered: Set[str] = set()
+
+    @property
+    def messages(self) -> ListT[TupleT[str, str]]:
+        return [*self.options_messages, *self.files_messages]
+
+    def stale(self) -> bool:
+        return mtimes(list(self.inputs)) != self.inputs
+
+    def discovery_changed(self) -> bool:
+        changed = self.watch.changes(0)
+        if changed is None:
+            return True
+        suffixes = {*self.hook.precompiled_extensions, ".py", ".pxd"}
+        return any(
+            os.path.splitext(path)[1] in suffixes
+            and os.path.exists(path) != (os.path.realpath(path) in self.discovered)
+            for path in changed
+        )
+
+    def discover(self):
+        self.app.messages.clear()
+        self.files = self.hook.included_files
+        self.files_messages = list(self.app.messages)
+        self.discovered = {os.path.realpath(f) for f in self.files}
+
+    def close(self):
+        self.watch.close()
+
+
+RESOLVED: DictT[str, Resolved] = {}
+
+
+def resolve_project(request: dict) -> dict:
+    """The options & discovered files of the project, as the hook of the request's build would resolve them"""
+    root = request["root"]
+    key = digest([root, request["config"], request["target"], request["env"], site_stamp()])
+    resolved = RESOLVED.pop(key, None)
+    reused = []
+    with cwd(root), environ(request["env"]):
+        if resolved is not None and resolved.stale():
+            resolved.close()
+            resolved = None
+        if resolved is not None and resolved.discovery_changed():
+            if resolved.hook.options.helpers:
+                # helper sources are globbed with the options
+                resolved.close()
+                resolved = None
+            else:
+                resolved.files = None
+        if resolved is None:
+            app = RecordingApplication()
+            hook = plugin.CythonBuildHook.for_project(
+                root, config=request["config"], app=app, target_name=request["target"]
+            )
+            resolved = Resolved(hook, app)
+        else:
+            reused.append("options")
+        if resolved.files is None:
+            resolved.discover()
+        elif reused:
+            reused.append("files")
+    RESOLVED[key] = resolved
+    while len(RESOLVED) > RESOLVED_LIMIT:
+        RESOLVED.pop(next(iter(RESOLVED))).close()
+    return {
+        "options": encode(resolved.hook.options),
+        "files": resolved.files,
+        "messages": resolved.messages,
+        "reused": reused,
+    }
+
+
+def handle(conn: socket.socket, listener: socket.socket, expected: str) -> bool:
+    """Serves one request
+
+    Returns:
+        bool: whether the daemon keeps serving
+    """
+    if peer_uid(conn) not in (None, os.getuid()):
+        return True
+    request = receive(conn)
+    if request is None:
+        return True
+    if request.get("command") == "stop":
+        send(conn, {"stopped": True})
+        return False
+    if request.get("command") == "status":
+        send(conn, {"pid": os.getpid(), "fingerprint": expected})
+        return True
+    if request.get("fingerprint") != expected:
+        send(conn, {"error": "stale"})
+        return False
+    if request.get("command") == "resolve":
+        try:
+            reply = resolve_project(request)
+        except Exception:
+            # e.g. an invalid configuration, which the hook reports when resolving it itself
+            reply = {"error": traceback.format_exc()}
+        send(conn, reply)
+        return True
+
+    start = time.perf_counter()
+    with tempfile.TemporaryFile() as output:
+        pid = os.fork()
+        if pid == 0:
+            listener.close()
+            conn.close()
+            code = 1
+            try:
+                code = run_child(request, output.fileno())
+            finally:
+                os._exit(code)
+        _, status = os.waitpid(pid, 0)
+        output.seek(0)
+        text = output.read().decode("utf-8", "replace")
+    code = os.waitstatus_to_exitcode(status) if hasattr(os, "waitstatus_to_exitcode") else status >> 8
+    send(conn, {"returncode": code, "output": text, "seconds": time.perf_counter() - start})
+    return True
+
+
+def serve(path: str, idle_timeout: int):
+    global SERVING  # noqa: PLW0603
+    SERVING = True
+    for module in WARM:
+        with contextlib.suppress(ImportError):
+            importlib.import_module(module)
+    expected = fingerprint()
+
+    os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+    if not private(path):
+        sys.exit(f"{os.path.dirname(path)} is writable by other users, not serving on {path}")
+    with contextlib.suppress(FileNotFoundError):
+        os.unlink(path)
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(path)
+    os.chmod(path, 0o600)
+    # a daemon replacing a stale one may bind before the stale one removes its socket
+    inode = os.stat(path).st_ino
+    listener.listen()
+    listener.settimeout(idle_timeout)
+    try:
+        serving = True
+        while serving:
+            try:
+                conn, _ = listener.accept()
+            except socket.timeout:  # noqa: UP041
+                break
+            with conn:
+                conn.settimeout(None)
+                serving = handle(conn, listener, expected)
+    finally:
+        listener.close()
+        with contextlib.suppress(FileNotFoundError):
+            if os.stat(path).st_ino == inode:
+                os.unlink(path)
+
+
+def connect(path: str) -> UnionT[socket.socket, None]:
+    """Connects to the daemon at `path`, unless another user could have bound it"""
+    if not supported() or not os.path.exists(path) or not private(path) or os.lstat(path).st_uid != os.getuid():
+        return None
+    conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        conn.connect(path)
+    except OSError:
+        conn.close()
+        return None
+    if peer_uid(conn) not in (None, os.getuid()):
+        conn.close()
+        return None
+    return conn
+
+
+def start(path: str, idle_timeout: int, wait: float = 10.0) -> bool:
+    """Starts a detached daemon, waiting until it serves requests"""
+    subprocess.Popen(  # noqa: S603
+        [sys.executable, "-m", "hatch_cython.daemon", "serve", "--socket", path, "--idle-timeout", str(idle_timeout)],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+        env={
+            **os.environ,
+            "PYTHONPATH": os.pathsep.join(p for p in (package_root(), os.environ.get("PYTHONPATH")) if p),
+        },
+    )
+    expected = fingerprint()
+    deadline = time.monotonic() + wait
+    while time.monotonic() < deadline:
+        # a stale daemon may still be closing its socket
+        status = request(path, {"command": "status"})
+        if status is not None and status.get("fingerprint") == expected:
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def package_root() -> str:
+    # the daemon must import this hatch_cython, also when it is not installed (e.g. devel.py)
+    return os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def request(path: str, command: dict) -> UnionT[dict, None]:
+    conn = connect(path)
+    if conn is None:
+        return None
+    with conn:
+        try:
+            send(conn, command)
+            return receive(conn)
+        except OSError:
+            # the daemon exited while connecting, e.g. on its idle timeout
+            return None
+
+
+def run_setup(
+    path: str,
+    argv: ListStr,
+    *,
+    env: dict,
+    cwd: str,
+) -> UnionT[TupleT[int, str], None]:
+    """Runs `python {argv}` in the daemon
+
+    Returns:
+        TupleT[int, str] | None: (returncode, output), or None when no daemon serves the request
+    """
+    reply = request(path, {"argv": argv, "env": env, "cwd": cwd, "fingerprint": fingerprint()})
+    if reply is None or "returncode" not in reply:
+        return None
+    return reply["returncode"], reply["output"]
+
+
+def resolve(path: str, *, root: str, config: dict, target: str, env: dict) -> UnionT[dict, None]:
+    """The options & discovered files of the project from the daemon
+
+    Returns:
+        dict | None: {"options": Config, "files": [...], "messages": [(level, message), ...], "reused": [...]},
+            or None when no daemon serves the request
+    """
+    reply = request(
+        path,
+        {
+            "command": "resolve",
+            "root": root,
+            "config": config,
+            "target": target,
+            "env": env,
+            "fingerprint": fingerprint(),
+        },
+    )
+    if reply is None or "options" not in reply:
+        return None
+    try:
+        return {**reply, "options": decode(reply["options"])}
+    except (TypeError, ValueError, ImportError, AttributeError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m hatch_cython.daemon", description=__doc__.strip().split("\n")[0])
+    parser.add_argument("command", choices=("start", "stop", "status", "serve"))
+    parser.add_argument("--cache-dir", default=CACHE_DIR, help="cache dir of the project")
+    parser.add_argument("--socket", help="socket path, derived from the cache dir by default")
+    parser.add_argument("--idle-timeout", type=int, default=DaemonArgs.idle_timeout)
+    args = parser.parse_args(argv)
+    if not supported():
+        parser.error("the build daemon requires unix sockets & fork")
+
+    path = args.socket or socket_path(args.cache_dir)
+    if args.command == "serve":
+        serve(path, args.idle_timeout)
+    elif args.command == "start":
+        if request(path, {"command": "status"}) is None and not start(path, args.idle_timeout):
+            sys.exit(f"the daemon did not start on {path}")
+        print(f"serving on {path}")  # noqa: T201
+    elif args.command == "stop":
+        print("stopped" if request(path, {"command": "stop"}) else "not running")  # noqa: T201
+    else:
+        status = request(path, {"command": "status"})
+        print(f"pid {status['pid']} serving on {path}" if status else "not running")  # noqa: T201
+
+
+if __name__ == "__main__":
+    # as the imported module, whose SERVING the hooks of the daemon read
+    importlib.import_module("hatch_cython.daemon").main()
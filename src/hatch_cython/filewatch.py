@@ -0,0 +1,191 @@
+"""
+File change watching, with inotify on linux, else by polling, for the watch mode & the build daemon
+"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import time
+
+from Cython.Utils import is_cython_generated_file
+
+from hatch_cython.types import DictT, ListStr, ListT, Set, TupleT, UnionT
+
+# changes to these rebuild everything, with the configuration read again
+CONFIG_FILES = frozenset(("pyproject.toml", "hatch.toml"))
+SOURCE_SUFFIXES = (".py", ".pyx", ".pxd", ".pxi", ".in", ".c", ".cc", ".cpp", ".h", ".hpp")
+IGNORED_DIRS = frozenset(("__pycache__", "build", "dist"))
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+IN_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+EVENT = struct.Struct("iIII")
+
+
+def ignored_dir(name: str) -> bool:
+    return name.startswith(".") or name in IGNORED_DIRS or name.endswith(".egg-info")
+
+
+def relevant(path: str) -> bool:
+    name = os.path.basename(path)
+    if name in CONFIG_FILES:
+        return True
+    if not name.endswith(SOURCE_SUFFIXES):
+        return False
+    # written by the build itself: rendered templates & cython generated c
+    if os.path.exists(f"{path}.in"):
+        return False
+    return not (name.endswith((".c", ".cc", ".cpp")) and is_cython_generated_file(path, if_not_found=False))
+
+
+def walk(directory: str) -> ListStr:
+    found = []
+    for parent, dirs, files in os.walk(directory):
+        dirs[:] = [d for d in dirs if not ignored_dir(d)]
+        found.extend(os.path.join(parent, f) for f in files)
+    return found
+
+
+class Inotify:
+    """inotify watches of directories, added for new subdirectories of recursive ones"""
+
+    def __init__(self, paths: ListT[TupleT[str, bool]]):
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.watches: DictT[int, TupleT[str, bool]] = {}
+        try:
+            for path, recursive in paths:
+                self.add(path, recursive)
+        except OSError:
+            self.close()
+            raise
+
+    def add(self, directory: str, recursive: bool):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), IN_MASK)
+        if wd < 0:
+            # e.g. ENOSPC, beyond fs.inotify.max_user_watches
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {directory}")
+        self.watches[wd] = (directory, recursive)
+        if recursive:
+            for entry in os.scandir(directory):
+                if entry.is_dir(follow_symlinks=False) and not ignored_dir(entry.name):
+                    self.add(entry.path, recursive)
+
+    def read(self) -> bytes:
+        data = b""
+        while True:
+            try:
+                chunk = os.read(self.fd, 65536)
+            except BlockingIOError:
+                return data
+            if not chunk:
+                return data
+            data += chunk
+
+    def changes(self, timeout: float) -> UnionT[Set[str], None]:
+        """Changed paths within the timeout. None if events were lost"""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set()
+        data = self.read()
+        changed = set()
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT.unpack_from(data, offset)
+            name = data[offset + EVENT.size : offset + EVENT.size + length].rstrip(b"\0")
+            offset += EVENT.size + length
+            if mask & IN_Q_OVERFLOW:
+                return None
+            if mask & IN_IGNORED:
+                self.watches.pop(wd, None)
+                continue
+            if wd not in self.watches:
+                continue
+            directory, recursive = self.watches[wd]
+            path = os.path.join(directory, os.fsdecode(name))
+            if mask & IN_ISDIR:
+                if recursive and mask & (IN_CREATE | IN_MOVED_TO) and not ignored_dir(os.path.basename(path)):
+                    # files may have been written before the watch was added
+                    self.add(path, recursive)
+                    changed.update(walk(path))
+                continue
+            changed.add(path)
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+
+class Polling:
+    """Compares modification times of the files within the directories every interval"""
+
+    def __init__(self, paths: ListT[TupleT[str, bool]], interval: float = 0.5):
+        self.paths = paths
+        self.interval = interval
+        self.snapshot = self.scan()
+
+    def scan(self) -> DictT[str, TupleT[int, int]]:
+        snapshot = {}
+        for directory, recursive in self.paths:
+            files = walk(directory) if recursive else [e.path for e in os.scandir(directory) if e.is_file()]
+            for f in files:
+                try:
+                    stat = os.stat(f)
+                except FileNotFoundError:
+                    continue
+                snapshot[f] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
+
+    def changes(self, timeout: float) -> Set[str]:
+        time.sleep(min(self.interval, timeout))
+        snapshot = self.scan()
+        changed = {f for f in snapshot.keys() | self.snapshot.keys() if snapshot.get(f) != self.snapshot.get(f)}
+        self.snapshot = snapshot
+        return changed
+
+    def close(self):
+        pass
+
+
+def watcher(paths: ListT[TupleT[str, bool]], *, poll: bool = False, interval: float = 0.5):
+    if not poll and hasattr(select, "select") and ctypes.util.find_library("c"):
+        try:
+            return Inotify(paths)
+        except (OSError, AttributeError):
+            # no inotify (e.g. macos, windows), or too many directories to watch
+            pass
+    return Polling(paths, interval)
+
+
+def wait(watch: UnionT[Inotify, Polling], debounce: float = 0.2) -> UnionT[Set[str], None]:
+    """Blocks until relevant paths change, collecting changes until none came within `debounce` seconds
+
+    Returns:
+        Set[str] | None: changed paths, or None if they are unknown
+    """
+    changed: UnionT[Set[str], None] = set()
+    while not changed:
+        found = watch.changes(1.0)
+        if found is None:
+            return None
+        changed = {f for f in found if relevant(f)}
+    while True:
+        found = watch.changes(debounce)
+        if found is None:
+            return None
+        found = {f for f in found if relevant(f)}
+        if not found:
+            return {os.path.realpath(f) for f in changed}
+        changed |= found
@@ -0,0 +1,235 @@
+from hatch_cython.constants import ISA_LEVELS
+from hatch_cython.types import DictT, ListT, TupleT
+from hatch_cython.utils import autogenerated
+
+
+def loader_name(package: str):
+    return f"_hatch_cython_{package}"
+
+
+def loader_pth(package: str):
+    return f"import {loader_name(package)}\n"
+
+
+def loader_py(
+    bundles: DictT[str, str],
+    variants: DictT[str, ListT[TupleT[str, str]]] = None,
+):
+    """Source of the import finder shipped at the root of the wheel
+
+    Args:
+        bundles (DictT[str, str]): module name -> name of the extension module containing it
+        variants (DictT[str, ListT[TupleT[str, str]]]): module name -> [(isa level, variant module name), ...],
+            best level first
+
+    Returns:
+        str: python source
+    """
+    if variants is None:
+        variants = {}
+    code = """
+import os
+import sys
+from functools import lru_cache
+from importlib.machinery import EXTENSION_SUFFIXES, ExtensionFileLoader
+from importlib.util import spec_from_file_location
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+BUNDLES = {bundles!r}
+VARIANTS = {variants!r}
+ISA_LEVELS = {isa_levels!r}
+
+
+def _locate(module):
+    base = os.path.join(ROOT, *module.split("."))
+    for suffix in EXTENSION_SUFFIXES:
+        if os.path.exists(base + suffix):
+            return base + suffix
+    return None
+
+
+@lru_cache(maxsize=None)
+def _cpu_flags():
+    try:
+        with open("/proc/cpuinfo") as f:
+            for line in f:
+                if line.startswith("flags"):
+                    return frozenset(line.split(":", 1)[1].split())
+    except OSError:
+        pass
+    return frozenset()
+
+
+def _supported(level):
+    # HATCH_CYTHON_ISA caps the level used, e.g. HATCH_CYTHON_ISA=baseline
+    cap = os.environ.get("HATCH_CYTHON_ISA")
+    if cap is not None:
+        levels = list(ISA_LEVELS)
+        return cap in levels and levels.index(level) <= levels.index(cap)
+    return _cpu_flags().issuperset(ISA_LEVELS[level])
+
+
+def _spec(fullname, module):
+    origin = _locate(module)
+    if origin is None:
+        return None
+    # the extension loader resolves PyInit_<last name of fullname> from the shared object
+    return spec_from_file_location(fullname, origin, loader=ExtensionFileLoader(fullname, origin))
+
+
+class HatchCythonFinder:
+    @classmethod
+    def find_spec(cls, fullname, path=None, target=None):
+        for level, variant in VARIANTS.get(fullname, ()):
+            if _supported(level):
+                spec = _spec(fullname, variant)
+                if spec is not None:
+                    return spec
+        bundle = BUNDLES.get(fullname)
+        if bundle is None:
+            return None
+        return _spec(fullname, bundle)
+
+
+sys.meta_path.insert(0, HatchCythonFinder)
+"""
+    return autogenerated({}) + code.format(bundles=bundles, variants=variants, isa_levels=ISA_LEVELS)
+
+
+def lazy_loader_py(modules: DictT[str, dict], env: DictT[str, str], root: str):
+    """Source of the import finder of lazy editable installs, compiling each extension on first import
+
+    Args:
+        modules (DictT[str, dict]): import name -> {"setup": build recipe, "sources": files the extension is
+            built from, "compiled": extension path without suffix, "pure": python source or None, "package": bool}
+        env (DictT[str, str]): build environment, over the environment of the importing process
+        root (str): project root, the working directory of builds
+
+    Returns:
+        str: python source
+    """
+    code = """
+import os
+import subprocess
+import sys
+import threading
+import warnings
+from importlib.machinery import EXTENSION_SUFFIXES
+from importlib.util import spec_from_file_location
+
+MODULES = {modules!r}
+ENV = {env!r}
+ROOT = {root!r}
+
+_lock = threading.Lock()
+_locks = {{}}
+_builds = {{}}
+
+
+def _module_lock(name):
+    with _lock:
+        return _locks.setdefault(name, threading.Lock())
+
+
+def _compiled(module):
+    for suffix in EXTENSION_SUFFIXES:
+        if os.path.exists(module["compiled"] + suffix):
+            return module["compiled"] + suffix
+    return None
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return 0.0
+
+
+def _stale(module):
+    compiled = _compiled(module)
+    if compiled is None:
+        return True
+    return _mtime(compiled) < max(_mtime(f) for f in (module["setup"], *module["sources"]))
+
+
+def _try_lock(fd, block):
+    # held by the build process, so other interpreters do not build the same module concurrently
+    try:
+        import fcntl
+    except ImportError:
+        return True
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | (0 if block else fcntl.LOCK_NB))
+    except BlockingIOError:
+        return False
+    return True
+
+
+def _build(name, module, block):
+    build_dir = os.path.dirname(module["setup"])
+    failed = os.path.join(build_dir, "failed")
+    sources = str(max(_mtime(f) for f in (module["setup"], *module["sources"])))
+    if os.path.exists(failed):
+        with open(failed) as f:
+            if f.read() == sources:
+                # failed for these sources already; the log tells why
+                return
+    fd = os.open(os.path.join(build_dir, "lock"), os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        if not _try_lock(fd, block) or not _stale(module):
+            return
+        log = os.path.join(build_dir, "build.log")
+        with open(log, "wb") as out:
+            process = subprocess.Popen(
+                [
+                    sys.executable,
+                    module["setup"],
+                    "build_ext",
+                    "--inplace",
+                    "--build-lib",
+                    os.path.join(build_dir, "build"),
+                    "--build-temp",
+                    os.path.join(build_dir, "tmp"),
+                ],
+                cwd=ROOT,
+                env={{**os.environ, **ENV}},
+                stdout=out,
+                stderr=subprocess.STDOUT,
+                pass_fds=(fd,) if os.name == "posix" else (),
+            )
+            code = process.wait()
+        if code:
+            with open(failed, "w") as f:
+                f.write(sources)
+            warnings.warn(f"hatch-cython: compiling {{name}} failed, see {{log}}", RuntimeWarning, stacklevel=2)
+        elif os.path.exists(failed):
+            os.remove(failed)
+    finally:
+        os.close(fd)
+
+
+class HatchCythonLazyFinder:
+    @classmethod
+    def find_spec(cls, fullname, path=None, target=None):
+        module = MODULES.get(fullname)
+        mode = os.environ.get("HATCH_CYTHON_LAZY", "background")
+        if module is None or mode == "0" or not _stale(module):
+            return None
+        pure = module["pure"]
+        with _module_lock(fullname):
+            if pure is None or mode == "sync":
+                # no python source to serve meanwhile
+                _build(fullname, module, block=True)
+                return None
+            if fullname not in _builds:
+                _builds[fullname] = threading.Thread(
+                    target=_build, args=(fullname, module, False), name=f"hatch-cython {{fullname}}", daemon=True
+                )
+                _builds[fullname].start()
+        search = [os.path.dirname(pure)] if module["package"] else None
+        return spec_from_file_location(fullname, pure, submodule_search_locations=search)
+
+
+sys.meta_path.insert(0, HatchCythonLazyFinder)
+"""
+    return autogenerated({}) + code.format(modules=modules, env=env, root=root)
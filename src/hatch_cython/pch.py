@@ -0,0 +1,149 @@
+"""
+Precompiled headers: Python.h, and the numpy or Arrow headers where configured, are parsed again by every unit
+Cython generates. A header precompiled once per compiler, arguments & language is forced into each such unit
+instead. The unit compiles as before whenever its header cannot be precompiled, or the compiler rejects it.
+"""
+
+import os
+import shutil
+import subprocess
+import sys
+import threading
+
+try:
+    from distutils.unixccompiler import UnixCCompiler
+except ImportError:
+    # python 3.12+, without setuptools' distutils shim
+    from setuptools._distutils.unixccompiler import UnixCCompiler
+
+try:
+    from functools import cache
+except ImportError:
+    # python 3.8
+    from functools import lru_cache
+
+    cache = lru_cache(maxsize=None)
+
+from hatch_cython.config.shards import digest
+from hatch_cython.config.toolchain import CLANG, GCC, compiler_family
+from hatch_cython.types import DictT, ListStr, UnionT
+
+PCH_HEADER = "hatch_cython_pch.h"
+# the file each compiler family looks for next to a header given with -include
+SUFFIXES = {GCC: ".gch", CLANG: ".pch"}
+CYTHON_GENERATED = b"/* Generated by Cython"
+
+
+def header_source(headers: ListStr) -> str:
+    # as the generated code defines it, before including Python.h
+    return "\n".join(["#define PY_SSIZE_T_CLEAN", *(f"#include <{h}>" for h in headers), ""])
+
+
+def is_cython_generated(src: str) -> bool:
+    try:
+        with open(src, "rb") as f:
+            return f.read(len(CYTHON_GENERATED)) == CYTHON_GENERATED
+    except OSError:
+        return False
+
+
+@cache
+def family(executable: str) -> str:
+    return compiler_family([executable])
+
+
+def compiler_stamp(executable: str) -> str:
+    """Changes when the compiler is upgraded, which invalidates its precompiled headers"""
+    resolved = shutil.which(executable)
+    if resolved is None:
+        return executable
+    stat = os.stat(resolved)
+    return f"{os.path.realpath(resolved)}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def read_depfile(path: str) -> ListStr:
+    """The prerequisites of a make rule written by -MD; escaped spaces are kept within a path"""
+    with open(path, encoding="utf-8", errors="replace") as f:
+        text = f.read().replace("\\\n", " ")
+    _, _, prerequisites = text.partition(": ")
+    return [p.replace("\0", " ") for p in prerequisites.replace("\\ ", "\0").split()]
+
+
+def up_to_date(pch: str, depfile: str) -> bool:
+    """Whether `pch` is newer than every header it was built from"""
+    if not (os.path.exists(pch) and os.path.exists(depfile)):
+        return False
+    built = os.path.getmtime(pch)
+    return all(os.path.exists(dep) and os.path.getmtime(dep) <= built for dep in read_depfile(depfile))
+
+
+class Precompiled:
+    """Precompiles the header of each (compiler, arguments, language) once, shared by the threads of a build"""
+
+    def __init__(self, headers: DictT[str, ListStr], directory: str):
+        self.headers = headers
+        self.directory = directory
+        self.lock = threading.Lock()
+        self.locks: DictT[str, threading.Lock] = {}
+        self.results: DictT[str, UnionT[str, None]] = {}
+
+    def header(self, compiler: ListStr, args: ListStr, language: str) -> UnionT[str, None]:
+        """The header to force into a unit compiled with `args`, or None to compile it unchanged"""
+        suffix = SUFFIXES.get(family(compiler[0]))
+        headers = self.headers.get(language)
+        if suffix is None or not headers:
+            return None
+        key = digest([compiler, compiler_stamp(compiler[0]), args, language, headers, sys.version])[:16]
+        with self.lock:
+            lock = self.locks.setdefault(key, threading.Lock())
+        with lock:
+            if key not in self.results:
+                self.results[key] = self.build(os.path.join(self.directory, key), compiler, args, language, suffix)
+            return self.results[key]
+
+    def build(self, directory: str, compiler: ListStr, args: ListStr, language: str, suffix: str):
+        header = os.path.join(directory, PCH_HEADER)
+        pch = header + suffix
+        depfile = header + ".d"
+        if up_to_date(pch, depfile):
+            return header
+        os.makedirs(directory, exist_ok=True)
+        with open(header, "w", encoding="utf-8") as f:
+            f.write(header_source(self.headers[language]))
+        kind = "c++-header" if language == "c++" else "c-header"
+        process = subprocess.run(  # noqa: S603
+            [*compiler, *args, "-x", kind, header, "-o", f"{pch}.tmp", "-MD", "-MF", f"{depfile}.tmp"],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            check=False,
+        )
+        if process.returncode:
+            output = process.stdout.decode("utf-8", "replace").strip()
+            print(f"precompiled header failed, compiling without it:\n{output}")  # noqa: T201
+            return None
+        os.replace(f"{depfile}.tmp", depfile)
+        os.replace(f"{pch}.tmp", pch)
+        print(f"precompiled {', '.join(self.headers[language])} into {pch}", flush=True)  # noqa: T201
+        return header
+
+
+def precompile(headers: DictT[str, ListStr], directory: str):
+    """Wraps the unix compiler to force the precompiled header into each unit generated by Cython"""
+    precompiled = Precompiled(headers, directory)
+    compile_ = UnixCCompiler._compile
+
+    def compile_with_pch(self, obj, src, ext, cc_args, extra_postargs, pp_opts):  # noqa: PLR0917
+        if not self.dry_run and is_cython_generated(src):
+            language = self.detect_language(src) or "c"
+            compiler = self.compiler_so
+            if language == "c++" and getattr(self, "compiler_so_cxx", None):
+                compiler = self.compiler_so_cxx
+            # the unit's own arguments, which the header must be precompiled with to be used
+            args = [a for a in cc_args if a != "-c"] + list(extra_postargs)
+            header = precompiled.header(compiler, args, language)
+            if header is not None:
+                # an unusable header is still included as text; the warning says why it was not used
+                cc_args = ["-include", header, "-Winvalid-pch", *cc_args]
+        return compile_(self, obj, src, ext, cc_args, extra_postargs, pp_opts)
+
+    UnixCCompiler._compile = compile_with_pch
@@ -0,0 +1,34 @@
+"""
+Explains what a build would do, without compiling: for each extension, whether its previous build is reused,
+or why it is rebuilt (sources, .pxd & included dependencies, arguments, Cython version), with the time it took
+before; and which modules discovery excluded.
+
+    python -m hatch_cython.plan [--root .] [--json plan.json]
+"""
+
+import argparse
+import os
+
+from hatch_cython.plugin import CythonBuildHook
+from hatch_cython.reports.plan import format_plan, write_plan
+from hatch_cython.utils import QuietApplication, cwd
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m hatch_cython.plan", description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--root", default=".", help="project root")
+    parser.add_argument("--json", help="also write the plan to this file")
+    args = parser.parse_args(argv)
+
+    root = os.path.realpath(args.root)
+    hook = CythonBuildHook.for_project(root, app=QuietApplication())
+    with cwd(root):
+        plans = hook.plan()
+    print(format_plan(plans))  # noqa: T201
+    if args.json:
+        print(f"plan written to {write_plan(plans, args.json)}")  # noqa: T201
+    return plans
+
+
+if __name__ == "__main__":
+    main()
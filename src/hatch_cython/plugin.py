@@ -1,24 +1,80 @@
+import json
 import os
 import re
 import subprocess
 import sys
 from contextlib import contextmanager
 from glob import glob
+from importlib.machinery import EXTENSION_SUFFIXES
 from tempfile import TemporaryDirectory
+from time import perf_counter
 
+from Cython.Build.Dependencies import create_dependency_tree
 from Cython.Tempita import sub as render_template
+from Cython.Utils import is_cython_generated_file
+from hatchling.bridge.app import Application
 from hatchling.builders.hooks.plugin.interface import BuildHookInterface
+from hatchling.builders.wheel import WheelBuilder
 
-from hatch_cython.config import parse_from_dict
+# a module, as the daemon imports this one back
+from hatch_cython import daemon as build_daemon
+from hatch_cython.config import Config, parse_from_dict
+from hatch_cython.config.daemon import parse_daemon
+from hatch_cython.config.fallback import update_fallback
+from hatch_cython.config.helpers import HelperLibrary
+from hatch_cython.config.hotspots import hot_modules, profiled_modules
+from hatch_cython.config.overrides import tuned_overrides
+from hatch_cython.config.shards import (
+    MERGE_ENV,
+    SHARD_DIR_ENV,
+    SHARD_ENV,
+    Shard,
+    ShardManifest,
+    assign,
+    digest,
+    estimate_costs,
+    export_shard,
+    fingerprint,
+    merge_shards,
+    parse_shard,
+    read_costs,
+)
+from hatch_cython.config.tiers import COLD, DEFAULT, HOT
 from hatch_cython.constants import (
+    TUNED,
     compiled_extensions,
     intermediate_extensions,
     precompiled_extensions,
     templated_extensions,
 )
+from hatch_cython.loader import lazy_loader_py, loader_name, loader_pth, loader_py
+from hatch_cython.remote import probe
+from hatch_cython.reports.annotations import build_report, merge_baseline, regressions, score_module, write_report
+from hatch_cython.reports.costs import ExtensionCost, collect, format_size, read_events, write_costs
+from hatch_cython.reports.history import (
+    BuildRecord,
+    baseline,
+    connect,
+    machine_class,
+    module_seconds,
+    record_build,
+)
+from hatch_cython.reports.history import regressions as history_regressions
+from hatch_cython.reports.plan import (
+    CACHED,
+    EXCLUDED,
+    REBUILD,
+    REUSED,
+    ExtensionPlan,
+    changed_toolchain,
+    read_manifest,
+    write_manifest,
+)
+from hatch_cython.reports.tiers import ModuleTier, write_tiers
+from hatch_cython.reports.trace import TRACER, US, span
 from hatch_cython.temp import ExtensionArg, setup_py
-from hatch_cython.types import CallableT, DictT, ListStr, ListT, P, Set
-from hatch_cython.utils import autogenerated, memo, parse_user_glob, plat
+from hatch_cython.types import CallableT, DictT, ListStr, ListT, P, Set, TupleT, UnionT
+from hatch_cython.utils import autogenerated, cwd, locked, memo, parse_user_glob, plat
 import multiprocessing
 
 class CythonBuildHook(BuildHookInterface):
@@ -28,8 +84,16 @@ class CythonBuildHook(BuildHookInterface):
     intermediate_extensions: Set[str]
     templated_extensions: Set[str]
     compiled_extensions: Set[str]
+    build_costs: ListT[ExtensionCost]
+    # names of the extensions to compile, e.g. those affected by a change. None compiles all
+    only: UnionT[Set[str], None]
+    # replace extensions in place atomically, for trees imported while they are rebuilt
+    atomic: bool
 
     def __init__(self, *args: P.args, **kwargs: P.kwargs):
+        self.build_costs = []
+        self.only = None
+        self.atomic = False
         self.precompiled_extensions = precompiled_extensions.copy()
         self.intermediate_extensions = intermediate_extensions.copy()
         self.templated_extensions = templated_extensions.copy()
@@ -37,7 +101,34 @@ class CythonBuildHook(BuildHookInterface):
 
         super().__init__(*args, **kwargs)
 
-        _ = self.options
+        TRACER.reset()
+        with span("parse_from_dict"):
+            _ = self.options
+
+    @classmethod
+    def for_project(
+        cls,
+        root: str,
+        *,
+        config: UnionT[dict, None] = None,
+        app: UnionT[Application, None] = None,
+        target_name: UnionT[str, None] = None,
+    ) -> "CythonBuildHook":
+        """The hook as configured for the project's wheel, for tools building outside of hatchling"""
+        builder = WheelBuilder(root)
+        if config is None:
+            config = builder.config.hook_config.get(cls.PLUGIN_NAME, {})
+        # options are parsed on init, relative to the root
+        with cwd(root):
+            return cls(
+                root,
+                config,
+                builder.config,
+                builder.metadata,
+                directory=builder.config.directory,
+                target_name=target_name or builder.PLUGIN_NAME,
+                app=app,
+            )
 
     @property
     @memo
@@ -70,16 +161,54 @@ class CythonBuildHook(BuildHookInterface):
             src = f"./{self.dir_name}"
         return src
 
+    @property
+    @memo
+    def cache_dir(self):
+        if self.options.cache_dir is not None:
+            return os.path.join(self.root, self.options.cache_dir)
+        # .hatch is never distributed by hatchling
+        return os.path.join(self.root, ".hatch", "cython")
+
+    def invalidate_generated(self, key: str, state: object):
+        """
+        Removes cython generated sources if `state` differs from the previous build's,
+        as cythonize only compares timestamps
+        """
+        state_dir = os.path.join(self.cache_dir, "state")
+        os.makedirs(state_dir, exist_ok=True)
+        marker = os.path.join(state_dir, f"{key}.json")
+        current = json.dumps(state, sort_keys=True)
+        previous = None
+        if os.path.exists(marker):
+            with open(marker, encoding="utf-8") as f:
+                previous = f.read()
+        if previous is not None and previous != current:
+            self.app.display_info(f"{key} changed, regenerating sources")
+            self.rm_recurse([f for f in self.intermediate if is_cython_generated_file(f, if_not_found=False)])
+        with open(marker, "w", encoding="utf-8") as f:
+            f.write(current)
+
     def render_templates(self):
+        # sources of the extensions which are not compiled
+        skipped = set()
+        if self.only is not None:
+            skipped = {f for ex in self.grouped_included_files if ex["name"] not in self.only for f in ex["files"]}
         for template in self.templated_globs:
             outfile = template[:-3]
+            if self.normalize_glob(outfile) in skipped:
+                continue
             with open(template, encoding="utf-8") as f:
                 tmpl = f.read()
 
             kwds = self.options.templates.find(self, outfile, template)
-            data = render_template(tmpl, **kwds)
+            data = autogenerated(kwds) + "\n\n" + render_template(tmpl, **kwds)
+            # an unchanged output keeps its timestamp, so cythonize does not rebuild it
+            if os.path.exists(outfile):
+                with open(outfile, encoding="utf-8") as f:
+                    if f.read() == data:
+                        continue
             with open(outfile, "w", encoding="utf-8") as f:
-                f.write(autogenerated(kwds) + "\n\n" + data)
+                f.write(data)
 
     @property
     @memo
@@ -99,7 +228,37 @@ class CythonBuildHook(BuildHookInterface):
     def options_include(self):
         return [parse_user_glob(e.matches) for e in self.options.files.targets if e.applies()]
 
+    @property
+    @memo
+    def helper_source_sets(self) -> ListT[TupleT[HelperLibrary, ListStr, ListStr]]:
+        """(helper, sources, depends) of the helper source sets, with their globs resolved"""
+        source_sets = []
+        for helper in self.options.helpers:
+            sources = sorted({os.path.normpath(f) for pattern in helper.sources for f in glob(pattern, recursive=True)})
+            if not sources:
+                self.app.display_warning(f"helper library {helper.name} matched no sources")
+                continue
+            depends = sorted({os.path.normpath(f) for pattern in helper.depends for f in glob(pattern, recursive=True)})
+            source_sets.append((helper, sources, depends))
+        return source_sets
+
+    @property
+    def helper_libraries(self) -> ListT[TupleT[str, dict]]:
+        """build_clib libraries of the helper source sets, compiled with the options as resolved so far, e.g. lto"""
+        return [
+            (helper.name, self.options.helper_build_info(helper, sources, depends))
+            for helper, sources, depends in self.helper_source_sets
+        ]
+
+    @property
+    @memo
+    def helper_sources(self) -> Set[str]:
+        return {source for _, sources, _ in self.helper_source_sets for source in sources}
+
     def wanted(self, item: str):
+        # helper sources are linked into extensions, not extensions themselves
+        if self.options.helpers and os.path.normpath(item) in self.helper_sources:
+            return False
         not_excluded = not any(re.match(e, self.normalize_glob(item), re.IGNORECASE) for e in self.options_exclude)
         if self.options.files.explicit_targets:
             return not_excluded and any(re.match(opt, self.normalize_glob(item)) for opt in self.options_include)
@@ -115,6 +274,8 @@ class CythonBuildHook(BuildHookInterface):
 
     @property
     def included_files(self):
+        if self.daemon_resolved is not None:
+            return list(self.daemon_resolved["files"])
         included = set()
         self.app.display_debug("user globs")
         for patt in self.precompiled_globs:
@@ -140,11 +301,18 @@ class CythonBuildHook(BuildHookInterface):
             path = path.replace("..", "")
         return path
 
+    def module_of(self, norm: str) -> str:
+        root = os.path.splitext(norm)[0]
+        if self.is_src:
+            root = root.replace("./src/", "")
+        root = self.normalize_aliased_filelike(root.replace("/", "."))
+        return self.options.files.matches_alias(root) or root
+
     @property
     def grouped_included_files(self) -> ListT[ExtensionArg]:
         grouped: DictT[str, set] = {}
         for norm in self.normalized_included_files:
-            root, ext = os.path.splitext(norm)
+            ext = os.path.splitext(norm)[1]
             ok = True
             if ext == ".pxd":
                 pyfile = norm.replace(".pxd", ".py")
@@ -153,20 +321,239 @@ class CythonBuildHook(BuildHookInterface):
                 else:
                     ok = False
                     self.app.display_warning(f"attempted to use .pxd file without .py file ({norm})")
-            if self.is_src:
-                root = root.replace("./src/", "")
-            root = self.normalize_aliased_filelike(root.replace("/", "."))
-            alias = self.options.files.matches_alias(root)
-            self.app.display_debug(f"check alias {ok} {root} -> {norm} -> {alias}")
-            if alias:
-                root = alias
-                self.app.display_debug(f"aliased {root} -> {norm}")
+            root = self.module_of(norm)
+            self.app.display_debug(f"module {ok} {root} -> {norm}")
             if grouped.get(root) and ok:
                 grouped[root].add(norm)
             elif ok:
                 grouped[root] = {norm}
         return [ExtensionArg(name=key, files=list(files)) for key, files in grouped.items()]
 
+    @property
+    def extensions(self) -> ListT[ExtensionArg]:
+        return [self.options.extension_args(ex) for ex in self.grouped_included_files]
+
+    @property
+    def bundles(self) -> DictT[str, ListStr]:
+        if not self.options.bundles.enabled:
+            return {}
+        return self.options.bundles.group([ex["name"] for ex in self.grouped_included_files])
+
+    @property
+    def loader_routes(self) -> DictT[str, str]:
+        return {member: bundle for bundle, members in self.bundles.items() for member in members}
+
+    @property
+    def variants(self) -> DictT[str, ListT[TupleT[str, str]]]:
+        return self.options.multiversion.variants([ex["name"] for ex in self.grouped_included_files])
+
+    def write_loader(self) -> DictT[str, str]:
+        routes = self.loader_routes
+        variants = self.variants
+        if not (routes or variants) or self.sdist:
+            return {}
+        loader_dir = os.path.join(self.cache_dir, "loader")
+        os.makedirs(loader_dir, exist_ok=True)
+        name = loader_name(self.dir_name)
+        include = {}
+        for ext, source in ((".py", loader_py(routes, variants)), (".pth", loader_pth(self.dir_name))):
+            out = os.path.join(loader_dir, f"{name}{ext}")
+            with open(out, "w", encoding="utf-8") as f:
+                f.write(source)
+            include[out] = f"{name}{ext}"
+        self.app.display_debug("Derived loader")
+        self.app.display_debug(include)
+        return include
+
+    def write_lazy_loader(self) -> DictT[str, str]:
+        """
+        Writes a build recipe per extension & the import finder of editable installs which runs it on first import,
+        rather than compiling up front
+        """
+        for option in ("bundles", "multiversion"):
+            if getattr(self.options, option).enabled:
+                self.app.display_warning(f"{option} do not apply to extensions compiled on import")
+        if self.options.shared_utility:
+            self.app.display_warning("shared_utility does not apply to extensions compiled on import")
+        self.render_templates()
+        self.options.resolve_lto(self, os.path.join(self.cache_dir, "lto"))
+        self.options.validate_include_opts()
+
+        lazy_dir = os.path.join(self.cache_dir, "lazy")
+        modules = {}
+        for ex in self.extensions:
+            module_dir = os.path.join(lazy_dir, ex["name"])
+            os.makedirs(module_dir, exist_ok=True)
+            setup_file = os.path.join(module_dir, "setup.py")
+            setup = setup_py(ex, options=self.options, sdist=False, atomic=True)
+            # an unchanged recipe keeps its timestamp, so reinstalling does not recompile everything
+            previous = None
+            if os.path.exists(setup_file):
+                with open(setup_file, encoding="utf-8") as f:
+                    previous = f.read()
+            if previous != setup:
+                with open(setup_file, "w", encoding="utf-8") as f:
+                    f.write(setup)
+
+            files = [os.path.normpath(os.path.join(self.root, f)) for f in ex["files"]]
+            pxds = [f"{os.path.splitext(f)[0]}.pxd" for f in files]
+            name = ex["name"]
+            package = name.endswith(".__init__")
+            modules[name[: -len(".__init__")] if package else name] = {
+                "setup": setup_file,
+                "sources": [*files, *filter(os.path.exists, pxds)],
+                "compiled": os.path.splitext(files[0])[0],
+                "pure": next((f for f in files if f.endswith(".py")), None),
+                "package": package,
+            }
+
+        # only what the hook changes; the importing process provides the rest
+        env = {k: v for k, v in self.options.envflags.env.items() if os.environ.get(k) != v}
+        loader_dir = os.path.join(self.cache_dir, "loader")
+        os.makedirs(loader_dir, exist_ok=True)
+        name = loader_name(self.dir_name)
+        include = {}
+        for ext, source in ((".py", lazy_loader_py(modules, env, self.root)), (".pth", loader_pth(self.dir_name))):
+            out = os.path.join(loader_dir, f"{name}{ext}")
+            with open(out, "w", encoding="utf-8") as f:
+                f.write(source)
+            include[out] = f"{name}{ext}"
+        self.app.display_debug("Derived lazy loader")
+        self.app.display_debug(include)
+        return include
+
+    def report_annotations(self, extensions: ListT[ExtensionArg]):
+        """
+        Ranks the modules by lines interacting with python from `cython --annotate` output,
+        and checks hot modules against the baseline report
+        """
+        args = self.options.annotations
+        scores = []
+        for ex in extensions:
+            for source in ex["files"]:
+                annotation = f"{os.path.splitext(source)[0]}.html"
+                if os.path.exists(annotation):
+                    scores.append(score_module(ex["name"], source, annotation))
+        if not scores:
+            return
+
+        output = os.path.join(self.root, args.output) if args.output else os.path.join(self.cache_dir, "annotations")
+        report = build_report(scores)
+        _, index = write_report(report, output)
+        self.app.display_info(f"Annotation report written to {index}")
+        for m in report["modules"][: args.top]:
+            worst = ", ".join(f"{f['name']} ({f['yellow_lines']})" for f in m["functions"][:3])
+            self.app.display_info(f"{m['yellow_lines']:>6} / {m['lines']:<6} {m['module']}  {worst}")
+
+        if args.baseline:
+            baseline_file = os.path.join(self.root, args.baseline)
+        else:
+            baseline_file = os.path.join(output, "baseline.json")
+        baseline = None
+        if os.path.exists(baseline_file):
+            with open(baseline_file, encoding="utf-8") as f:
+                baseline = json.load(f)
+        regressed = regressions(report, baseline, args.is_hot)
+        display = self.app.display_error if args.fail_on_regression else self.app.display_warning
+        for module, before, after in regressed:
+            display(f"hot module {module} regressed from {before} to {after} python interaction lines")
+        if regressed and args.fail_on_regression:
+            msg = f"annotation regression in hot modules, see {index}"
+            raise Exception(msg)
+        if not args.baseline and not regressed:
+            # a regression is reported against the accepted build until fixed, rather than accepted in turn
+            temp = f"{baseline_file}.tmp"
+            with open(temp, "w", encoding="utf-8") as f:
+                json.dump(merge_baseline(baseline, report), f, indent=2)
+            os.replace(temp, baseline_file)
+
+    def report_tiers(self, extensions: ListT[ExtensionArg]):
+        """
+        Writes the optimization tier & compile args chosen for each extension
+        """
+        tiers = []
+        for ex in extensions:
+            tier, reason = self.options.tiers.tier(ex["name"])
+            args = ex.get("extra_compile_args", self.options.compile_args_for_platform)
+            tiers.append(ModuleTier(module=ex["name"], tier=tier, reason=reason, compile_args=sorted(args)))
+        output = write_tiers(tiers, os.path.join(self.cache_dir, "tiers.json"))
+        self.app.display_info(f"Optimization tiers written to {output}")
+        for tier in (HOT, DEFAULT, COLD):
+            modules = [t for t in tiers if t.tier == tier]
+            self.app.display_info(f"{tier}: {len(modules)} modules")
+            for t in modules:
+                self.app.display_info(f"  {t.module} ({t.reason}): {' '.join(t.compile_args)}")
+
+    def report_costs(self, costs: ListT[ExtensionCost]):
+        """
+        Writes the time, compiler peak memory, generated C size & binary size of each extension
+        """
+        args = self.options.costs
+        if not costs:
+            return
+
+        costs_json, costs_csv = write_costs(costs, self.costs_dir)
+        self.app.display_info(f"Build costs written to {costs_json} & {costs_csv}")
+        self.app.display_info(f"{'total':>8} {'cython':>8} {'cc':>8} {'rss':>9} {'c lines':>8} {'size':>9}  module")
+        for c in costs[: args.top]:
+            self.app.display_info(
+                f"{c.total_seconds:>7.2f}s {c.cythonize_seconds:>7.2f}s {c.compile_seconds + c.link_seconds:>7.2f}s "
+                f"{format_size(c.peak_rss):>9} {c.c_lines:>8} {format_size(c.binary_size):>9}  {c.module}"
+            )
+
+    def record_history(self, seconds: float):
+        """
+        Stores the build in the history database, and compares it with the median of previous comparable builds
+        """
+        args = self.options.history
+        hook = os.getpid()
+        phases = {}
+        for event in TRACER.events:
+            if event["pid"] == hook and event["cat"] == "hook":
+                phases[event["name"]] = phases.get(event["name"], 0) + event["dur"] / US
+        build = BuildRecord(
+            target=self.target_name,
+            seconds=seconds,
+            artifact_size=sum(os.path.getsize(f) for f in self.compiled),
+            costs=self.build_costs,
+            phases=phases,
+            profile=self.options.profile,
+        )
+        conn = connect(os.path.join(self.cache_dir, "history.sqlite3"))
+        try:
+            base = baseline(conn, build, args.builds)
+            regressed = history_regressions(build, base, args)
+            record_build(conn, build, accepted=not (regressed and args.fail))
+        finally:
+            conn.close()
+
+        self.app.display_info(
+            f"{build.kind} build in {seconds:.2f}s, {build.compiled}/{build.extensions} extensions compiled "
+            f"({build.cache_hit_rate:.0%} cache hits), {format_size(build.artifact_size)} of artifacts"
+        )
+        if base is not None:
+            self.app.display_info(
+                f"baseline of {base['builds']} {build.kind} builds: {base['seconds']:.2f}s, "
+                f"{format_size(base['artifact_size'])} of artifacts"
+            )
+        display = self.app.display_error if args.fail else self.app.display_warning
+        for metric, before, after in regressed:
+            display(f"{metric} regressed from {before:.2f} to {after:.2f} ({after / before - 1:+.0%})")
+        if regressed and args.fail:
+            msg = "build performance regression"
+            raise Exception(msg)
+
+    def write_trace(self):
+        trace = self.options.trace
+        if not trace:
+            return
+        if isinstance(trace, str):
+            output = os.path.join(self.root, trace)
+        else:
+            output = os.path.join(self.cache_dir, "trace.json")
+        TRACER.write(output)
+        self.app.display_info(f"Build trace written to {output}, open it with https://ui.perfetto.dev")
+
     @property
     @memo
     def artifact_globs(self):
@@ -250,10 +637,37 @@ class CythonBuildHook(BuildHookInterface):
         self.rm_recurse(self.intermediate)
         self.rm_recurse(self.compiled)
 
+    @property
+    @memo
+    def daemon_resolved(self) -> UnionT[dict, None]:
+        """Options & discovered files kept by the build daemon, which resolves them again as the project changes"""
+        # read before the options are parsed, as the daemon returns them parsed
+        given = self.config.get("options", {})
+        if (
+            not parse_daemon(given.get("daemon", False)).enabled
+            or not build_daemon.supported()
+            or build_daemon.serving()
+        ):
+            return None
+        cache_dir = os.path.join(self.root, given.get("cache_dir") or os.path.join(".hatch", "cython"))
+        resolved = build_daemon.resolve(
+            build_daemon.socket_path(cache_dir),
+            root=os.path.realpath(self.root),
+            config=self.config,
+            target=self.target_name,
+            env=dict(os.environ),
+        )
+        if resolved is None:
+            return None
+        for level, message in resolved["messages"]:
+            getattr(self.app, f"display_{level}")(message)
+        self.app.display_debug(f"Reused {' & '.join(resolved['reused']) or 'nothing'} resolved by the build daemon")
+        return resolved
+
     @property
     @memo
     def options(self):
-        config = parse_from_dict(self)
+        config = self.daemon_resolved["options"] if self.daemon_resolved is not None else self.resolve_options()
         if config.compile_py:
             self.precompiled_extensions.add(".py")
         if config.files.explicit_targets:
@@ -263,6 +677,334 @@ class CythonBuildHook(BuildHookInterface):
             self.precompiled_extensions.add(".cpp")
         return config
 
+    def resolve_options(self) -> Config:
+        config = parse_from_dict(self)
+        if config.hotspots.enabled:
+            self.select_hotspots(config)
+        if config.tiers.enabled and config.tiers.profile:
+            package = config.src if config.src is not None else self.metadata.name
+            config.tiers.use_profile(
+                profiled_modules(os.path.join(self.root, config.tiers.profile), config.tiers.format, package)
+            )
+        if config.fallback.enabled:
+            self.fall_back(config)
+        if config.tuned:
+            self.apply_tuned(config)
+        return config
+
+    def option_inputs(self) -> ListStr:
+        """Files the options are resolved from, besides the configuration given to the hook"""
+        config = self.options
+        files = ["pyproject.toml", "hatch.toml"]
+        if config.tuned:
+            files.append(config.tuned if isinstance(config.tuned, str) else TUNED)
+        if config.hotspots.enabled and config.hotspots.profile:
+            files.append(config.hotspots.profile)
+        if config.tiers.enabled and config.tiers.profile:
+            files.append(config.tiers.profile)
+        if config.fallback.enabled:
+            files.extend((config.fallback.file, config.fallback.speedups))
+        return [os.path.join(self.root, f) for f in files]
+
+    def fall_back(self, config: Config):
+        """Excludes the modules listed in the fallback file, regenerated from new speedup measurements"""
+        modules, added, removed = update_fallback(config.fallback, self.root)
+        for module in added:
+            self.app.display_info(f"{module} falls back to pure python")
+        for module in removed:
+            self.app.display_info(f"{module} is compiled again")
+        if added or removed:
+            self.app.display_warning(f"{config.fallback.file} was updated, review & commit it")
+        config.files.fall_back(modules, "./src" if self.is_src else ".")
+
+    def apply_tuned(self, config: Config):
+        """Prepends the tuned directives as overrides, so configured overrides still take priority"""
+        file = os.path.join(self.root, config.tuned if isinstance(config.tuned, str) else TUNED)
+        if not os.path.exists(file):
+            self.app.display_warning(f"{file} does not exist, run `python -m hatch_cython.tune` to create it")
+            return
+        config.overrides[:0] = tuned_overrides(file, "./src" if self.is_src else ".")
+
+    def select_hotspots(self, config: Config):
+        """Targets the modules covering the configured share of the profiled runtime"""
+        package = config.src if config.src is not None else self.metadata.name
+        modules, covered = hot_modules(config.hotspots, self.root, package)
+        if not modules:
+            self.app.display_warning(f"{config.hotspots.profile} has no samples within {package}")
+        self.app.display_info(
+            f"Compiling {len(modules)} hot modules covering {covered:.1%} of profiled time: {', '.join(modules)}"
+        )
+        config.files.compile_only(modules, "./src" if self.is_src else ".")
+
+    @property
+    def fallback_artifacts(self) -> ListStr:
+        # extensions & generated sources left over from when the modules were compiled
+        base = "./src" if self.is_src else "."
+        found = []
+        for module in self.options.files.fallback:
+            path = f"{base}/{module.replace('.', '/')}"
+            for f in (*glob(f"{path}.*"), *glob(f"{path}/__init__.*")):
+                ext = os.path.splitext(f)[1]
+                if ext in self.compiled_extensions or (
+                    ext in self.intermediate_extensions and is_cython_generated_file(f, if_not_found=False)
+                ):
+                    found.append(f)
+        return found
+
+    @property
+    def build_dirs(self) -> TupleT[str, str]:
+        """build_lib & build_temp, kept between builds so that setuptools skips the extensions up to date"""
+        base = os.path.join(self.cache_dir, "build", sys.implementation.cache_tag)
+        return os.path.join(base, "lib"), os.path.join(base, "temp")
+
+    def built_extension(self, module: str, base: UnionT[str, None] = None) -> UnionT[str, None]:
+        """The extension built before for the module, within its bundle if bundled
+
+        Args:
+            base (str | None): directory of the top level package, by default the project's; e.g. the build_lib
+        """
+        if base is None:
+            base = "./src" if self.is_src else "."
+        path = os.path.join(base, *self.loader_routes.get(module, module).split("."))
+        return next((path + suffix for suffix in EXTENSION_SUFFIXES if os.path.exists(path + suffix)), None)
+
+    def select_only(self):
+        """Compiles only the modules selected by `files.only`; the others keep the extensions built before"""
+        grouped = self.grouped_included_files
+        selected = self.options.files.select([ex["name"] for ex in grouped])
+        if selected is None:
+            return
+        unbuilt, stale = [], []
+        for ex in grouped:
+            if ex["name"] in selected:
+                continue
+            built = self.built_extension(ex["name"])
+            if built is None:
+                unbuilt.append(ex["name"])
+            elif os.path.getmtime(built) < max(os.path.getmtime(f) for f in ex["files"]):
+                stale.append(ex["name"])
+        if unbuilt:
+            # the wheel would miss them otherwise
+            self.app.display_info(f"No extensions built yet for {', '.join(sorted(unbuilt))}, compiling them too")
+        if stale:
+            self.app.display_warning(f"Reusing extensions older than their sources: {', '.join(sorted(stale))}")
+        self.only = selected.union(unbuilt)
+
+    @property
+    @memo
+    def extension_digests(self) -> DictT[str, str]:
+        """Identifies the resolved arguments of each extension, which setuptools does not compare"""
+        options = self.options
+        shared = {
+            "compile_args": options.compile_args_for_platform,
+            "link_args": options.compile_links_for_platform,
+            "define_macros": options.define_macros,
+            "directives": options.directives,
+            "includes": options.includes,
+            "libraries": options.libraries,
+            "library_dirs": options.library_dirs,
+            "cythonize_kwargs": options.cythonize_kwargs,
+            "compile_kwargs": options.compile_kwargs,
+            "lto": options.lto,
+        }
+        return {
+            ex["name"]: digest({**shared, "extension": {**ex, "files": sorted(ex["files"])}})
+            for ex in self.extensions
+        }
+
+    def generated_sources(self, ex: ExtensionArg) -> ListStr:
+        found = []
+        for f in ex["files"]:
+            for ext in (".c", ".cpp"):
+                generated = os.path.splitext(f)[0] + ext
+                if generated != f and is_cython_generated_file(generated, if_not_found=False):
+                    found.append(generated)
+        return found
+
+    def invalidate_changed(self, extensions: ListT[ExtensionArg]):
+        """
+        Removes what was built of the extensions whose arguments or Cython version changed since they were built,
+        as setuptools & cythonize only compare timestamps
+        """
+        manifest = read_manifest(self.cache_dir)
+        toolchain = changed_toolchain(manifest)
+        previous = manifest["extensions"]
+        digests = self.extension_digests
+        changed = [
+            ex
+            for ex in extensions
+            if toolchain or previous.get(ex["name"], digests[ex["name"]]) != digests[ex["name"]]
+        ]
+        if not changed:
+            return
+        reason = "; ".join(toolchain) or "arguments changed"
+        self.app.display_info(f"{reason}, rebuilding {', '.join(ex['name'] for ex in changed)}")
+        built = [self.built_extension(ex["name"], base) for ex in changed for base in (None, self.build_dirs[0])]
+        self.rm_recurse([*(f for ex in changed for f in self.generated_sources(ex)), *filter(None, built)])
+
+    def excluded_modules(self) -> DictT[str, str]:
+        """Modules found by discovery but not compiled, with the reason"""
+        included = {ex["name"] for ex in self.grouped_included_files}
+        fallback = set(self.options.files.fallback)
+        excluded = {}
+        for patt in self.precompiled_globs:
+            for f in glob(patt, recursive=True):
+                norm = self.normalize_glob(f)
+                ext = os.path.splitext(norm)[1]
+                if self.wanted(f) or ext == ".pxd":
+                    continue
+                if ext in self.intermediate_extensions and is_cython_generated_file(f, if_not_found=False):
+                    continue
+                module = self.module_of(norm)
+                if module in included:
+                    continue
+                if module in fallback:
+                    excluded[module] = "falls back to pure python"
+                elif any(re.match(e, norm, re.IGNORECASE) for e in self.options_exclude):
+                    excluded[module] = "excluded by files.exclude"
+                else:
+                    excluded[module] = "not matched by files.targets"
+        return excluded
+
+    def estimated_seconds(self) -> DictT[str, float]:
+        """Seconds each module took to build before: from the build history, else the last costs report"""
+        estimates = read_costs(os.path.join(self.costs_dir, "costs.json"))
+        database = os.path.join(self.cache_dir, "history.sqlite3")
+        if os.path.exists(database):
+            conn = connect(database)
+            try:
+                estimates.update(module_seconds(conn, machine_class(), self.options.history.builds))
+            finally:
+                conn.close()
+        return estimates
+
+    def plan(self) -> ListT[ExtensionPlan]:
+        """What a build would do with each extension & why, without building"""
+        manifest = read_manifest(self.cache_dir)
+        toolchain = changed_toolchain(manifest)
+        digests = self.extension_digests
+        estimates = self.estimated_seconds()
+        extensions = sorted(self.extensions, key=lambda ex: ex["name"])
+        selected = self.options.files.select([ex["name"] for ex in extensions])
+        tree = create_dependency_tree(quiet=True)
+
+        plans: DictT[str, ExtensionPlan] = {}
+        for ex in extensions:
+            name = ex["name"]
+            output = self.built_extension(name)
+            plan = ExtensionPlan(module=name, state=CACHED, output=output, estimated_seconds=estimates.get(name))
+            plans[name] = plan
+            if output is None:
+                plan.reasons.append("not built yet")
+            elif self.built_extension(name, self.build_dirs[0]) is None:
+                plan.reasons.append("not in the build cache")
+            else:
+                plan.reasons.extend(toolchain)
+                if manifest["extensions"].get(name, digests[name]) != digests[name]:
+                    plan.reasons.append("arguments changed")
+                built = os.path.getmtime(output)
+                for f in sorted(ex["files"]):
+                    if os.path.getmtime(f) > built:
+                        plan.reasons.append(f"source changed: {f}")
+                    elif os.path.exists(f"{f}.in") and os.path.getmtime(f"{f}.in") > built:
+                        plan.reasons.append(f"template changed: {f}.in")
+                    if os.path.splitext(f)[1] in (".py", ".pyx"):
+                        plan.reasons.extend(
+                            f"dependency changed: {os.path.relpath(d)}"
+                            for d in sorted(tree.all_dependencies(f))
+                            if os.path.realpath(d) != os.path.realpath(f) and os.path.getmtime(d) > built
+                        )
+            if plan.reasons:
+                plan.state = REBUILD
+            if selected is not None and name not in selected and output is not None:
+                stale = " although older than its sources" if plan.reasons else ""
+                plan.state, plan.reasons = REUSED, [f"not selected by files.only{stale}"]
+
+        # a bundle links all its members, so any of them changing rebuilds every one
+        for bundle, members in self.bundles.items():
+            rebuilt = [m for m in members if m in plans and plans[m].state == REBUILD]
+            for member in members:
+                if rebuilt and member in plans and plans[member].state == CACHED:
+                    plans[member].state = REBUILD
+                    plans[member].reasons.append(f"bundled with {', '.join(rebuilt)} into {bundle}")
+
+        excluded = [ExtensionPlan(module=m, state=EXCLUDED, reasons=[r]) for m, r in self.excluded_modules().items()]
+        return [*plans.values(), *sorted(excluded, key=lambda p: p.module)]
+
+    @property
+    @memo
+    def shard(self) -> UnionT[Shard, None]:
+        return parse_shard(os.environ.get(SHARD_ENV))
+
+    @property
+    def costs_dir(self) -> str:
+        output = self.options.costs.output
+        return os.path.join(self.root, output) if output else os.path.join(self.cache_dir, "costs")
+
+    @property
+    @memo
+    def shards(self) -> ListT[ListStr]:
+        """Modules of each shard. Bundles are built whole, by one shard"""
+        routes = self.loader_routes
+        units: DictT[str, ListStr] = {}
+        sizes = {}
+        for ex in self.grouped_included_files:
+            units.setdefault(routes.get(ex["name"], ex["name"]), []).append(ex["name"])
+            sizes[ex["name"]] = sum(os.path.getsize(f) for f in ex["files"])
+        costs = estimate_costs(units, sizes, read_costs(os.path.join(self.costs_dir, "costs.json")))
+        return [sorted(m for unit in shard for m in units[unit]) for shard in assign(costs, self.shard.count)]
+
+    @property
+    @memo
+    def fingerprint(self) -> str:
+        # before the build resolves lto & the like, as merging does not
+        return fingerprint(self.extensions, self.root)
+
+    def export_shard(self, build_lib: str):
+        output = os.environ.get(SHARD_DIR_ENV) or os.path.join(self.cache_dir, "shards")
+        manifest = ShardManifest(
+            index=self.shard.index,
+            count=self.shard.count,
+            fingerprint=self.fingerprint,
+            assignment=digest(self.shards),
+            modules=self.shards[self.shard.index - 1],
+        )
+        shard_dir = export_shard(build_lib, output, manifest)
+        self.app.display_info(f"Shard {self.shard.index}/{self.shard.count} written to {shard_dir}")
+
+    def merge_shards(self, directory: str):
+        """Copies the extensions built by all shards into place, in lieu of compiling"""
+        base = os.path.join(self.root, "src") if self.is_src else self.root
+        try:
+            copied = merge_shards(directory, base, [ex["name"] for ex in self.extensions], self.fingerprint)
+        except ValueError as e:
+            self.app.display_error(f"cannot merge shards: {e}")
+            msg = "failed merging shards"
+            raise Exception(msg) from e
+        self.app.display_info(f"Merged {len(copied)} files from the shards in {directory}")
+
+    def remote_workers(self) -> ListT[TupleT[str, int]]:
+        """Reachable compile workers of this platform, with their slots"""
+        addresses = self.options.remote.addresses
+        if not addresses:
+            self.app.display_warning("Remote compiling is enabled without workers, compiling locally")
+            return []
+        available, unavailable = probe(addresses)
+        for address, reason in unavailable.items():
+            self.app.display_warning(f"Compile worker {address} is unavailable: {reason}")
+        if not available:
+            self.app.display_warning("No compile workers available, compiling locally")
+        return available
+
+    def precompiled_headers(self) -> UnionT[TupleT[DictT[str, ListStr], str], None]:
+        """Headers to precompile for C & C++ units, and the directory they are kept in"""
+        if self.is_windows:
+            self.app.display_warning("Precompiled headers are only supported with gcc & clang, compiling without")
+            return None
+        pch = self.options.pch
+        headers = {language: pch.for_language(language) for language in ("c", "c++")}
+        return headers, os.path.join(self.cache_dir, "pch")
+
     @property
     def compile_parallel(self) -> bool:
         return self.options.compile_parallel    
@@ -275,24 +1017,104 @@ class CythonBuildHook(BuildHookInterface):
     def wheel(self):
         return self.target_name == "wheel"
 
+    def run_setup(self, command: ListStr) -> TupleT[int, str]:
+        """Runs the generated setup.py in the build daemon if enabled & available, else in a subprocess
+
+        Returns:
+            TupleT[int, str]: (returncode, output)
+        """
+        daemon = self.options.daemon
+        if daemon.enabled and build_daemon.supported():
+            path = build_daemon.socket_path(self.cache_dir)
+            env = self.options.envflags.env
+            result = build_daemon.run_setup(path, command[1:], env=env, cwd=os.getcwd())
+            # no daemon, or a stale one which exits on the request
+            if result is None and daemon.autostart and build_daemon.start(path, daemon.idle_timeout):
+                self.app.display_info(f"Started build daemon on {path}")
+                result = build_daemon.run_setup(path, command[1:], env=env, cwd=os.getcwd())
+            if result is not None:
+                self.app.display_debug(f"Built in daemon {path}")
+                return result
+            self.app.display_warning("Build daemon unavailable, building in a subprocess")
+
+        process = subprocess.run(  # noqa: S603, PLW1510
+            command,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            env=self.options.envflags.env,
+        )
+        return process.returncode, process.stdout.decode("utf-8")
+
     def build_ext(self):
-        with self.get_build_dirs() as temp:
-            self.render_templates()
+        # builds of the project share its build dirs
+        with self.get_build_dirs() as temp, locked(os.path.join(self.cache_dir, "build.lock")):
+            with span("render templates"):
+                self.render_templates()
+            # before resolving lto, as the planner does
+            digests = self.extension_digests
+            with span("resolve lto"):
+                self.options.resolve_lto(self, os.path.join(self.cache_dir, "lto"))
+
+            if self.shard is None:
+                shared_temp_build_dir, temp_build_dir = self.build_dirs
+            else:
+                # a shard exports its whole build dir, so it starts empty
+                shared_temp_build_dir = os.path.join(temp, "build")
+                temp_build_dir = os.path.join(temp, "tmp")
 
-            shared_temp_build_dir = os.path.join(temp, "build")
-            temp_build_dir = os.path.join(temp, "tmp")
+            os.makedirs(shared_temp_build_dir, exist_ok=True)
+            os.makedirs(temp_build_dir, exist_ok=True)
 
-            os.mkdir(shared_temp_build_dir)
-            os.mkdir(temp_build_dir)
+            shared_utility = self.options.resolve_shared_utility(
+                self, self.dir_name, os.path.join(self.cache_dir, "shared")
+            )
+            self.invalidate_generated("shared_utility", shared_utility and shared_utility[0])
+            extensions = self.extensions
+            self.invalidate_generated(
+                "directives",
+                [self.options.directives, *({ex["name"]: ex["directives"]} for ex in extensions if "directives" in ex)],
+            )
+            # profiles also change compile args & macros, which distutils does not track
+            self.invalidate_generated("profile", self.options.profile)
+            if self.options.profile:
+                self.app.display_info(f"Using build profile '{self.options.profile}'")
+            if self.options.tiers.enabled:
+                self.report_tiers(extensions)
+            for conflict in self.options.unify_bundles(extensions, self.bundles):
+                self.app.display_warning(conflict)
+            if self.only is not None:
+                # a bundle links all its members, so none can be rebuilt alone
+                routes = self.loader_routes
+                only = self.only.union(*(self.bundles[routes[name]] for name in self.only if name in routes))
+                extensions = [ex for ex in extensions if ex["name"] in only]
+                self.app.display_info(f"Compiling {', '.join(ex['name'] for ex in extensions) or 'no extensions'}")
+            self.invalidate_changed(extensions)
 
             self.app.display_info("Building c/c++ extensions...")
             self.app.display_info(self.normalized_included_files)
+            events = os.path.join(temp, "events.jsonl") if self.options.instrument else None
+            workers = self.remote_workers() if self.options.remote.enabled else []
+            helpers = self.helper_libraries
+            pch = self.precompiled_headers() if self.options.pch.enabled else None
+            if helpers:
+                self.app.display_info(f"Building helper libraries {', '.join(name for name, _ in helpers)}")
             setup_file = os.path.join(temp, "setup.py")
-            with open(setup_file, "w") as f:
+            with span("generate setup.py"), open(setup_file, "w") as f:
                 setup = setup_py(
-                    *self.grouped_included_files,
+                    *extensions,
                     options=self.options,
                     sdist=self.sdist,
+                    bundles=self.bundles,
+                    shared_utility=shared_utility,
+                    variants=self.variants,
+                    # beside build_temp, so the copies keep the paths & mtimes its objects were built from
+                    variant_dir=os.path.join(os.path.dirname(temp_build_dir), "isa"),
+                    costs=events,
+                    atomic=self.atomic,
+                    remote=(workers, self.options.remote.timeout) if workers else None,
+                    helpers=helpers,
+                    clib_dir=os.path.join(self.cache_dir, "clib", digest(helpers)[:16]) if helpers else None,
+                    pch=pch,
                 )
                 self.app.display_debug(setup)
                 f.write(setup)
@@ -301,6 +1123,7 @@ class CythonBuildHook(BuildHookInterface):
             command = [
                 sys.executable,
                 setup_file,
+                *(["build_clib"] if helpers else []),
                 "build_ext",
                 "--inplace",
                 "--verbose",
@@ -310,28 +1133,44 @@ class CythonBuildHook(BuildHookInterface):
                 temp_build_dir,
             ]
             
+            jobs = multiprocessing.cpu_count() if self.compile_parallel else 0
             if self.compile_parallel:
                 self.app.display_info(f"Compiling in parallel ({self.compile_parallel})")
-                command.extend(["-j", str(multiprocessing.cpu_count())])
+            if workers:
+                # enough extensions in flight to keep every worker slot busy
+                jobs = max(jobs, sum(slots for _, slots in workers))
+                self.app.display_info(f"Compiling on {len(workers)} workers ({jobs} jobs)")
+            if jobs:
+                command.extend(["-j", str(jobs)])
             
-            process = subprocess.run(  # noqa: PLW1510
-                command,   
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                env=self.options.envflags.env,
-            )
-            stdout = process.stdout.decode("utf-8")
-            if process.returncode:
-                self.app.display_error(f"cythonize exited non null status {process.returncode}")
+            with span("setup.py build_ext", command=command):
+                returncode, stdout = self.run_setup(command)
+            if events:
+                build_events = read_events(events)
+                TRACER.extend_build(build_events)
+                self.build_costs = collect(build_events)
+            if returncode:
+                self.app.display_error(f"cythonize exited non null status {returncode}")
                 self.app.display_error(stdout)
                 msg = "failed compilation"
                 raise Exception(msg)
             else:
                 self.app.display_info(stdout)
+            write_manifest(self.cache_dir, {ex["name"]: digests[ex["name"]] for ex in extensions})
+            if self.shard is not None:
+                with span("export shard"):
+                    self.export_shard(shared_temp_build_dir)
+
+            if self.options.annotate:
+                with span("annotation report"):
+                    self.report_annotations(extensions)
+            if self.options.costs.enabled:
+                with span("costs report"):
+                    self.report_costs(self.build_costs)
 
             self.app.display_success("Post-build artifacts")
 
-    def initialize(self, _: str, build_data: dict):
+    def initialize(self, version: str, build_data: dict):
         self.app.display_mini_header(self.PLUGIN_NAME)
         self.app.display_debug("options")
         self.app.display_debug(self.options.asdict(), level=1)
@@ -339,17 +1178,47 @@ class CythonBuildHook(BuildHookInterface):
         self.app.display_debug(self.sdist, level=1)
         self.app.display_waiting("pre-build artifacts")
 
-        if len(self.grouped_included_files) != 0:
-            self.build_ext()
-            self.app.display_info(glob(f"{self.project_dir}/*/**", recursive=True))
+        start = perf_counter()
+        try:
+            if self.options.files.fallback:
+                self.rm_recurse(self.fallback_artifacts)
+            if self.options.lazy and version == "editable" and not self.sdist:
+                with span("lazy loader"):
+                    build_data.setdefault("force_include_editable", {}).update(self.write_lazy_loader())
+                self.app.display_info("Extensions are compiled on first import")
+                return
+            with span("discovery"):
+                grouped = self.grouped_included_files
+            merge = os.environ.get(MERGE_ENV)
+            if merge:
+                with span("merge shards"):
+                    self.merge_shards(merge)
+            elif len(grouped) != 0:
+                if self.shard is not None:
+                    _ = self.fingerprint
+                    self.only = set(self.shards[self.shard.index - 1])
+                    self.app.display_info(f"Building shard {self.shard.index}/{self.shard.count}")
+                elif self.only is None:
+                    self.select_only()
+                with span("build_ext"):
+                    self.build_ext()
+                self.app.display_info(glob(f"{self.project_dir}/*/**", recursive=True))
+
+            if self.sdist and not self.options.compiled_sdist:
+                with span("clean"):
+                    self.clean(None)
 
-        if self.sdist and not self.options.compiled_sdist:
-            self.clean(None)
+            with span("collect artifacts"):
+                build_data["infer_tag"] = True
+                build_data["artifacts"].extend(self.artifacts)
+                build_data["force_include"].update(self.inclusion_map)
+                build_data["force_include"].update(self.write_loader())
+                build_data["pure_python"] = False
 
-        build_data["infer_tag"] = True
-        build_data["artifacts"].extend(self.artifacts)
-        build_data["force_include"].update(self.inclusion_map)
-        build_data["pure_python"] = False
+            if self.options.history.enabled and len(grouped) != 0:
+                self.record_history(perf_counter() - start)
+        finally:
+            self.write_trace()
 
         self.app.display_info("Extensions complete")
         self.app.display_debug(build_data)
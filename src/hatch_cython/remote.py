@@ -0,0 +1,321 @@
+"""
+Distributed compiling: translation units are preprocessed locally, then compiled by a pool of workers, which
+only need the same compiler, as the preprocessed source carries every header it includes. A unit is compiled
+locally whenever no worker is reachable, a worker fails, or its arguments refer to the local machine.
+
+    python -m hatch_cython.remote worker [--host 127.0.0.1] [--port 3632] [--slots N]
+    python -m hatch_cython.remote status host:port [host:port ...]
+
+Workers compile whatever their clients send; bind them to localhost or a trusted network only.
+"""
+
+import argparse
+import json
+import os
+import re
+import shutil
+import socket
+import socketserver
+import subprocess
+import sysconfig
+import tempfile
+import threading
+
+try:
+    from distutils.unixccompiler import UnixCCompiler
+except ImportError:
+    # python 3.12+, without setuptools' distutils shim
+    from setuptools._distutils.unixccompiler import UnixCCompiler
+
+from hatch_cython.__about__ import __version__
+from hatch_cython.config.remote import DEFAULT_PORT, parse_address
+from hatch_cython.types import DictT, ListStr, ListT, TupleT, UnionT
+
+# compilers a worker runs, optionally target prefixed & version suffixed, e.g. x86_64-linux-gnu-gcc-12
+COMPILERS = re.compile(r"^([\w.+-]+-)?(gcc|g\+\+|cc|c\+\+|clang|clang\+\+)(-[\d.]+)?$")
+# preprocessor arguments, all applied locally. given alone, they take the next argument as their value
+PREPROCESSOR = ("-I", "-D", "-U", "-include", "-imacros", "-isystem", "-iquote", "-idirafter", "-isysroot")
+# arguments a worker refuses: they name files, outputs or programs on its machine
+REFUSED = (*PREPROCESSOR, "-o", "@", "-B", "-fplugin", "-specs", "--specs", "-wrapper", "-save-temps", "-M", "-x")
+# arguments compiled locally: their meaning depends on the machine or its files
+LOCAL_ONLY = re.compile(r"^(-m(arch|tune|cpu)=native|-fprofile-(use|generate|dir)|-fauto-profile|-x$)")
+PREPROCESSED = {".c": ".i", ".cc": ".ii", ".cpp": ".ii", ".cxx": ".ii", ".C": ".ii"}
+
+
+def encode(header: dict, payload: bytes = b"") -> bytes:
+    return json.dumps({**header, "size": len(payload)}).encode() + b"\n" + payload
+
+
+def decode(rfile) -> UnionT[TupleT[dict, bytes], None]:
+    line = rfile.readline()
+    if not line:
+        return None
+    header = json.loads(line)
+    payload = rfile.read(header["size"])
+    if len(payload) != header["size"]:
+        return None
+    return header, payload
+
+
+def strip_preprocessor(args: ListStr) -> ListStr:
+    stripped = []
+    skip = False
+    for arg in args:
+        if skip:
+            skip = False
+        elif arg in PREPROCESSOR:
+            skip = True
+        elif not arg.startswith(PREPROCESSOR):
+            stripped.append(arg)
+    return stripped
+
+
+def refused(compiler: ListStr, args: ListStr) -> UnionT[str, None]:
+    if not compiler or not COMPILERS.match(os.path.basename(compiler[0])):
+        return f"compiler {compiler[:1]!r} is not allowed"
+    bad = [a for a in [*compiler[1:], *args] if a.startswith(REFUSED)]
+    return f"arguments {bad!r} are not allowed" if bad else None
+
+
+def compile_unit(header: dict, source: bytes) -> TupleT[dict, bytes]:
+    """Compiles one preprocessed translation unit, returning the object"""
+    compiler, args = header["compiler"], header["args"]
+    reason = refused(compiler, args)
+    if reason is not None:
+        return {"ok": False, "output": reason}, b""
+    if shutil.which(compiler[0]) is None:
+        return {"ok": False, "output": f"compiler {compiler[0]!r} not found"}, b""
+    with tempfile.TemporaryDirectory(prefix="hatch-cython-unit-") as temp:
+        src = os.path.join(temp, "unit" + header["suffix"])
+        obj = os.path.join(temp, "unit.o")
+        with open(src, "wb") as f:
+            f.write(source)
+        try:
+            process = subprocess.run(  # noqa: S603
+                [*compiler, *args, "-c", src, "-o", obj],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                cwd=temp,
+                timeout=header.get("timeout"),
+                check=False,
+            )
+        except subprocess.TimeoutExpired:
+            return {"ok": False, "output": "timed out"}, b""
+        output = process.stdout.decode("utf-8", "replace")
+        if process.returncode:
+            return {"ok": False, "output": output}, b""
+        with open(obj, "rb") as f:
+            return {"ok": True, "output": output}, f.read()
+
+
+def describe(slots: int) -> dict:
+    return {"ok": True, "slots": slots, "platform": sysconfig.get_platform(), "version": __version__}
+
+
+class Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        while True:
+            message = decode(self.rfile)
+            if message is None:
+                return
+            header, payload = message
+            if header.get("op") == "status":
+                reply = describe(self.server.slots), b""
+            elif header.get("op") == "compile":
+                with self.server.running:
+                    reply = compile_unit(header, payload)
+            else:
+                reply = {"ok": False, "output": f"unknown op {header.get('op')!r}"}, b""
+            self.wfile.write(encode(*reply))
+            self.wfile.flush()
+
+
+class Worker(socketserver.ThreadingTCPServer):
+    """Compiles up to `slots` translation units at once; further requests wait for a slot"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address: TupleT[str, int], slots: int):
+        super().__init__(address, Handler)
+        self.slots = slots
+        self.running = threading.BoundedSemaphore(slots)
+
+    @property
+    def address(self) -> str:
+        host, port = self.server_address[:2]
+        return f"{host}:{port}"
+
+
+def request(address: str, header: dict, payload: bytes, timeout: float) -> TupleT[dict, bytes]:
+    """Raises OSError if the worker is unreachable or hung up"""
+    with socket.create_connection(parse_address(address), timeout=timeout) as conn:
+        conn.sendall(encode(header, payload))
+        with conn.makefile("rb") as rfile:
+            message = decode(rfile)
+    if message is None:
+        msg = f"worker {address} hung up"
+        raise ConnectionError(msg)
+    return message
+
+
+def status(address: str, timeout: float = 2.0) -> UnionT[dict, None]:
+    try:
+        header, _ = request(address, {"op": "status"}, b"", timeout)
+    except (OSError, ValueError):
+        return None
+    return header
+
+
+def probe(addresses: ListStr, timeout: float = 2.0) -> TupleT[ListT[TupleT[str, int]], DictT[str, str]]:
+    """Workers able to build for this platform, with their slots, and the reason each other one is not"""
+    available, unavailable = [], {}
+    for address in addresses:
+        reply = status(address, timeout)
+        if reply is None:
+            unavailable[address] = "unreachable"
+        elif reply.get("platform") != sysconfig.get_platform():
+            unavailable[address] = f"builds for {reply.get('platform')}"
+        else:
+            available.append((address, int(reply.get("slots", 1))))
+    return available, unavailable
+
+
+class Pool:
+    """Hands each unit to the worker with the most free slots; a failing worker gets no further units"""
+
+    def __init__(self, workers: ListT[TupleT[str, int]]):
+        self.slots = dict(workers)
+        self.running = dict.fromkeys(self.slots, 0)
+        self.lock = threading.Lock()
+
+    def acquire(self) -> UnionT[str, None]:
+        with self.lock:
+            if not self.slots:
+                return None
+            address = max(self.slots, key=lambda a: (self.slots[a] - self.running[a], -self.running[a]))
+            self.running[address] += 1
+            return address
+
+    def release(self, address: str):
+        with self.lock:
+            self.running[address] -= 1
+
+    def fail(self, address: str):
+        with self.lock:
+            self.slots.pop(address, None)
+
+
+def remote_compile(
+    pool: Pool,
+    compiler: ListStr,
+    src: str,
+    obj: str,
+    *,
+    cc_args: ListStr,
+    extra_postargs: ListStr,
+    timeout: float,
+) -> bool:
+    """Compiles `src` to `obj` on a worker
+
+    Returns:
+        bool: whether it was compiled; if not, it is for the caller to compile locally
+    """
+    suffix = PREPROCESSED.get(os.path.splitext(src)[1])
+    args = [a for a in cc_args if a != "-c"]
+    if suffix is None or any(LOCAL_ONLY.match(a) for a in [*compiler, *args, *extra_postargs]):
+        return False
+    with tempfile.TemporaryDirectory(prefix="hatch-cython-pp-") as temp:
+        preprocessed = os.path.join(temp, "unit" + suffix)
+        process = subprocess.run(  # noqa: S603
+            [*compiler, *args, "-E", src, "-o", preprocessed, *extra_postargs],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            check=False,
+        )
+        if process.returncode:
+            # the local compile reports the error
+            return False
+        with open(preprocessed, "rb") as f:
+            source = f.read()
+
+    header = {
+        "op": "compile",
+        "compiler": strip_preprocessor(compiler),
+        "args": strip_preprocessor([*args, *extra_postargs]),
+        "suffix": suffix,
+        "timeout": timeout,
+    }
+    while True:
+        address = pool.acquire()
+        if address is None:
+            return False
+        try:
+            # queueing for a slot counts towards the timeout as well
+            reply, data = request(address, header, source, timeout * 2)
+        except (OSError, ValueError) as e:
+            print(f"worker {address} failed ({e}), no longer using it")  # noqa: T201
+            pool.fail(address)
+            continue
+        finally:
+            pool.release(address)
+        if reply.get("output"):
+            print(reply["output"], end="" if reply["output"].endswith("\n") else "\n")  # noqa: T201
+        if not reply.get("ok"):
+            return False
+        temp = f"{obj}.tmp"
+        with open(temp, "wb") as f:
+            f.write(data)
+        os.replace(temp, obj)
+        print(f"compiled {src} on {address}", flush=True)  # noqa: T201
+        return True
+
+
+def distribute(workers: ListT[TupleT[str, int]], timeout: float):
+    """Wraps the unix compiler to compile each translation unit on the workers, else locally"""
+    pool = Pool(workers)
+    compile_ = UnixCCompiler._compile
+
+    def distributed_compile(self, obj, src, ext, cc_args, extra_postargs, pp_opts):  # noqa: PLR0917
+        compiler = self.compiler_so
+        if self.detect_language(src) == "c++" and getattr(self, "compiler_so_cxx", None):
+            compiler = self.compiler_so_cxx
+        if not self.dry_run and remote_compile(
+            pool, compiler, src, obj, cc_args=cc_args, extra_postargs=extra_postargs, timeout=timeout
+        ):
+            return None
+        return compile_(self, obj, src, ext, cc_args, extra_postargs, pp_opts)
+
+    UnixCCompiler._compile = distributed_compile
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m hatch_cython.remote", description=__doc__.strip().split("\n")[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    worker = commands.add_parser("worker", help="compile translation units sent by builds")
+    worker.add_argument("--host", default="127.0.0.1", help="address to listen on")
+    worker.add_argument("--port", type=int, default=DEFAULT_PORT, help="port to listen on, 0 for any")
+    worker.add_argument("--slots", type=int, default=os.cpu_count() or 1, help="units compiled at once")
+    check = commands.add_parser("status", help="check that workers are reachable & compatible")
+    check.add_argument("workers", nargs="+", help="host:port")
+    args = parser.parse_args(argv)
+
+    if args.command == "status":
+        available, unavailable = probe(args.workers)
+        for address, slots in available:
+            print(f"{address}: {slots} slots")  # noqa: T201
+        for address, reason in unavailable.items():
+            print(f"{address}: {reason}")  # noqa: T201
+        return 0 if available else 1
+
+    with Worker((args.host, args.port), max(args.slots, 1)) as server:
+        print(f"listening on {server.address} with {server.slots} slots", flush=True)  # noqa: T201
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
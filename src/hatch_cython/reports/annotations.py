@@ -0,0 +1,177 @@
+import html
+import json
+import os
+import re
+from dataclasses import asdict, dataclass, field
+
+from hatch_cython.types import CallableT, DictT, ListT, TupleT, UnionT
+
+# a source line of `cython -a` output; the score is the count of python C-API interactions
+LINE = re.compile(r'<pre class="cython line score-(\d+)"[^>]*>.*?<span class="">(\d+)</span>:(.*?)</pre>', re.DOTALL)
+TAG = re.compile(r"<[^>]+>")
+# cdef & cpdef also declare variables, which never have `(` before an assignment
+FUNCTION = re.compile(r"(\s*)(?:async\s+def|def|cpdef|cdef)\s+[^=(]*?(\w+)\s*\(")
+CLASS = re.compile(r"(\s*)(?:cdef\s+)?class\s+(\w+)")
+MODULE_SCOPE = "<module>"
+
+
+@dataclass
+class FunctionScore:
+    name: str
+    line: int
+    yellow_lines: int = 0
+    score: int = 0
+
+
+@dataclass
+class ModuleScore:
+    module: str
+    source: str
+    annotation: str
+    lines: int = 0
+    yellow_lines: int = 0
+    score: int = 0
+    functions: ListT[FunctionScore] = field(default_factory=list)
+
+
+def parse_annotation(content: str) -> ListT[TupleT[int, int, str]]:
+    """Parses the html written by `cython --annotate`
+
+    Returns:
+        ListT[TupleT[int, int, str]]: [(line number, score, source line), ...]
+    """
+    return [
+        (int(lineno), int(score), html.unescape(TAG.sub("", text))) for score, lineno, text in LINE.findall(content)
+    ]
+
+
+def score_module(module: str, source: str, annotation: str) -> ModuleScore:
+    with open(annotation, encoding="utf-8") as f:
+        lines = parse_annotation(f.read())
+
+    result = ModuleScore(module=module, source=source, annotation=annotation)
+    functions: DictT[str, FunctionScore] = {MODULE_SCOPE: FunctionScore(name=MODULE_SCOPE, line=1)}
+    # (indent, name, is_function)
+    scopes: ListT[TupleT[int, str, bool]] = []
+    for lineno, score, text in lines:
+        stripped = text.strip()
+        if stripped and not stripped.startswith("#"):
+            indent = len(text) - len(text.lstrip())
+            while scopes and indent <= scopes[-1][0]:
+                scopes.pop()
+            match = FUNCTION.match(text) or CLASS.match(text)
+            if match:
+                scopes.append((len(match.group(1)), match.group(2), match.re is FUNCTION))
+                name = ".".join(s[1] for s in scopes)
+                if match.re is FUNCTION and name not in functions:
+                    functions[name] = FunctionScore(name=name, line=lineno)
+
+        result.lines += 1
+        if not score:
+            continue
+        owner = next((i for i in range(len(scopes), 0, -1) if scopes[i - 1][2]), 0)
+        current = functions[".".join(s[1] for s in scopes[:owner])] if owner else functions[MODULE_SCOPE]
+        current.yellow_lines += 1
+        current.score += score
+        result.yellow_lines += 1
+        result.score += score
+
+    result.functions = sorted(
+        (f for f in functions.values() if f.yellow_lines),
+        key=lambda f: (f.score, f.yellow_lines),
+        reverse=True,
+    )
+    return result
+
+
+def rank(modules: ListT[dict]) -> dict:
+    ranked = sorted(modules, key=lambda m: (m["yellow_lines"], m["score"]), reverse=True)
+    return {
+        "totals": {
+            "modules": len(ranked),
+            "lines": sum(m["lines"] for m in ranked),
+            "yellow_lines": sum(m["yellow_lines"] for m in ranked),
+            "score": sum(m["score"] for m in ranked),
+        },
+        "modules": ranked,
+    }
+
+
+def build_report(modules: ListT[ModuleScore]) -> dict:
+    return rank([asdict(m) for m in modules])
+
+
+def merge_baseline(baseline: UnionT[dict, None], report: dict) -> dict:
+    """The baseline with the modules of `report` replaced, keeping those a partial build did not compile"""
+    modules = {m["module"]: m for m in (baseline or {}).get("modules", [])}
+    modules.update((m["module"], m) for m in report["modules"])
+    return rank(list(modules.values()))
+
+
+def regressions(
+    report: dict,
+    baseline: UnionT[dict, None],
+    is_hot: CallableT[[str], bool],
+) -> ListT[TupleT[str, int, int]]:
+    """Lists hot modules with more yellow lines than in `baseline`
+
+    Returns:
+        ListT[TupleT[str, int, int]]: [(module, baseline yellow lines, current yellow lines), ...]
+    """
+    if not baseline:
+        return []
+    before = {m["module"]: m["yellow_lines"] for m in baseline.get("modules", [])}
+    return [
+        (m["module"], before[m["module"]], m["yellow_lines"])
+        for m in report["modules"]
+        if is_hot(m["module"]) and m["module"] in before and m["yellow_lines"] > before[m["module"]]
+    ]
+
+
+def render_index(report: dict, output: str) -> str:
+    rows = []
+    for m in report["modules"]:
+        link = html.escape(os.path.relpath(m["annotation"], output))
+        functions = "".join(
+            f"<li><code>{html.escape(f['name'])}</code> (line {f['line']}): "
+            f"{f['yellow_lines']} lines, score {f['score']}</li>"
+            for f in m["functions"]
+        )
+        rows.append(
+            f"<tr><td><a href=\"{link}\">{html.escape(m['module'])}</a></td>"
+            f"<td>{m['yellow_lines']}</td><td>{m['lines']}</td><td>{m['score']}</td>"
+            f"<td><details><summary>{len(m['functions'])}</summary><ul>{functions}</ul></details></td></tr>"
+        )
+    totals = report["totals"]
+    return f"""<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>Cython annotations</title>
+<style>
+body {{ font-family: sans-serif; }}
+table {{ border-collapse: collapse; }}
+td, th {{ border: 1px solid #ccc; padding: 4px 8px; text-align: left; vertical-align: top; }}
+</style>
+</head>
+<body>
+<h1>Cython annotations</h1>
+<p>{totals['yellow_lines']} of {totals['lines']} lines in {totals['modules']} modules interact with python.</p>
+<table>
+<tr><th>module</th><th>yellow lines</th><th>lines</th><th>score</th><th>functions</th></tr>
+{''.join(rows)}
+</table>
+</body>
+</html>
+"""
+
+
+def write_report(report: dict, output: str) -> TupleT[str, str]:
+    os.makedirs(output, exist_ok=True)
+    report_json = os.path.join(output, "report.json")
+    index = os.path.join(output, "index.html")
+    with open(report_json, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    with open(index, "w", encoding="utf-8") as f:
+        f.write(render_index(report, output))
+    return report_json, index
@@ -0,0 +1,255 @@
+"""
+Per-extension build costs. `instrument` runs inside the generated setup.py, recording events as json lines;
+the hook aggregates them with `collect` once the build finished.
+"""
+
+import contextlib
+import csv
+import json
+import os
+import subprocess
+import sys
+import threading
+from dataclasses import asdict, dataclass, fields
+from time import perf_counter
+
+from hatch_cython.types import DictT, ListT, TupleT, UnionT
+
+try:
+    import resource
+except ImportError:
+    # windows
+    resource = None
+
+# ru_maxrss is in kilobytes, except on darwin
+RSS_SCALE = 1 if sys.platform == "darwin" else 1024
+# the resource usage of the last child reaped by each thread
+REAPED = threading.local()
+
+
+@dataclass
+class ExtensionCost:
+    module: str
+    cythonize_seconds: float = 0.0
+    compile_seconds: float = 0.0
+    link_seconds: float = 0.0
+    build_seconds: float = 0.0
+    peak_rss: UnionT[int, None] = None
+    c_lines: int = 0
+    binary_size: int = 0
+
+    @property
+    def total_seconds(self) -> float:
+        return self.cythonize_seconds + self.build_seconds
+
+
+def record(events: str, start: float, **event):
+    # appends below PIPE_BUF are atomic, which keeps lines from cythonize workers intact
+    event = {
+        **event,
+        "start": start,
+        "seconds": perf_counter() - start,
+        "pid": os.getpid(),
+        "tid": threading.get_native_id(),
+    }
+    with open(events, "a", encoding="utf-8") as f:
+        f.write(json.dumps(event) + "\n")
+
+
+def own_peak() -> UnionT[int, None]:
+    """The largest resident set of this process so far, in bytes"""
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * RSS_SCALE
+
+
+def child_peak(usage, parent_peak: UnionT[int, None]) -> UnionT[int, None]:
+    """The largest resident set of a child reaped with `usage`, in bytes
+
+    linux carries the peak of the process forking a child across its exec, so a peak up to the parent's at spawn
+    is the parent's rather than the child's, and unknown
+    """
+    if usage is None or parent_peak is None:
+        return None
+    peak = usage.ru_maxrss * RSS_SCALE
+    return peak if peak > parent_peak else None
+
+
+def exit_code(status: int) -> int:
+    if hasattr(os, "waitstatus_to_exitcode"):
+        return os.waitstatus_to_exitcode(status)
+    return -os.WTERMSIG(status) if os.WIFSIGNALED(status) else os.WEXITSTATUS(status)
+
+
+class ReapedPopen(subprocess.Popen):
+    """Reaps its process with wait4, which returns the resource usage of that process alone"""
+
+    def wait(self, timeout=None):
+        if timeout is None and self.returncode is None:
+            # already reaped otherwise, which Popen handles
+            with contextlib.suppress(ChildProcessError):
+                _, status, usage = os.wait4(self.pid, 0)
+                self.returncode = exit_code(status)
+                REAPED.usage = usage
+        return super().wait(timeout)
+
+
+def instrument(events: str):
+    """Wraps cythonize_one, build_ext.build_extension & the compiler spawn to time each extension"""
+    from inspect import signature
+
+    from Cython.Build import Dependencies
+    from setuptools.command.build_ext import build_ext
+
+    try:
+        from distutils.ccompiler import CCompiler
+    except ImportError:
+        from setuptools._distutils.ccompiler import CCompiler
+
+    current = threading.local()
+
+    cythonize_one = Dependencies.cythonize_one
+    cythonize_sig = signature(cythonize_one)
+
+    def timed_cythonize_one(*args, **kwargs):
+        bound = cythonize_sig.bind(*args, **kwargs).arguments
+        start = perf_counter()
+        try:
+            return cythonize_one(*args, **kwargs)
+        finally:
+            record(
+                events,
+                kind="cythonize",
+                module=bound.get("full_module_name"),
+                c_file=os.path.abspath(bound["c_file"]),
+                start=start,
+            )
+
+    # module global lookup, so forked cythonize workers use it as well
+    Dependencies.cythonize_one = timed_cythonize_one
+
+    build_extension = build_ext.build_extension
+
+    def timed_build_extension(self, ext):
+        current.module = ext.name
+        start = perf_counter()
+        try:
+            return build_extension(self, ext)
+        finally:
+            record(
+                events,
+                kind="build",
+                module=ext.name,
+                sources=[os.path.abspath(s) for s in ext.sources],
+                output=os.path.abspath(self.get_ext_fullpath(ext.name)),
+                start=start,
+            )
+            current.module = None
+
+    build_ext.build_extension = timed_build_extension
+
+    if resource is not None:
+        # distutils' spawn runs the compiler through subprocess.Popen
+        subprocess.Popen = ReapedPopen
+
+    spawn = CCompiler.spawn
+
+    def timed_spawn(self, cmd, **kwargs):
+        start = perf_counter()
+        REAPED.usage = None
+        parent_peak = own_peak()
+        spawn(self, cmd, **kwargs)
+        compiling = "-c" in cmd or "/c" in cmd
+        record(
+            events,
+            kind="compile" if compiling else "link",
+            module=getattr(current, "module", None),
+            source=next((a for a in cmd if compiling and a.endswith((".c", ".cpp", ".cc"))), None),
+            start=start,
+            peak_rss=child_peak(REAPED.usage, parent_peak),
+        )
+
+    CCompiler.spawn = timed_spawn
+
+
+def read_events(events: str) -> ListT[dict]:
+    if not os.path.exists(events):
+        return []
+    with open(events, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def count_lines(file: str) -> int:
+    with open(file, "rb") as f:
+        return sum(1 for _ in f)
+
+
+def collect(events: ListT[dict]) -> ListT[ExtensionCost]:
+    """Aggregates the events of one build into a cost per extension, most expensive first"""
+    costs: DictT[str, ExtensionCost] = {}
+    by_c_file: DictT[str, str] = {}
+    for event in events:
+        if event["kind"] != "build":
+            continue
+        cost = costs.setdefault(event["module"], ExtensionCost(module=event["module"]))
+        cost.build_seconds += event["seconds"]
+        for source in event["sources"]:
+            if os.path.splitext(source)[1] in (".c", ".cpp"):
+                by_c_file[source] = event["module"]
+                if os.path.exists(source):
+                    cost.c_lines += count_lines(source)
+        if os.path.exists(event["output"]):
+            cost.binary_size = os.path.getsize(event["output"])
+
+    for event in events:
+        kind = event["kind"]
+        module = event["module"]
+        if kind == "cythonize":
+            module = by_c_file.get(event["c_file"], module)
+        if module not in costs:
+            continue
+        cost = costs[module]
+        if kind == "cythonize":
+            cost.cythonize_seconds += event["seconds"]
+        elif kind in ("compile", "link"):
+            setattr(cost, f"{kind}_seconds", getattr(cost, f"{kind}_seconds") + event["seconds"])
+            if event["peak_rss"] is not None:
+                cost.peak_rss = max(cost.peak_rss or 0, event["peak_rss"])
+
+    return sorted(costs.values(), key=lambda c: c.total_seconds, reverse=True)
+
+
+def write_costs(costs: ListT[ExtensionCost], output: str) -> TupleT[str, str]:
+    os.makedirs(output, exist_ok=True)
+    costs_json = os.path.join(output, "costs.json")
+    costs_csv = os.path.join(output, "costs.csv")
+    rows = [{**asdict(c), "total_seconds": c.total_seconds} for c in costs]
+    with open(costs_json, "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "totals": {
+                    "extensions": len(costs),
+                    "seconds": sum(c.total_seconds for c in costs),
+                    "c_lines": sum(c.c_lines for c in costs),
+                    "binary_size": sum(c.binary_size for c in costs),
+                },
+                "extensions": rows,
+            },
+            f,
+            indent=2,
+        )
+    with open(costs_csv, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=[*(fd.name for fd in fields(ExtensionCost)), "total_seconds"])
+        writer.writeheader()
+        writer.writerows(rows)
+    return costs_json, costs_csv
+
+
+def format_size(size: UnionT[int, None]) -> str:
+    if size is None:
+        return "-"
+    for unit in ("B", "KiB", "MiB"):
+        if size < 1024:  # noqa: PLR2004
+            return f"{size:.0f}{unit}"
+        size /= 1024
+    return f"{size:.1f}GiB"
@@ -0,0 +1,209 @@
+"""
+Build history, kept in a sqlite database under the cache dir
+"""
+
+import os
+import platform
+import sqlite3
+import sys
+import time
+from dataclasses import dataclass, field
+from statistics import median
+from typing import Optional
+
+from hatch_cython.config.history import HistoryArgs
+from hatch_cython.reports.costs import ExtensionCost
+from hatch_cython.types import DictT, ListT, TupleT, UnionT
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS builds (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created REAL NOT NULL,
+    machine TEXT NOT NULL,
+    target TEXT NOT NULL,
+    profile TEXT,
+    kind TEXT NOT NULL,
+    accepted INTEGER NOT NULL,
+    seconds REAL NOT NULL,
+    extensions INTEGER NOT NULL,
+    cythonized INTEGER NOT NULL,
+    compiled INTEGER NOT NULL,
+    artifact_size INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS phases (
+    build_id INTEGER NOT NULL REFERENCES builds(id),
+    name TEXT NOT NULL,
+    seconds REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS extensions (
+    build_id INTEGER NOT NULL REFERENCES builds(id),
+    module TEXT NOT NULL,
+    cythonize_seconds REAL NOT NULL,
+    compile_seconds REAL NOT NULL,
+    link_seconds REAL NOT NULL,
+    peak_rss INTEGER,
+    c_lines INTEGER NOT NULL,
+    binary_size INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS builds_baseline ON builds (machine, target, kind, accepted);
+"""
+
+FULL = "full"
+NOOP = "noop"
+PARTIAL = "partial"
+
+
+def machine_class() -> str:
+    # builds are only comparable on similar hosts & interpreters
+    return "-".join(
+        (
+            platform.system().lower(),
+            platform.machine().lower(),
+            f"{os.cpu_count()}cpu",
+            f"{sys.implementation.name}{sys.version_info.major}.{sys.version_info.minor}",
+        )
+    )
+
+
+@dataclass
+class BuildRecord:
+    target: str
+    seconds: float
+    artifact_size: int
+    costs: ListT[ExtensionCost] = field(default_factory=list)
+    phases: DictT[str, float] = field(default_factory=dict)
+    profile: Optional[str] = field(default=None)  # noqa: UP007
+    machine: str = field(default_factory=machine_class)
+    created: float = field(default_factory=time.time)
+
+    @property
+    def extensions(self) -> int:
+        return len(self.costs)
+
+    @property
+    def cythonized(self) -> int:
+        return sum(1 for c in self.costs if c.cythonize_seconds)
+
+    @property
+    def compiled(self) -> int:
+        return sum(1 for c in self.costs if c.compile_seconds)
+
+    @property
+    def kind(self) -> str:
+        if self.compiled == 0:
+            return NOOP
+        if self.compiled >= self.extensions:
+            return FULL
+        return PARTIAL
+
+    @property
+    def cache_hit_rate(self) -> float:
+        if not self.extensions:
+            return 1.0
+        return 1 - self.compiled / self.extensions
+
+
+def connect(database: str) -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(database), exist_ok=True)
+    conn = sqlite3.connect(database)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def record_build(conn: sqlite3.Connection, build: BuildRecord, *, accepted: bool) -> int:
+    with conn:
+        cursor = conn.execute(
+            "INSERT INTO builds (created, machine, target, profile, kind, accepted, seconds, extensions, cythonized, "
+            "compiled, artifact_size) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                build.created,
+                build.machine,
+                build.target,
+                build.profile,
+                build.kind,
+                int(accepted),
+                build.seconds,
+                build.extensions,
+                build.cythonized,
+                build.compiled,
+                build.artifact_size,
+            ),
+        )
+        build_id = cursor.lastrowid
+        conn.executemany(
+            "INSERT INTO phases (build_id, name, seconds) VALUES (?, ?, ?)",
+            [(build_id, name, seconds) for name, seconds in build.phases.items()],
+        )
+        conn.executemany(
+            "INSERT INTO extensions (build_id, module, cythonize_seconds, compile_seconds, link_seconds, peak_rss, "
+            "c_lines, binary_size) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    build_id,
+                    c.module,
+                    c.cythonize_seconds,
+                    c.compile_seconds,
+                    c.link_seconds,
+                    c.peak_rss,
+                    c.c_lines,
+                    c.binary_size,
+                )
+                for c in build.costs
+            ],
+        )
+    return build_id
+
+
+def baseline(conn: sqlite3.Connection, build: BuildRecord, builds: int) -> UnionT[DictT[str, float], None]:
+    """Medians of the last `builds` accepted builds comparable to `build`
+
+    Returns:
+        DictT[str, float] | None: {"builds": count, "seconds": median, "artifact_size": median}
+    """
+    rows = conn.execute(
+        "SELECT seconds, artifact_size FROM builds WHERE machine = ? AND target = ? AND profile IS ? AND kind = ? "
+        "AND accepted = 1 ORDER BY id DESC LIMIT ?",
+        (build.machine, build.target, build.profile, build.kind, builds),
+    ).fetchall()
+    if not rows:
+        return None
+    return {
+        "builds": len(rows),
+        "seconds": median(r[0] for r in rows),
+        "artifact_size": median(r[1] for r in rows),
+    }
+
+
+def module_seconds(conn: sqlite3.Connection, machine: str, builds: int) -> DictT[str, float]:
+    """Median seconds compiling each module took in its last `builds` builds on the machine class"""
+    rows = conn.execute(
+        "SELECT e.module, e.cythonize_seconds + e.compile_seconds + e.link_seconds FROM extensions e "
+        "JOIN builds b ON b.id = e.build_id WHERE b.machine = ? AND e.compile_seconds > 0 ORDER BY b.id DESC",
+        (machine,),
+    ).fetchall()
+    recent: DictT[str, ListT[float]] = {}
+    for module, seconds in rows:
+        if len(recent.setdefault(module, [])) < builds:
+            recent[module].append(seconds)
+    return {module: median(seconds) for module, seconds in recent.items()}
+
+
+def regressions(
+    build: BuildRecord,
+    base: UnionT[DictT[str, float], None],
+    args: HistoryArgs,
+) -> ListT[TupleT[str, float, float]]:
+    """Lists metrics exceeding the configured increase over the baseline
+
+    Returns:
+        ListT[TupleT[str, float, float]]: [(metric, baseline, current), ...]
+    """
+    if base is None or base["builds"] < args.min_builds:
+        return []
+    regressed = []
+    # partial builds depend on what changed, so their times are not comparable
+    if build.kind != PARTIAL and build.seconds > base["seconds"] * (1 + args.max_time_increase):
+        regressed.append(("seconds", base["seconds"], build.seconds))
+    if build.artifact_size > base["artifact_size"] * (1 + args.max_size_increase):
+        regressed.append(("artifact_size", base["artifact_size"], build.artifact_size))
+    return regressed
@@ -0,0 +1,103 @@
+"""
+What a build would do with each extension, and why, worked out without compiling. The build manifest records
+the arguments & Cython version each extension was last built with, which timestamps do not capture.
+"""
+
+import json
+import os
+import sys
+from dataclasses import asdict, dataclass, field
+from typing import Optional
+
+from Cython import __version__ as cython_version
+
+from hatch_cython.types import DictT, ListStr, ListT
+
+MANIFEST = "manifest.json"
+
+CACHED = "cached"
+REBUILD = "rebuild"
+REUSED = "reused"
+EXCLUDED = "excluded"
+
+
+@dataclass
+class ExtensionPlan:
+    module: str
+    state: str
+    reasons: ListStr = field(default_factory=list)
+    # median of previous builds of the module, if recorded
+    estimated_seconds: Optional[float] = field(default=None)  # noqa: UP007
+    output: Optional[str] = field(default=None)  # noqa: UP007
+
+
+def toolchain() -> DictT[str, str]:
+    return {"cython": cython_version, "python": sys.implementation.cache_tag}
+
+
+def read_manifest(cache_dir: str) -> dict:
+    """{"cython": version, "python": cache tag, "extensions": {module: arguments digest}}"""
+    manifest = os.path.join(cache_dir, MANIFEST)
+    if not os.path.exists(manifest):
+        return {"extensions": {}}
+    with open(manifest, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_manifest(cache_dir: str, digests: DictT[str, str]):
+    """Records the extensions just built, keeping the records of those this build left alone"""
+    manifest = read_manifest(cache_dir)
+    if {k: manifest.get(k) for k in toolchain()} != toolchain():
+        manifest = {"extensions": {}}
+    manifest = {**toolchain(), "extensions": {**manifest["extensions"], **digests}}
+    os.makedirs(cache_dir, exist_ok=True)
+    temp = os.path.join(cache_dir, f"{MANIFEST}.tmp")
+    with open(temp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(temp, os.path.join(cache_dir, MANIFEST))
+
+
+def changed_toolchain(manifest: dict) -> ListStr:
+    """Why every extension of the previous build is out of date, if it is"""
+    reasons = []
+    current = toolchain()
+    if manifest.get("cython") and manifest["cython"] != current["cython"]:
+        reasons.append(f"Cython upgraded from {manifest['cython']} to {current['cython']}")
+    if manifest.get("python") and manifest["python"] != current["python"]:
+        reasons.append(f"python changed from {manifest['python']} to {current['python']}")
+    return reasons
+
+
+def estimated_total(plans: ListT[ExtensionPlan]) -> float:
+    return sum(p.estimated_seconds or 0.0 for p in plans if p.state == REBUILD)
+
+
+def format_plan(plans: ListT[ExtensionPlan]) -> str:
+    lines = []
+    width = max((len(p.module) for p in plans), default=0)
+    for p in plans:
+        estimate = f"~{p.estimated_seconds:.1f}s" if p.state == REBUILD and p.estimated_seconds is not None else ""
+        lines.append(f"{p.state:<8} {p.module:<{width}} {estimate:>8}  {'; '.join(p.reasons)}".rstrip())
+    rebuilt = [p for p in plans if p.state == REBUILD]
+    unknown = sum(1 for p in rebuilt if p.estimated_seconds is None)
+    summary = f"{len(rebuilt)}/{sum(1 for p in plans if p.state != EXCLUDED)} extensions to build"
+    if len(rebuilt) > unknown:
+        summary += f", ~{estimated_total(plans):.1f}s"
+    if unknown:
+        summary += f" ({unknown} without previous builds to estimate from)"
+    return "\n".join([*lines, summary])
+
+
+def write_plan(plans: ListT[ExtensionPlan], output: str) -> str:
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                **toolchain(),
+                "estimated_seconds": estimated_total(plans),
+                "extensions": [asdict(p) for p in plans],
+            },
+            f,
+            indent=2,
+        )
+    return output
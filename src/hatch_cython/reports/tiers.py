@@ -0,0 +1,24 @@
+"""
+Optimization tier chosen for each extension
+"""
+
+import json
+import os
+from dataclasses import asdict, dataclass, field
+
+from hatch_cython.types import ListStr, ListT
+
+
+@dataclass
+class ModuleTier:
+    module: str
+    tier: str
+    reason: str
+    compile_args: ListStr = field(default_factory=list)
+
+
+def write_tiers(tiers: ListT[ModuleTier], output: str) -> str:
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump([asdict(t) for t in tiers], f, indent=2)
+    return output
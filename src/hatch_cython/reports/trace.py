@@ -0,0 +1,107 @@
+"""
+Trace event timeline of a build, viewable in https://ui.perfetto.dev or chrome://tracing
+"""
+
+import json
+import os
+import threading
+from contextlib import contextmanager
+from time import perf_counter
+
+from hatch_cython.types import DictT, ListT
+
+# perf_counter is a system wide monotonic clock, which lines up the hook & its subprocesses
+US = 1_000_000
+WORKER_KINDS = ("cythonize", "build", "compile", "link")
+
+
+def native_id() -> int:
+    return threading.get_native_id()
+
+
+class Tracer:
+    def __init__(self):
+        self.events: ListT[dict] = []
+
+    def reset(self):
+        self.events = []
+
+    def complete(self, name: str, cat: str, start: float, seconds: float, *, pid: int, tid: int, **args):
+        self.events.append(
+            {
+                "name": name,
+                "cat": cat,
+                "ph": "X",
+                "ts": start * US,
+                "dur": seconds * US,
+                "pid": pid,
+                "tid": tid,
+                "args": args,
+            }
+        )
+
+    @contextmanager
+    def span(self, name: str, cat: str = "hook", **args):
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.complete(name, cat, start, perf_counter() - start, pid=os.getpid(), tid=native_id(), **args)
+
+    def extend_build(self, events: ListT[dict]):
+        """Adds the events recorded by the generated setup.py, see `hatch_cython.reports.costs`"""
+        for event in events:
+            if event["kind"] not in WORKER_KINDS or "start" not in event:
+                continue
+            if event.get("source"):
+                name = os.path.basename(event["source"])
+            else:
+                name = event["module"] or os.path.basename(event.get("c_file", ""))
+            self.complete(
+                f"{event['kind']} {name}",
+                event["kind"],
+                event["start"],
+                event["seconds"],
+                pid=event["pid"],
+                tid=event["tid"],
+                **{k: v for k, v in event.items() if k not in ("kind", "start", "seconds", "pid", "tid")},
+            )
+
+    def metadata(self) -> ListT[dict]:
+        hook = os.getpid()
+        kinds: DictT[int, set] = {}
+        threads: DictT[tuple, set] = {}
+        for event in self.events:
+            kinds.setdefault(event["pid"], set()).add(event["cat"])
+            threads.setdefault((event["pid"], event["tid"]), set()).add(event["cat"])
+
+        def process_name(pid: int, cats: set):
+            if pid == hook:
+                return "hatch-cython hook"
+            if cats == {"cythonize"}:
+                return "cythonize worker"
+            return "setup.py build_ext"
+
+        meta = [
+            {"name": "process_name", "ph": "M", "pid": pid, "tid": 0, "args": {"name": process_name(pid, cats)}}
+            for pid, cats in kinds.items()
+        ]
+        workers: DictT[int, int] = {}
+        for (pid, tid), cats in sorted(threads.items()):
+            if pid == hook or cats == {"cythonize"}:
+                name = "main"
+            else:
+                workers[pid] = workers.get(pid, 0) + 1
+                name = f"build worker {workers[pid]}"
+            meta.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}})
+        return meta
+
+    def write(self, output: str):
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": [*self.metadata(), *self.events], "displayTimeUnit": "ms"}, f)
+
+
+# spans are cheap, so they are always recorded; the hook writes them when `trace` is set
+TRACER = Tracer()
+span = TRACER.span
@@ -0,0 +1,50 @@
+"""
+Builds one shard of the extensions, for splitting a build across machines. Shards are balanced by the costs of a
+previous build where available, else by source size; the wheel is then built from all shards without compiling.
+
+    python -m hatch_cython.shards plan 4
+    python -m hatch_cython.shards build 2/4 --output shards
+    HATCH_CYTHON_MERGE=shards hatch build -t wheel
+"""
+
+import argparse
+import os
+
+from hatch_cython.config.shards import SHARD_DIR_ENV, SHARD_ENV, parse_shard
+from hatch_cython.plugin import CythonBuildHook
+from hatch_cython.utils import QuietApplication, cwd
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m hatch_cython.shards", description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--root", default=".", help="project root")
+    commands = parser.add_subparsers(dest="command", required=True)
+    plan = commands.add_parser("plan", help="print the modules of each shard")
+    plan.add_argument("count", type=int)
+    build = commands.add_parser("build", help="build a shard in place & copy it to the output directory")
+    build.add_argument("shard", help="i/N, 1-based")
+    build.add_argument("--output", help="directory holding the shards. default {cache_dir}/shards")
+    args = parser.parse_args(argv)
+
+    root = os.path.realpath(args.root)
+    if args.command == "plan":
+        os.environ[SHARD_ENV] = f"1/{args.count}"
+        hook = CythonBuildHook.for_project(root, app=QuietApplication())
+        with cwd(root):
+            shards = hook.shards
+        for i, modules in enumerate(shards, start=1):
+            print(f"{i}/{args.count}: {', '.join(modules)}")  # noqa: T201
+        return shards
+
+    shard = parse_shard(args.shard)
+    os.environ[SHARD_ENV] = args.shard
+    if args.output:
+        os.environ[SHARD_DIR_ENV] = os.path.abspath(args.output)
+    hook = CythonBuildHook.for_project(root)
+    with cwd(root):
+        hook.initialize("standard", {"artifacts": [], "force_include": {}})
+    return hook.shards[shard.index - 1]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,380 @@
+"""
+Runtime speedups of compiled extensions over their pure-python sources. Each benchmark runs in isolated
+subprocesses, alternating between the compiled package & the same package imported from its `.py` sources.
+
+    python -m hatch_cython.speedups pkg.parser:bench_parse pkg.io=benchmarks.io:run --path src
+    python -m hatch_cython.speedups --pytest tests/benchmarks --package pkg --path src
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import tempfile
+from dataclasses import asdict, dataclass, field
+from statistics import median
+
+from hatch_cython.types import DictT, ListStr, ListT, TupleT, UnionT
+
+OUTPUT = os.path.join(".hatch", "cython", "speedups.json")
+
+FASTER = "faster"
+SLOWER = "slower"
+UNCHANGED = "unchanged"
+
+# executed with `python -c`; the job is passed as json in argv[1], results are written to job["output"]
+RUNNER = """
+import gc, importlib, json, sys
+from importlib.machinery import EXTENSION_SUFFIXES, SOURCE_SUFFIXES, FileFinder, ModuleSpec, SourceFileLoader
+from time import perf_counter
+
+job = json.loads(sys.argv[1])
+sys.path[:0] = job["path"]
+
+
+class PureFinder:
+    # resolves the benchmarked packages from their python sources, never from compiled extensions
+    @classmethod
+    def find_spec(cls, fullname, path=None, target=None):
+        if fullname.partition(".")[0] not in job["packages"]:
+            return None
+        namespace = []
+        for entry in sys.path if path is None else path:
+            spec = FileFinder(entry or ".", (SourceFileLoader, SOURCE_SUFFIXES)).find_spec(fullname, target)
+            if spec is None:
+                continue
+            if spec.loader is not None:
+                return spec
+            namespace.extend(spec.submodule_search_locations or ())
+        if namespace:
+            spec = ModuleSpec(fullname, None, is_package=True)
+            spec.submodule_search_locations = namespace
+            return spec
+        raise ModuleNotFoundError(f"{fullname} has no python source", name=fullname)
+
+
+def compiled(module):
+    module = sys.modules.get(module)
+    return module is not None and (getattr(module, "__file__", None) or "").endswith(tuple(EXTENSION_SUFFIXES))
+
+
+def timed(fn):
+    number = job["number"]
+    if not number:
+        # like timeit.autorange, loops until a round takes at least min_time
+        number = 1
+        while True:
+            start = perf_counter()
+            for _ in range(number):
+                fn()
+            if perf_counter() - start >= job["min_time"]:
+                break
+            number *= 2
+    for _ in range(job["warmup"]):
+        fn()
+    samples = []
+    gc.disable()
+    try:
+        for _ in range(job["rounds"]):
+            start = perf_counter()
+            for _ in range(number):
+                fn()
+            samples.append((perf_counter() - start) / number)
+    finally:
+        gc.enable()
+    return samples
+
+
+if job["pure"]:
+    sys.meta_path.insert(0, PureFinder)
+
+results = []
+if job.get("pytest") is not None:
+    import pytest
+
+    report = job["output"] + ".pytest.json"
+    code = pytest.main([*job["pytest"], "-q", "-p", "no:cacheprovider", "--benchmark-json", report])
+    if code != 0:
+        sys.exit(code)
+    with open(report) as f:
+        for bench in json.load(f)["benchmarks"]:
+            module = bench.get("group") or bench["fullname"]
+            results.append(
+                {
+                    "name": bench["fullname"],
+                    "module": module,
+                    "samples": bench["stats"]["data"],
+                    "compiled": compiled(module),
+                }
+            )
+
+for bench in job["benchmarks"]:
+    name, _, attr = bench["target"].partition(":")
+    fn = importlib.import_module(name)
+    for part in attr.split("."):
+        fn = getattr(fn, part)
+    importlib.import_module(bench["module"])
+    results.append(
+        {
+            "name": bench["target"],
+            "module": bench["module"],
+            "samples": timed(fn),
+            "compiled": compiled(bench["module"]),
+        }
+    )
+
+with open(job["output"], "w") as f:
+    json.dump(results, f)
+"""
+
+
+@dataclass
+class Benchmark:
+    # import.path:callable, called without arguments
+    target: str
+    # the module whose speedup the benchmark measures
+    module: str
+
+
+def parse_benchmark(spec: str) -> Benchmark:
+    """Parses `[module=]import.path:callable`; the module defaults to the callable's module"""
+    module, _, target = spec.rpartition("=")
+    name, sep, attr = target.partition(":")
+    if not (name and sep and attr):
+        msg = f"benchmarks are given as [module=]import.path:callable, got {spec!r}"
+        raise ValueError(msg)
+    return Benchmark(target=target, module=module or name)
+
+
+@dataclass
+class Measurement:
+    name: str
+    module: str
+    # seconds per call, pooled across processes
+    pure: ListT[float] = field(default_factory=list)
+    compiled: ListT[float] = field(default_factory=list)
+    # whether the compiled runs imported the module from an extension
+    loaded: bool = True
+
+
+@dataclass
+class ModuleSpeedup:
+    module: str
+    # geometric mean over the module's benchmarks of median pure time / median compiled time
+    speedup: float
+    low: float
+    high: float
+    benchmarks: ListStr = field(default_factory=list)
+    compiled: bool = True
+
+    @property
+    def verdict(self) -> str:
+        if self.low > 1:
+            return FASTER
+        if self.high < 1:
+            return SLOWER
+        return UNCHANGED
+
+
+def geometric_mean(values: ListT[float]) -> float:
+    return math.exp(sum(math.log(v) for v in values) / len(values))
+
+
+def ratio(pure: ListT[float], compiled: ListT[float]) -> float:
+    return median(pure) / median(compiled)
+
+
+def bootstrap(
+    pairs: ListT[TupleT[ListT[float], ListT[float]]],
+    *,
+    confidence: float = 0.95,
+    resamples: int = 1000,
+    seed: int = 0,
+) -> TupleT[float, float, float]:
+    """Speedup of (pure samples, compiled samples) pairs, with a percentile bootstrap confidence interval
+
+    Returns:
+        TupleT[float, float, float]: (speedup, low, high)
+    """
+    rng = random.Random(seed)  # noqa: S311
+    estimate = geometric_mean([ratio(pure, compiled) for pure, compiled in pairs])
+    stats = sorted(
+        geometric_mean(
+            [ratio(rng.choices(pure, k=len(pure)), rng.choices(compiled, k=len(compiled))) for pure, compiled in pairs]
+        )
+        for _ in range(resamples)
+    )
+    tail = (1 - confidence) / 2
+    low = stats[int(tail * (resamples - 1))]
+    high = stats[math.ceil((1 - tail) * (resamples - 1))]
+    return estimate, low, high
+
+
+def run_job(job: dict, *, path: ListStr) -> ListT[dict]:
+    with tempfile.TemporaryDirectory(prefix="hatch_cython_speedups_") as tmp:
+        job = {**job, "path": [os.path.abspath(p) for p in path], "output": os.path.join(tmp, "results.json")}
+        proc = subprocess.run(  # noqa: S603
+            [sys.executable, "-c", RUNNER, json.dumps(job)],
+            capture_output=True,
+            text=True,
+            check=False,
+        )
+        if proc.returncode != 0 or not os.path.exists(job["output"]):
+            mode = "pure" if job["pure"] else "compiled"
+            msg = f"{mode} benchmark run failed ({proc.returncode}):\n{proc.stdout}{proc.stderr}"
+            raise Exception(msg)
+        with open(job["output"], encoding="utf-8") as f:
+            return json.load(f)
+
+
+def measure(
+    benchmarks: ListT[Benchmark],
+    *,
+    pytest: UnionT[ListStr, None] = None,
+    path: ListStr = (),
+    packages: UnionT[ListStr, None] = None,
+    processes: int = 3,
+    rounds: int = 20,
+    warmup: int = 2,
+    number: int = 0,
+    min_time: float = 0.01,
+) -> ListT[Measurement]:
+    """Runs the benchmarks in `processes` pure & compiled subprocesses each, alternating the order
+    so drift on the host affects both sides alike"""
+    if packages is None:
+        modules = [b.module for b in benchmarks] + [b.target.partition(":")[0] for b in benchmarks]
+        packages = sorted({m.partition(".")[0] for m in modules})
+    job = {
+        "benchmarks": [asdict(b) for b in benchmarks],
+        "pytest": pytest,
+        "packages": list(packages),
+        "rounds": rounds,
+        "warmup": warmup,
+        "number": number,
+        "min_time": min_time,
+    }
+    measurements: DictT[str, Measurement] = {}
+    for n in range(processes):
+        for pure in (True, False) if n % 2 == 0 else (False, True):
+            for result in run_job({**job, "pure": pure}, path=path):
+                m = measurements.setdefault(result["name"], Measurement(name=result["name"], module=result["module"]))
+                if pure:
+                    m.pure.extend(result["samples"])
+                else:
+                    m.compiled.extend(result["samples"])
+                    m.loaded = m.loaded and result["compiled"]
+    return list(measurements.values())
+
+
+def speedups(
+    measurements: ListT[Measurement],
+    *,
+    confidence: float = 0.95,
+    resamples: int = 1000,
+) -> ListT[ModuleSpeedup]:
+    by_module: DictT[str, ListT[Measurement]] = {}
+    for m in measurements:
+        by_module.setdefault(m.module, []).append(m)
+    out = []
+    for module, ms in sorted(by_module.items()):
+        speedup, low, high = bootstrap(
+            [(m.pure, m.compiled) for m in ms],
+            confidence=confidence,
+            resamples=resamples,
+        )
+        out.append(
+            ModuleSpeedup(
+                module=module,
+                speedup=speedup,
+                low=low,
+                high=high,
+                benchmarks=[m.name for m in ms],
+                compiled=all(m.loaded for m in ms),
+            )
+        )
+    return out
+
+
+def write_speedups(
+    results: ListT[ModuleSpeedup],
+    measurements: ListT[Measurement],
+    output: str,
+    *,
+    confidence: float,
+) -> str:
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "confidence": confidence,
+                "modules": [{**asdict(r), "verdict": r.verdict} for r in results],
+                "benchmarks": [
+                    {
+                        "name": m.name,
+                        "module": m.module,
+                        "pure_median": median(m.pure),
+                        "compiled_median": median(m.compiled),
+                        "rounds": len(m.pure),
+                    }
+                    for m in measurements
+                ],
+            },
+            f,
+            indent=2,
+        )
+    return output
+
+
+def read_speedups(output: str) -> ListT[ModuleSpeedup]:
+    with open(output, encoding="utf-8") as f:
+        data = json.load(f)
+    return [ModuleSpeedup(**{k: v for k, v in module.items() if k != "verdict"}) for module in data.get("modules", [])]
+
+
+def print_speedups(results: ListT[ModuleSpeedup], confidence: float):
+    interval = f"{confidence:.0%} CI"
+    print(f"{'module':<40} {'speedup':>8} {interval:>17}  verdict")  # noqa: T201
+    for r in results:
+        note = "" if r.compiled else "  (not compiled, build the package first)"
+        print(f"{r.module:<40} {r.speedup:>7.2f}x [{r.low:>6.2f}x, {r.high:>6.2f}x]  {r.verdict}{note}")  # noqa: T201
+
+
+def main(argv=None) -> ListT[ModuleSpeedup]:
+    parser = argparse.ArgumentParser(prog="python -m hatch_cython.speedups", description=__doc__.strip().split("\n")[0])
+    parser.add_argument("benchmarks", nargs="*", help="[module=]import.path:callable, called without arguments")
+    parser.add_argument("--pytest", nargs="+", help="pytest-benchmark tests; the benchmark group names the module")
+    parser.add_argument("--path", action="append", default=[], help="import path of the built package, e.g. src")
+    parser.add_argument("--package", action="append", dest="packages", help="packages imported from source when pure")
+    parser.add_argument("--processes", type=int, default=3, help="subprocesses per variant")
+    parser.add_argument("--rounds", type=int, default=20, help="timed rounds per subprocess")
+    parser.add_argument("--warmup", type=int, default=2, help="untimed calls before the rounds")
+    parser.add_argument("--number", type=int, default=0, help="calls per round, calibrated when 0")
+    parser.add_argument("--confidence", type=float, default=0.95, help="confidence level of the interval")
+    parser.add_argument("--output", default=OUTPUT, help="json results")
+    args = parser.parse_args(argv)
+    if not args.benchmarks and not args.pytest:
+        parser.error("give benchmark callables or --pytest")
+    if args.pytest and not args.packages:
+        parser.error("--pytest requires --package")
+
+    measurements = measure(
+        [parse_benchmark(b) for b in args.benchmarks],
+        pytest=args.pytest,
+        path=args.path,
+        packages=args.packages,
+        processes=args.processes,
+        rounds=args.rounds,
+        warmup=args.warmup,
+        number=args.number,
+    )
+    results = speedups(measurements, confidence=args.confidence)
+    print_speedups(results, args.confidence)
+    write_speedups(results, measurements, args.output, confidence=args.confidence)
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,55 @@
+from os import path
 from typing import TypedDict
 
 from hatch_cython.config import Config
-from hatch_cython.types import ListStr, ListT
+from hatch_cython.config.helpers import CXX_SUFFIXES
+from hatch_cython.config.macros import DefineMacros
+from hatch_cython.types import DictT, ListStr, ListT, TupleT, UnionT
 from hatch_cython.utils import options_kws
 
 
-class ExtensionArg(TypedDict):
+class _ExtensionArg(TypedDict):
     name: str
     files: ListStr
 
 
+class ExtensionArg(_ExtensionArg, total=False):
+    # per-extension arguments, set when overrides apply
+    extra_compile_args: ListStr
+    extra_link_args: ListStr
+    define_macros: DefineMacros
+    directives: dict
+
+
+BUNDLE_ATTRS = (
+    "sources",
+    "include_dirs",
+    "define_macros",
+    "undef_macros",
+    "library_dirs",
+    "libraries",
+    "runtime_library_dirs",
+    "extra_objects",
+    "extra_compile_args",
+    "extra_link_args",
+    "depends",
+)
+
+
 def setup_py(
     *files: ListT[ListStr],
     options: Config,
     sdist: bool,
+    bundles: UnionT[DictT[str, ListStr], None] = None,
+    shared_utility: UnionT[TupleT[str, str], None] = None,
+    variants: UnionT[DictT[str, ListT[TupleT[str, str]]], None] = None,
+    variant_dir: UnionT[str, None] = None,
+    costs: UnionT[str, None] = None,
+    atomic: bool = False,
+    remote: UnionT[TupleT[ListT[TupleT[str, int]], int], None] = None,
+    helpers: UnionT[ListT[TupleT[str, dict]], None] = None,
+    clib_dir: UnionT[str, None] = None,
+    pch: UnionT[TupleT[DictT[str, ListStr], str], None] = None,
 ):
     code = """
 from setuptools import Extension, setup
@@ -23,19 +59,43 @@ INCLUDES = {includes!r}
 EXTENSIONS = {ext_files!r}
 
 if __name__ == "__main__":
+{instrument}
     exts = [
         Extension(  ex.get("name"),
                     ex.get("files"),
-                    extra_compile_args={compile_args!r},
-                    extra_link_args={extra_link_args!r},
+                    extra_compile_args=ex.get("extra_compile_args", {compile_args!r}),
+                    extra_link_args=ex.get("extra_link_args", {extra_link_args!r}),
                     include_dirs=INCLUDES,
                     libraries={libs!r},
                     library_dirs={lib_dirs!r},
-                    define_macros={define_macros!r},
+                    define_macros=ex.get("define_macros", {define_macros!r}),
                     {keywords}
         ) for ex in EXTENSIONS
     ]
-    ext_modules = cythonize(
+"""
+    cythonize_kwargs = options.cythonize_kwargs
+    if shared_utility:
+        shared_name, _ = shared_utility
+        cythonize_kwargs = {**cythonize_kwargs, "shared_utility_qualified_name": shared_name}
+        code += """
+    exts.append(
+        Extension(  {shared_name!r},
+                    [{shared_source!r}],
+                    extra_compile_args={compile_args!r},
+                    extra_link_args={extra_link_args!r},
+                    include_dirs=INCLUDES,
+                    define_macros={define_macros!r},
+        )
+    )
+"""
+    directives = {ex["name"]: ex["directives"] for ex in files if "directives" in ex}
+    if directives:
+        code += """
+    DIRECTIVES = {ext_directives!r}
+    overridden = [ex for ex in exts if ex.name in DIRECTIVES]
+    exts = [ex for ex in exts if ex.name not in DIRECTIVES]
+"""
+    code += """    ext_modules = cythonize(
             exts,
             compiler_directives={directives!r},
             include_path=INCLUDES,
@@ -43,13 +103,185 @@ if __name__ == "__main__":
     )
 
 """
-    if not sdist:
+    if directives:
         code += """
-    setup(ext_modules=ext_modules)
+    # cythonize takes directives per call, so overridden modules are grouped by their directives
+    groups = []
+    for ex in overridden:
+        if DIRECTIVES[ex.name] not in groups:
+            groups.append(DIRECTIVES[ex.name])
+    for group in groups:
+        ext_modules += cythonize(
+            [ex for ex in overridden if DIRECTIVES[ex.name] == group],
+            compiler_directives=group,
+            include_path=INCLUDES,
+            {cython}
+        )
+"""
+    if helpers:
+        code += """
+    import os
+
+    HELPERS = {helpers!r}
+    helper_of = {{os.path.abspath(source): name for name, info in HELPERS for source in info["sources"]}}
+    for ext in ext_modules:
+        used = []
+        for source in ext.sources:
+            name = helper_of.get(os.path.abspath(source))
+            if name is not None and name not in used:
+                used.append(name)
+        if used:
+            # compiled once by build_clib, rather than once per extension listing them
+            ext.sources = [source for source in ext.sources if os.path.abspath(source) not in helper_of]
+            ext.libraries = list(dict.fromkeys(used + list(ext.libraries)))
+            # relinked when a library is rebuilt
+            ext.depends = list(ext.depends) + [
+                os.path.join({clib_dir!r}, name + ".lib" if os.name == "nt" else "lib" + name + ".a") for name in used
+            ]
+            helper_sources = [source for name, info in HELPERS if name in used for source in info["sources"]]
+            if ext.language is None and any(source.endswith({cxx_suffixes!r}) for source in helper_sources):
+                ext.language = "c++"
+
+    from setuptools.command.build_ext import build_ext
+
+    class HelperBuildExt(build_ext):
+        # build_ext.run links every build_clib library into every extension; each links only those it lists
+        def build_extensions(self):
+            self.compiler.set_libraries([lib for lib in self.compiler.libraries if lib not in helper_of.values()])
+            super().build_extensions()
+"""
+    if variants:
+        code += """
+    import filecmp
+    import os
+    from copy import copy
+    from shutil import copyfile
+
+    VARIANTS = {variants!r}
+    variant_dir = {variant_dir!r} or os.path.join(os.path.dirname(os.path.abspath(__file__)), "isa")
+    for ext in list(ext_modules):
+        for level, name in VARIANTS.get(ext.name, []):
+            # the generated c is identical (the module keeps its name & PyInit_ symbol), so only the
+            # objects differ. copies keep them apart in build_temp
+            variant = copy(ext)
+            variant.name = name
+            variant.sources = []
+            variant.include_dirs = list(ext.include_dirs)
+            for source in ext.sources:
+                source = os.path.abspath(source)
+                copied = os.path.join(variant_dir, level, os.path.splitdrive(source)[1].lstrip(os.sep))
+                os.makedirs(os.path.dirname(copied), exist_ok=True)
+                # an unchanged copy keeps its mtime, so the variant's object is not compiled again
+                if not (os.path.exists(copied) and filecmp.cmp(source, copied, shallow=False)):
+                    copyfile(source, copied)
+                variant.sources.append(copied)
+                if os.path.dirname(source) not in variant.include_dirs:
+                    variant.include_dirs.append(os.path.dirname(source))
+            variant.extra_compile_args = [
+                arg for arg in ext.extra_compile_args if not arg.startswith("-march")
+            ] + ["-march=" + level]
+            ext_modules.append(variant)
+"""
+    if bundles:
+        code += """
+    import os
+
+    BUNDLES = {bundles!r}
+    bundled = {{member: bundle for bundle, members in BUNDLES.items() for member in members}}
+    grouped = {{}}
+    for ext in list(ext_modules):
+        if ext.name in bundled:
+            ext_modules.remove(ext)
+            grouped.setdefault(bundled[ext.name], []).append(ext)
+    for bundle, members in grouped.items():
+        init = bundle.rsplit(".", 1)[-1]
+        stub = os.path.join(os.path.dirname(os.path.abspath(__file__)), bundle + ".c")
+        with open(stub, "w") as f:
+            f.write(
+                "#include <Python.h>\\n"
+                "PyMODINIT_FUNC PyInit_" + init + "(void) {{\\n"
+                "    PyErr_SetString(PyExc_ImportError, \\""
+                + bundle + " is a bundle of " + ", ".join(BUNDLES[bundle])
+                + "\\");\\n"
+                "    return NULL;\\n"
+                "}}\\n"
+            )
+        merged = Extension(bundle, [stub])
+        for attr in {bundle_attrs!r}:
+            values = list(getattr(merged, attr) or [])
+            for member in members:
+                for value in getattr(member, attr) or []:
+                    if value not in values:
+                        values.append(value)
+            setattr(merged, attr, values)
+        merged.language = next((m.language for m in members if m.language), None)
+        # windows exports only what is listed; every member init must be reachable
+        merged.export_symbols = ["PyInit_" + m.name.rsplit(".", 1)[-1] for m in members]
+        ext_modules.append(merged)
+"""
+    if not sdist and atomic:
+        code += """
+    import filecmp
+    import os
+
+    from setuptools.command.build_ext import build_ext
+
+    class InplaceBuildExt({build_ext}):
+        # replaces extensions in place atomically, so running processes keep the previous build mapped rather
+        # than crashing on a truncated file. unchanged extensions are left as they are
+        def copy_file(self, infile, outfile, *args, **kwargs):
+            if os.path.exists(outfile) and filecmp.cmp(infile, outfile, shallow=False):
+                return outfile, 0
+            temp = outfile + ".tmp"
+            _, copied = super().copy_file(infile, temp, *args, **kwargs)
+            os.replace(temp, outfile)
+            return outfile, copied
+
+    setup(ext_modules=ext_modules, cmdclass={{"build_ext": InplaceBuildExt}}{setup_kwargs})
         """
+    elif not sdist:
+        code += """
+    setup(ext_modules=ext_modules{setup_kwargs})
+        """
+
+    instrument = ""
+    if costs or remote or pch:
+        instrument = f"""
+    import sys
+    sys.path.insert(0, {path.dirname(path.dirname(path.abspath(__file__)))!r})
+"""
+    if costs:
+        # events of the build, aggregated by the hook into the cost report
+        instrument += f"""
+    from hatch_cython.reports.costs import instrument
+    instrument({costs!r})
+"""
+    if remote:
+        # translation units go to the workers, so the costs only time those compiled locally
+        instrument += f"""
+    from hatch_cython.remote import distribute
+    distribute({remote[0]!r}, {remote[1]!r})
+"""
+    if pch:
+        # outermost, so distributed units are preprocessed with the header too
+        instrument += f"""
+    from hatch_cython.pch import precompile
+    precompile({pch[0]!r}, {pch[1]!r})
+"""
+
+    setup_kwargs = ""
+    if helpers:
+        # the objects & libraries persist in the cache dir, so unchanged helpers are not compiled again
+        setup_kwargs = f""",
+        libraries=HELPERS,
+        options={{"build_clib": {{"build_clib": {clib_dir!r}, "build_temp": {clib_dir!r}}}}},
+    """
+        if not atomic:
+            setup_kwargs += """    cmdclass={"build_ext": HelperBuildExt},
+    """
 
     kwds = options_kws(options.compile_kwargs)
-    cython = options_kws(options.cythonize_kwargs)
+    cython = options_kws(cythonize_kwargs)
     return code.format(
         compile_args=options.compile_args_for_platform,
         extra_link_args=options.compile_links_for_platform,
@@ -61,4 +293,17 @@ if __name__ == "__main__":
         libs=options.libraries,
         lib_dirs=options.library_dirs,
         define_macros=options.define_macros,
+        bundles=bundles,
+        bundle_attrs=BUNDLE_ATTRS,
+        shared_name=shared_utility and shared_utility[0],
+        shared_source=shared_utility and shared_utility[1],
+        variants=variants,
+        variant_dir=variant_dir,
+        ext_directives=directives,
+        instrument=instrument,
+        helpers=helpers,
+        clib_dir=clib_dir,
+        cxx_suffixes=CXX_SUFFIXES,
+        setup_kwargs=setup_kwargs,
+        build_ext="HelperBuildExt" if helpers else "build_ext",
     ).strip()
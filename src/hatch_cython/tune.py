@@ -0,0 +1,221 @@
+"""
+Tunes cython directives per module. Each directive combination is built in place, rejected when the project's
+tests fail, and benchmarked otherwise; the fastest safe combination per module is written to a file the hook
+reads with `tuned = true`.
+
+    python -m hatch_cython.tune --module mylib.parser --bench mylib.parser:bench_parse --test "pytest -x tests"
+"""
+
+import argparse
+import copy
+import itertools
+import json
+import os
+import shlex
+import subprocess
+from fnmatch import fnmatchcase
+from statistics import median
+
+from hatchling.bridge.app import Application
+from hatchling.builders.wheel import WheelBuilder
+
+from hatch_cython.config.files import module_glob
+from hatch_cython.constants import TUNED
+from hatch_cython.plugin import CythonBuildHook
+from hatch_cython.speedups import Benchmark, bootstrap, parse_benchmark, run_job
+from hatch_cython.types import DictT, ListStr, ListT, UnionT
+from hatch_cython.utils import QuietApplication, cwd
+
+DEFAULT_SPACE = ("boundscheck", "wraparound", "cdivision", "initializedcheck")
+LITERALS = {"true": True, "false": False, "none": None}
+
+
+def parse_directive(spec: str) -> DictT[str, list]:
+    """Parses `name` (true & false) or `name=value,value`"""
+    name, sep, values = spec.partition("=")
+    if not sep:
+        return {name: [True, False]}
+    parsed = []
+    for v in values.split(","):
+        v = v.strip()  # noqa: PLW2901
+        if v.lower() in LITERALS:
+            parsed.append(LITERALS[v.lower()])
+        elif v.lstrip("-").isdigit():
+            parsed.append(int(v))
+        else:
+            parsed.append(v)
+    return {name: parsed}
+
+
+def search_space(space: DictT[str, list]) -> ListT[dict]:
+    names = sorted(space)
+    return [dict(zip(names, values)) for values in itertools.product(*(space[n] for n in names))]  # noqa: B905
+
+
+class Tuner:
+    def __init__(self, root: str, modules: ListStr, *, app: UnionT[Application, None] = None):
+        self.root = os.path.realpath(root)
+        self.modules = modules
+        self.app = app or QuietApplication()
+        self.builder = WheelBuilder(self.root)
+        self.config = self.builder.config.hook_config.get(CythonBuildHook.PLUGIN_NAME, {})
+        self.base = "./src" if os.path.exists(os.path.join(self.root, "src")) else "."
+
+    def variant_config(self, directives: UnionT[dict, None]) -> dict:
+        config = copy.deepcopy(self.config)
+        options = config.setdefault("options", {})
+        # measured against the configured directives, without earlier tuning
+        options["tuned"] = False
+        if directives is not None:
+            options["overrides"] = [
+                *options.get("overrides", []),
+                {"matches": [module_glob(m, self.base) for m in self.modules], "directives": directives},
+            ]
+        return config
+
+    def build(self, config: dict):
+        hook = CythonBuildHook.for_project(self.root, config=config, app=self.app)
+        with cwd(self.root):
+            hook.initialize("standard", {"artifacts": [], "force_include": {}})
+
+    def test(self, test: str, path: ListStr) -> subprocess.CompletedProcess:
+        # the tests import the package as built in place
+        env = {**os.environ, "PYTHONPATH": os.pathsep.join([*path, os.environ.get("PYTHONPATH", "")])}
+        return subprocess.run(  # noqa: S603
+            shlex.split(test), cwd=self.root, env=env, capture_output=True, text=True, check=False
+        )
+
+
+def measure_compiled(benchmarks: ListT[Benchmark], *, path: ListStr, processes: int, rounds: int) -> DictT[str, list]:
+    """benchmark -> seconds per call, pooled across processes"""
+    job = {
+        "benchmarks": [vars(b) for b in benchmarks],
+        "packages": [],
+        "rounds": rounds,
+        "warmup": 2,
+        "number": 0,
+        "min_time": 0.01,
+        "pure": False,
+    }
+    samples: DictT[str, list] = {}
+    for _ in range(processes):
+        for result in run_job(job, path=path):
+            samples.setdefault(result["name"], []).extend(result["samples"])
+    return samples
+
+
+def tuned_module(benchmark: Benchmark, modules: ListStr) -> UnionT[str, None]:
+    """The first of the tuned module globs the benchmark measures, if any"""
+    return next((m for m in modules if fnmatchcase(benchmark.module, m)), None)
+
+
+def select(
+    benchmarks: ListT[Benchmark],
+    baseline: DictT[str, list],
+    variants: ListT[tuple],
+    *,
+    modules: ListStr,
+    confidence: float = 0.95,
+) -> DictT[str, dict]:
+    """The fastest variant per tuned module glob, if faster than the baseline with the given confidence
+
+    Args:
+        variants: [(directives, benchmark -> samples), ...] of the variants which passed the tests
+        modules: the tuned module globs; benchmarks measuring none of them are not considered
+
+    Returns:
+        DictT[str, dict]: module glob -> {"directives", "speedup", "low", "high"}
+    """
+    by_module: DictT[str, ListStr] = {}
+    for b in benchmarks:
+        module = tuned_module(b, modules)
+        if module is not None:
+            by_module.setdefault(module, []).append(b.target)
+    best = {}
+    for module, names in sorted(by_module.items()):
+        for directives, samples in variants:
+            speedup, low, high = bootstrap([(baseline[n], samples[n]) for n in names], confidence=confidence)
+            if low > 1 and speedup > best.get(module, {}).get("speedup", 0):
+                best[module] = {"directives": directives, "speedup": speedup, "low": low, "high": high}
+    return best
+
+
+def main(argv=None) -> dict:
+    parser = argparse.ArgumentParser(prog="python -m hatch_cython.tune", description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--root", default=".", help="project root")
+    parser.add_argument("--module", action="append", required=True, help="dotted module glob to tune")
+    parser.add_argument("--bench", action="append", required=True, help="[module=]import.path:callable")
+    parser.add_argument("--test", required=True, help="test command; variants failing it are rejected")
+    parser.add_argument(
+        "--directive",
+        action="append",
+        help=f"directive to search, as name (true & false) or name=value,value. default {', '.join(DEFAULT_SPACE)}",
+    )
+    parser.add_argument("--path", action="append", default=[], help="import path of the built package, e.g. src")
+    parser.add_argument("--processes", type=int, default=3, help="benchmark subprocesses per variant")
+    parser.add_argument("--rounds", type=int, default=20, help="timed rounds per subprocess")
+    parser.add_argument("--output", default=TUNED, help="tuned directives, relative to the project root")
+    args = parser.parse_args(argv)
+
+    space = {}
+    for spec in args.directive or DEFAULT_SPACE:
+        space.update(parse_directive(spec))
+    benchmarks = [parse_benchmark(b) for b in args.bench]
+    unmapped = [b for b in benchmarks if tuned_module(b, args.module) is None]
+    if len(unmapped) == len(benchmarks):
+        parser.error(
+            f"no benchmark measures a tuned module ({', '.join(args.module)}); "
+            "name the module a benchmark measures as module=import.path:callable"
+        )
+    for b in unmapped:
+        print(f"ignoring  {b.target}: measures {b.module}, which is not tuned")  # noqa: T201
+    path = [os.path.abspath(os.path.join(args.root, p)) for p in args.path] or [os.path.abspath(args.root)]
+    tuner = Tuner(args.root, args.module)
+
+    def run(directives: UnionT[dict, None]) -> UnionT[DictT[str, list], subprocess.CompletedProcess]:
+        tuner.build(tuner.variant_config(directives))
+        tested = tuner.test(args.test, path)
+        if tested.returncode != 0:
+            return tested
+        return measure_compiled(benchmarks, path=path, processes=args.processes, rounds=args.rounds)
+
+    baseline = run(None)
+    if isinstance(baseline, subprocess.CompletedProcess):
+        msg = f"the tests fail with the configured directives ({args.test}):\n{baseline.stdout}{baseline.stderr}"
+        raise Exception(msg)
+
+    passed = []
+    rejected = []
+    for directives in search_space(space):
+        samples = run(directives)
+        if isinstance(samples, subprocess.CompletedProcess):
+            print(f"rejected  {directives}: tests failed")  # noqa: T201
+            rejected.append(directives)
+            continue
+        times = ", ".join(f"{median(s) * 1e6:.2f}us" for s in samples.values())
+        print(f"passed    {directives}: {times}")  # noqa: T201
+        passed.append((directives, samples))
+
+    best = select(benchmarks, baseline, passed, modules=args.module)
+    result = {
+        "directives": {m: b["directives"] for m, b in best.items()},
+        "speedups": {m: {k: v for k, v in b.items() if k != "directives"} for m, b in best.items()},
+        "rejected": rejected,
+    }
+    output = os.path.join(args.root, args.output)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+        f.write("\n")
+    for module, b in best.items():
+        print(f"{module}: {b['speedup']:.2f}x [{b['low']:.2f}x, {b['high']:.2f}x] with {b['directives']}")  # noqa: T201
+    print(f"wrote {output}; enable it with `tuned = true` in the hook options")  # noqa: T201
+
+    # leave the tree built as a normal build would
+    config = copy.deepcopy(tuner.config)
+    config.setdefault("options", {})["tuned"] = args.output if best else False
+    tuner.build(config)
+    return result
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,15 @@
 import os
 import platform
+import weakref
+from contextlib import contextmanager
 from textwrap import dedent
 
 from Cython import __version__ as __cythonversion__
+from hatchling.bridge.app import Application
 
 from hatch_cython.__about__ import __version__
 from hatch_cython.constants import NORM_GLOB, UAST
-from hatch_cython.types import CallableT, P, T, UnionT
+from hatch_cython.types import CallableT, ListT, P, T, TupleT, UnionT
 
 
 def stale(src: str, dest: str):
@@ -33,6 +36,9 @@ def memo(func: CallableT[P, T]) -> CallableT[P, T]:
 
         if idof not in keyed:
             keyed[idof] = func(*args, **kwargs)
+            if idof is not None:
+                # ids are reused once the instance is collected, e.g. by the hooks of successive watch builds
+                weakref.finalize(args[0], keyed.pop, idof, None)
         return keyed[idof]
 
     return wrapped
@@ -77,3 +83,76 @@ def autogenerated(keywords: dict):
 # Keywords: {keywords!r}
 """
     )
+
+
+class QuietApplication(Application):
+    # shows only warnings & errors, for tools running many builds
+    def display_info(self, *_, **__):
+        pass
+
+    def display_debug(self, *_, **__):
+        pass
+
+    def display_waiting(self, *_, **__):
+        pass
+
+    def display_success(self, *_, **__):
+        pass
+
+    def display_mini_header(self, *_, **__):
+        pass
+
+
+class RecordingApplication(Application):
+    # keeps the messages, for the process they are shown in, e.g. of options resolved by the build daemon
+    def __init__(self):
+        super().__init__()
+        self.messages: ListT[TupleT[str, str]] = []
+
+    def display_info(self, message: str = "", **_):
+        self.messages.append(("info", message))
+
+    def display_warning(self, message: str = "", **_):
+        self.messages.append(("warning", message))
+
+    def display_error(self, message: str = "", **_):
+        self.messages.append(("error", message))
+
+    def display_debug(self, message: str = "", *_, **__):
+        self.messages.append(("debug", message))
+
+    def display_waiting(self, message: str = "", **_):
+        self.messages.append(("waiting", message))
+
+    def display_success(self, message: str = "", **_):
+        self.messages.append(("success", message))
+
+    def display_mini_header(self, message: str = "", **_):
+        self.messages.append(("mini_header", message))
+
+
+@contextmanager
+def cwd(path: str):
+    previous = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+
+@contextmanager
+def locked(path: str):
+    """Holds an exclusive lock on the file at `path`, where the platform has flock"""
+    try:
+        import fcntl
+    except ImportError:
+        yield
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
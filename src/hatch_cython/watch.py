@@ -0,0 +1,104 @@
+"""
+Rebuilds extensions in place as their sources change, for development from a source checkout. Each change
+re-renders the affected templates, recompiles the affected extensions only & swaps them into place atomically.
+Uses inotify on linux, else polls.
+
+    python -m hatch_cython.watch [--root .] [--poll]
+"""
+
+import argparse
+import os
+import time
+
+from Cython.Build.Dependencies import create_dependency_tree
+from hatchling.bridge.app import Application
+
+from hatch_cython.filewatch import CONFIG_FILES, wait, watcher
+from hatch_cython.plugin import CythonBuildHook
+from hatch_cython.types import ListT, Set, TupleT, UnionT
+from hatch_cython.utils import QuietApplication, cwd
+
+
+class Watch:
+    def __init__(self, root: str, *, app: UnionT[Application, None] = None):
+        self.root = os.path.realpath(root)
+        self.app = app or QuietApplication()
+
+    def hook(self) -> CythonBuildHook:
+        # the configuration is read for each build, as it may have changed
+        hook = CythonBuildHook.for_project(self.root, app=self.app)
+        hook.atomic = True
+        return hook
+
+    def paths(self, hook: CythonBuildHook) -> ListT[TupleT[str, bool]]:
+        """(directory, recursive) to watch: the package, include dirs within the project & the project root"""
+        paths = [(self.root, False), (os.path.realpath(os.path.join(self.root, hook.project_dir)), True)]
+        for include in hook.options.includes:
+            include = os.path.realpath(os.path.join(self.root, include))  # noqa: PLW2901
+            if include.startswith(self.root + os.sep) and os.path.isdir(include):
+                paths.append((include, True))
+        return paths
+
+    def affected(self, hook: CythonBuildHook, changed: Set[str]) -> UnionT[Set[str], None]:
+        """Names of the extensions depending on the changed paths. None if all are"""
+        if any(os.path.basename(f) in CONFIG_FILES for f in changed):
+            return None
+        # a template changes the source rendered from it
+        changed = changed | {f[:-3] for f in changed if f.endswith(".in")}
+        names = set()
+        with cwd(self.root):
+            tree = create_dependency_tree(quiet=True)
+            for ex in hook.grouped_included_files:
+                for f in ex["files"]:
+                    if os.path.splitext(f)[1] in (".py", ".pyx"):
+                        dependencies = {os.path.realpath(d) for d in tree.all_dependencies(f)}
+                    else:
+                        dependencies = {os.path.realpath(f)}
+                    if dependencies & changed:
+                        names.add(ex["name"])
+        return names
+
+    def build(self, hook: CythonBuildHook, only: UnionT[Set[str], None] = None):
+        hook.only = only
+        with cwd(self.root):
+            hook.initialize("standard", {"artifacts": [], "force_include": {}})
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m hatch_cython.watch", description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--root", default=".", help="project root")
+    parser.add_argument("--poll", action="store_true", help="poll for changes rather than using inotify")
+    parser.add_argument("--interval", type=float, default=0.5, help="polling interval, in seconds")
+    parser.add_argument("--debounce", type=float, default=0.2, help="quiet period ending a batch of changes")
+    args = parser.parse_args(argv)
+
+    watch = Watch(args.root)
+    hook = watch.hook()
+    start = time.perf_counter()
+    watch.build(hook)
+    print(f"built in {time.perf_counter() - start:.2f}s, watching for changes")  # noqa: T201
+    watching = watcher(watch.paths(hook), poll=args.poll, interval=args.interval)
+    try:
+        while True:
+            changed = wait(watching, args.debounce)
+            start = time.perf_counter()
+            try:
+                hook = watch.hook()
+                only = None if changed is None else watch.affected(hook, changed)
+                if only is not None and not only:
+                    continue
+                watch.build(hook, only)
+            except Exception as e:
+                # keep watching; the next change may fix the build
+                print(f"build failed: {e}")  # noqa: T201
+                continue
+            built = "all extensions" if only is None else ", ".join(sorted(only))
+            print(f"rebuilt {built} in {time.perf_counter() - start:.2f}s")  # noqa: T201
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watching.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+import json
+import subprocess
+import sys
+from textwrap import dedent
+
+from hatch_cython.config import Config
+from hatch_cython.config.annotations import parse_annotations
+from hatch_cython.reports.annotations import build_report, merge_baseline, regressions, score_module, write_report
+
+SOURCE = """
+import math
+
+def untyped(x):
+    y = x + 1
+    return y
+
+cdef int typed(int a):
+    return a * 2
+
+class Counter:
+    def total(self, int n):
+        cdef int i
+        cdef int s = 0
+        for i in range(n):
+            s += i
+        return s
+"""
+
+
+def test_annotation_args():
+    assert not parse_annotations(False).enabled
+    args = parse_annotations({"hot": "pkg.kernels.*"})
+    assert args.enabled
+    assert args.is_hot("pkg.kernels.a")
+    assert not args.is_hot("pkg.io")
+
+    assert Config(annotations=args).cythonize_kwargs == {"annotate": True}
+    assert Config(annotations=args, cythonize_kwargs={"annotate": "fullc"}).annotate
+    assert not Config().annotate
+
+
+def test_annotation_report(tmp_path):
+    source = tmp_path / "mod.pyx"
+    source.write_text(dedent(SOURCE))
+    subprocess.check_call([sys.executable, "-m", "cython", "-3", "-a", str(source)])  # noqa: S603
+
+    score = score_module("pkg.mod", str(source), str(tmp_path / "mod.html"))
+    assert score.lines == len(dedent(SOURCE).strip().splitlines()) + 1
+    functions = {f.name: f for f in score.functions}
+    assert functions["untyped"].line == 4
+    assert functions["untyped"].yellow_lines == 3
+    assert "typed" not in functions
+    assert functions["Counter.total"].line == 12
+    assert score.yellow_lines == sum(f.yellow_lines for f in score.functions)
+
+    report = build_report([score])
+    assert report["totals"]["yellow_lines"] == score.yellow_lines
+    report_json, index = write_report(report, str(tmp_path / "out"))
+    with open(report_json) as f:
+        assert json.load(f) == report
+    with open(index) as f:
+        assert 'href="../mod.html"' in f.read()
+
+    worse = json.loads(json.dumps(report))
+    worse["modules"][0]["yellow_lines"] += 1
+    assert regressions(worse, report, lambda m: m.startswith("pkg.")) == [
+        ("pkg.mod", score.yellow_lines, score.yellow_lines + 1)
+    ]
+    assert regressions(worse, report, lambda _: False) == []
+    assert regressions(report, worse, lambda _: True) == []
+    assert regressions(worse, None, lambda _: True) == []
+
+    # a partial build replaces the modules it compiled, keeping the rest
+    other = {**report["modules"][0], "module": "pkg.other", "yellow_lines": 100}
+    merged = merge_baseline(merge_baseline(None, {"modules": [other]}), worse)
+    assert [m["module"] for m in merged["modules"]] == ["pkg.other", "pkg.mod"]
+    assert merged["modules"][1]["yellow_lines"] == score.yellow_lines + 1
+    assert merged["totals"]["yellow_lines"] == 100 + score.yellow_lines + 1
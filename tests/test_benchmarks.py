@@ -0,0 +1,44 @@
+import os
+
+from benchmarks.bench import main
+from benchmarks.project import ProjectSpec, packages
+
+
+def test_packages():
+    assert packages(ProjectSpec(depth=2, fanout=2)) == [
+        "",
+        "p0",
+        "p1",
+        os.path.join("p0", "p0"),
+        os.path.join("p0", "p1"),
+        os.path.join("p1", "p0"),
+        os.path.join("p1", "p1"),
+    ]
+
+
+def test_benchmarks(tmp_path):
+    out = main(
+        [
+            "--sizes",
+            "6",
+            "--depth",
+            "1",
+            "--templates",
+            "2",
+            "--excludes",
+            "3",
+            "--repeat",
+            "1",
+            "--build-max",
+            "0",
+            "--keep",
+            str(tmp_path),
+            "--json",
+            str(tmp_path / "bench.json"),
+        ]
+    )
+    assert [o["spec"]["modules"] for o in out] == [6]
+    assert sorted(out[0]["results"]) == ["config", "discovery", "hook", "setup.py", "templates"]
+    assert (tmp_path / "bench.json").exists()
+    assert len(list((tmp_path / "project_6" / "src" / "benchlib").rglob("m*.py*"))) == 6
+    assert len(list((tmp_path / "project_6" / "src" / "benchlib").rglob("tmpl_*.pyx"))) == 2
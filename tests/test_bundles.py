@@ -0,0 +1,105 @@
+import ast
+import os
+import shutil
+from glob import glob
+from types import SimpleNamespace
+
+import pytest
+
+from hatch_cython.config import Config, parse_from_dict
+from hatch_cython.config.bundles import BundleArgs
+from hatch_cython.loader import loader_pth, loader_py
+from hatch_cython.temp import setup_py
+
+from .utils import build_project, run_python
+
+MODULES = [
+    "pkg.__init__",
+    "pkg.a",
+    "pkg.b",
+    "pkg.sub.__init__",
+    "pkg.sub.c",
+    "pkg.kernels.d",
+    "pkg.kernels.e",
+]
+
+
+def test_bundle_packages():
+    bundles = BundleArgs(packages=True)
+    assert bundles.enabled
+    assert bundles.group(MODULES) == {
+        "pkg._bundle": ["pkg.a", "pkg.b"],
+        "pkg.kernels._bundle": ["pkg.kernels.d", "pkg.kernels.e"],
+    }
+
+
+def test_bundle_groups():
+    bundles = BundleArgs(groups=[{"name": "pkg._hot", "matches": ["pkg.kernels.*", "pkg.sub.c"]}])
+    assert bundles.group(MODULES) == {"pkg._hot": ["pkg.kernels.d", "pkg.kernels.e", "pkg.sub.c"]}
+
+    assert not BundleArgs().enabled
+    assert BundleArgs().group(MODULES) == {}
+
+
+def test_bundle_validations():
+    with pytest.raises(ValueError):
+        BundleArgs(groups=[{"matches": "pkg.*"}])
+
+    bundles = BundleArgs(groups=[{"name": "pkg._all", "matches": "pkg.*"}])
+    with pytest.raises(ValueError):
+        bundles.group(["pkg.a", "pkg.sub.a"])
+
+
+def test_bundle_setup_and_loader():
+    setup = setup_py(
+        {"name": "pkg.a", "files": ["./pkg/a.py"]},
+        {"name": "pkg.b", "files": ["./pkg/b.py"]},
+        options=Config(),
+        sdist=False,
+        bundles={"pkg._bundle": ["pkg.a", "pkg.b"]},
+    )
+    ast.parse(setup)
+    assert "BUNDLES = {'pkg._bundle': ['pkg.a', 'pkg.b']}" in setup
+
+    loader = loader_py({"pkg.a": "pkg._bundle", "pkg.b": "pkg._bundle"})
+    ast.parse(loader)
+    assert "BUNDLES = {'pkg.a': 'pkg._bundle', 'pkg.b': 'pkg._bundle'}" in loader
+    assert loader_pth("pkg") == "import _hatch_cython_pkg\n"
+
+
+def test_bundle_args():
+    config = {"options": {"overrides": [{"matches": "*/pkg/b.py", "compile_args": ["-O3", "-ffast-math"]}]}}
+    options = parse_from_dict(SimpleNamespace(config=config))
+    extensions = [
+        options.extension_args({"name": "pkg.a", "files": ["./src/pkg/a.py"]}),
+        options.extension_args({"name": "pkg.b", "files": ["./src/pkg/b.py"]}),
+        options.extension_args({"name": "pkg.c", "files": ["./src/pkg/c.py"]}),
+    ]
+    conflicts = options.unify_bundles(extensions, {"pkg._bundle": ["pkg.a", "pkg.b"]})
+    assert conflicts == ["bundle pkg._bundle builds its members with one -O: pkg.a -O2, pkg.b -O3; using -O3"]
+
+    a, b, c = extensions
+    assert a["extra_compile_args"] == b["extra_compile_args"]
+    assert [arg for arg in a["extra_compile_args"] if arg.startswith("-O")] == ["-O3"]
+    assert "-ffast-math" in a["extra_compile_args"]
+    assert "extra_compile_args" not in c
+    assert options.unify_bundles(extensions, {"pkg._bundle": ["pkg.a", "pkg.b"]}) == []
+
+
+def test_bundle_build(tmp_path):
+    build_data = build_project(
+        tmp_path,
+        {"a.pyx": "def f():\n    return 1\n", "b.pyx": "def g():\n    return 2\n"},
+        {"bundles": {"packages": True}},
+    )
+    package = tmp_path / "src" / "spk"
+    # package __init__ modules are never bundled
+    assert sorted(os.path.basename(f).split(".")[0] for f in glob(str(package / "*.so"))) == ["__init__", "_bundle"]
+    # the finder is installed at the root of the wheel, beside the package
+    for src, dst in build_data["force_include"].items():
+        if dst.startswith("_hatch_cython_spk."):
+            shutil.copy(src, tmp_path / "src" / dst)
+    code = "import _hatch_cython_spk, spk.a, spk.b; print(spk.a.f() + spk.b.g(), spk.a.__file__)"
+    output = run_python(code, str(tmp_path / "src"))
+    assert output.startswith("3 ")
+    assert "_bundle" in output
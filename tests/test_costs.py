@@ -0,0 +1,74 @@
+import ast
+import csv
+import json
+import sys
+
+import pytest
+
+from hatch_cython.config import Config
+from hatch_cython.config.costs import parse_costs
+from hatch_cython.reports.costs import REAPED, ReapedPopen, child_peak, collect, format_size, own_peak, write_costs
+from hatch_cython.temp import setup_py
+
+
+def test_costs_args():
+    assert not parse_costs(False).enabled
+    assert parse_costs({"top": 3}).enabled
+    assert parse_costs({"top": 3}).top == 3
+
+
+def test_costs_setup():
+    setup = setup_py({"name": "pkg.a", "files": ["./pkg/a.pyx"]}, options=Config(), sdist=False, costs="/t/c.jsonl")
+    ast.parse(setup)
+    assert "instrument('/t/c.jsonl')" in setup
+    assert "instrument" not in setup_py({"name": "pkg.a", "files": ["./pkg/a.pyx"]}, options=Config(), sdist=False)
+
+
+def test_collect(tmp_path):
+    c_file = tmp_path / "a.c"
+    c_file.write_text("int a;\nint b;\n")
+    so = tmp_path / "a.so"
+    so.write_bytes(b"\0" * 100)
+    events = [
+        {"kind": "cythonize", "module": None, "c_file": str(c_file), "seconds": 1.0},
+        {"kind": "compile", "module": "pkg.a", "seconds": 2.0, "peak_rss": 2048},
+        {"kind": "link", "module": "pkg.a", "seconds": 0.5, "peak_rss": 1024},
+        {"kind": "build", "module": "pkg.a", "sources": [str(c_file)], "output": str(so), "seconds": 2.5},
+        {"kind": "compile", "module": "pkg.b", "seconds": 0.1, "peak_rss": None},
+        {"kind": "build", "module": "pkg.b", "sources": [], "output": str(tmp_path / "b.so"), "seconds": 0.1},
+    ]
+    costs = collect(events)
+    assert [c.module for c in costs] == ["pkg.a", "pkg.b"]
+    a, b = costs
+    assert a.cythonize_seconds == 1.0
+    assert a.compile_seconds == 2.0
+    assert a.link_seconds == 0.5
+    assert a.total_seconds == 3.5
+    assert a.peak_rss == 2048
+    assert a.c_lines == 2
+    assert a.binary_size == 100
+    assert b.peak_rss is None
+    assert b.binary_size == 0
+
+    costs_json, costs_csv = write_costs(costs, str(tmp_path / "out"))
+    with open(costs_json) as f:
+        assert json.load(f)["totals"]["seconds"] == 3.6
+    with open(costs_csv) as f:
+        assert [r["module"] for r in csv.DictReader(f)] == ["pkg.a", "pkg.b"]
+
+    assert format_size(None) == "-"
+    assert format_size(2048) == "2KiB"
+
+
+@pytest.mark.skipif(own_peak() is None, reason="posix only")
+def test_child_peak():
+    size = own_peak() + 256 * 2**20
+    allocate = f"b = bytearray({size}); b[::4096] = b'1' * len(b[::4096])"
+    for code, expect_peak in (("pass", False), (allocate, True)):
+        REAPED.usage = None
+        parent_peak = own_peak()
+        with ReapedPopen([sys.executable, "-c", code]) as process:
+            assert process.wait() == 0
+        peak = child_peak(REAPED.usage, parent_peak)
+        # the child's own peak, the interpreter spawning it aside
+        assert (peak is not None and peak >= size) if expect_peak else peak is None
@@ -0,0 +1,117 @@
+import json
+import os
+import sys
+import tempfile
+
+import pytest
+
+from hatch_cython.config import Config
+from hatch_cython.config.daemon import parse_daemon
+from hatch_cython.config.serial import decode, encode
+from hatch_cython.daemon import connect, private, request, resolve, run_setup, socket_path, start, supported
+
+pytestmark = pytest.mark.skipif(not supported(), reason="the build daemon requires unix sockets & fork")
+
+
+def test_daemon_args():
+    assert not parse_daemon(False).enabled
+    assert parse_daemon({"idle_timeout": 60}).enabled
+    with pytest.raises(ValueError):
+        parse_daemon({"idle_timeout": 0})
+
+
+def test_socket_path(tmp_path):
+    path = socket_path(str(tmp_path / ("deep" * 40)))
+    assert path == socket_path(str(tmp_path / ("deep" * 40)))
+    assert path != socket_path(str(tmp_path))
+    assert len(path) < 100
+    # not in the shared temp dir itself, where other users could bind it
+    assert os.path.dirname(path) != tempfile.gettempdir()
+
+
+def test_private(tmp_path):
+    shared = tmp_path / "shared"
+    shared.mkdir()
+    shared.chmod(0o777)
+    assert not private(str(shared / "d.sock"))
+    assert not private(str(tmp_path / "missing" / "d.sock"))
+    shared.chmod(0o700)
+    assert private(str(shared / "d.sock"))
+
+
+def test_encode_options():
+    config = Config(define_macros=[("A", "1"), ("B", None)], lto="thin")
+    decoded = decode(json.loads(json.dumps(encode(config))))
+    assert decoded == config
+    assert decoded.define_macros == [("A", "1"), ("B", None)]
+    # only the classes of the options are rebuilt
+    with pytest.raises(TypeError):
+        decode({"__hatch_cython_class__": "os:system", "attrs": {}})
+    with pytest.raises(TypeError):
+        encode(object())
+
+
+def test_no_daemon(tmp_path):
+    path = str(tmp_path / "missing.sock")
+    assert run_setup(path, ["setup.py"], env={}, cwd=str(tmp_path)) is None
+
+
+def test_run_setup(tmp_path):
+    setup = tmp_path / "setup.py"
+    setup.write_text(
+        "import os, sys\n"
+        "print(sys.argv[1:], os.getcwd(), os.environ['MARK'])\n"
+        "print('to stderr', file=sys.stderr)\n"
+        "sys.exit(int(sys.argv[1]))\n"
+    )
+    path = str(tmp_path / "d.sock")
+    assert start(path, idle_timeout=30)
+    try:
+        env = {**os.environ, "MARK": "marked"}
+        code, output = run_setup(path, [str(setup), "3"], env=env, cwd=str(tmp_path))
+        assert code == 3
+        assert f"['3'] {os.path.realpath(tmp_path)} marked" in output.replace(str(tmp_path), os.path.realpath(tmp_path))
+        assert "to stderr" in output
+        # the daemon survives builds & its environment is not the build's
+        code, _ = run_setup(path, [str(setup), "0"], env=env, cwd=str(tmp_path))
+        assert code == 0
+        assert "MARK" not in os.environ
+        assert request(path, {"command": "status"})["pid"] != os.getpid()
+        # nor served from a directory other users can bind in
+        (tmp_path).chmod(0o777)
+        assert connect(path) is None
+        (tmp_path).chmod(0o755)
+        # a daemon running other code refuses the build & exits
+        assert request(path, {"argv": [sys.executable], "fingerprint": "other"}) == {"error": "stale"}
+    finally:
+        request(path, {"command": "stop"})
+
+
+def test_resolve(tmp_path):
+    (tmp_path / "pyproject.toml").write_text('[project]\nname = "spk"\nversion = "0.1"\n')
+    (tmp_path / "src" / "spk").mkdir(parents=True)
+    (tmp_path / "src" / "spk" / "__init__.py").write_text("")
+    (tmp_path / "src" / "spk" / "a.pyx").write_text("x = 1\n")
+    path = str(tmp_path / "d.sock")
+    assert start(path, idle_timeout=30)
+    try:
+        kwargs = {"root": str(tmp_path), "config": {"options": {"compile_py": False}}, "target": "wheel", "env": {}}
+        first = resolve(path, **kwargs)
+        assert first["reused"] == []
+        assert not first["options"].compile_py
+        assert [os.path.basename(f) for f in first["files"]] == ["a.pyx"]
+        assert resolve(path, **kwargs)["reused"] == ["options", "files"]
+
+        # a new source is discovered, with the options kept
+        (tmp_path / "src" / "spk" / "b.pyx").write_text("x = 2\n")
+        added = resolve(path, **kwargs)
+        assert added["reused"] == ["options"]
+        assert sorted(os.path.basename(f) for f in added["files"]) == ["a.pyx", "b.pyx"]
+
+        # the configuration is read again
+        (tmp_path / "pyproject.toml").write_text('[project]\nname = "spk"\nversion = "0.2"\n')
+        os.utime(tmp_path / "pyproject.toml", ns=(0, os.stat(tmp_path / "pyproject.toml").st_mtime_ns + 10**9))
+        assert resolve(path, **kwargs)["reused"] == []
+        assert resolve(path, **{**kwargs, "config": {}})["options"].compile_py
+    finally:
+        request(path, {"command": "stop"})
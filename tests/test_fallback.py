@@ -0,0 +1,84 @@
+import json
+from types import SimpleNamespace
+
+from hatch_cython.config.fallback import FallbackArgs, parse_fallback, read_fallback, select_fallback, update_fallback
+from hatch_cython.plugin import CythonBuildHook
+from hatch_cython.speedups import ModuleSpeedup
+
+from .utils import override_dir
+
+
+def write_speedups(path, *results: ModuleSpeedup):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps({"confidence": 0.95, "modules": [{**vars(r), "verdict": r.verdict} for r in results]}))
+
+
+def test_fallback_args():
+    assert not parse_fallback(False).enabled
+    assert parse_fallback({"min_speedup": 1.2}).enabled
+    assert parse_fallback(True).file == "cython-fallback.txt"
+
+
+def test_select_fallback():
+    selected = select_fallback(
+        [
+            ModuleSpeedup("pkg.fast", 3.0, 2.5, 3.5),
+            ModuleSpeedup("pkg.glue", 1.0, 0.9, 1.1),
+            ModuleSpeedup("pkg.slow", 0.8, 0.7, 0.9),
+            ModuleSpeedup("pkg.unbuilt", 1.0, 0.9, 1.1, compiled=False),
+        ],
+        1.0,
+    )
+    assert list(selected) == ["pkg.glue", "pkg.slow"]
+    assert selected["pkg.slow"] == "0.80x [0.70x, 0.90x] slower"
+    assert list(select_fallback([ModuleSpeedup("pkg.fast", 3.0, 2.5, 3.5)], 3.0)) == ["pkg.fast"]
+
+
+def test_update_fallback(tmp_path):
+    args = FallbackArgs(enabled=True)
+    speedups = tmp_path / args.speedups
+    listed = tmp_path / args.file
+    assert update_fallback(args, str(tmp_path)) == ([], [], [])
+    assert not listed.exists()
+
+    write_speedups(speedups, ModuleSpeedup("pkg.glue", 1.0, 0.9, 1.1), ModuleSpeedup("pkg.fast", 3.0, 2.5, 3.5))
+    assert update_fallback(args, str(tmp_path)) == (["pkg.glue"], ["pkg.glue"], [])
+    assert "pkg.glue  # 1.00x" in listed.read_text()
+
+    # a reviewed addition survives builds, and measurements which do not cover it
+    listed.write_text(listed.read_text() + "pkg.manual\n")
+    assert update_fallback(args, str(tmp_path)) == (["pkg.glue", "pkg.manual"], [], [])
+    write_speedups(speedups, ModuleSpeedup("pkg.glue", 2.0, 1.5, 2.5))
+    assert update_fallback(args, str(tmp_path)) == (["pkg.manual"], [], ["pkg.glue"])
+    assert read_fallback(str(listed))[1] == {"pkg.manual": ""}
+
+    write_speedups(speedups, ModuleSpeedup("pkg.manual", 2.0, 1.5, 2.5))
+    frozen = FallbackArgs(enabled=True, update=False)
+    assert update_fallback(frozen, str(tmp_path)) == (["pkg.manual"], [], [])
+
+
+def test_fallback_excludes(tmp_path):
+    pkg = tmp_path / "src" / "spk"
+    (pkg / "sub").mkdir(parents=True)
+    for f in ("__init__.py", "fast.py", "glue.py", "glue_more.py", "sub/__init__.py"):
+        (pkg / f).write_text("")
+    # left over from a previous build
+    (pkg / "glue.cpython-311-x86_64-linux-gnu.so").write_bytes(b"")
+    (tmp_path / "cython-fallback.txt").write_text("spk.glue\nspk.sub\n")
+
+    with override_dir(tmp_path):
+        hook = CythonBuildHook(
+            str(tmp_path),
+            {"options": {"compile_py": True, "fallback": True}},
+            {},
+            SimpleNamespace(name="spk"),
+            directory=str(tmp_path / "dist"),
+            target_name="wheel",
+        )
+        assert hook.options.files.fallback == ["spk.glue", "spk.sub"]
+        assert sorted(hook.normalized_included_files) == [
+            "./src/spk/__init__.py",
+            "./src/spk/fast.py",
+            "./src/spk/glue_more.py",
+        ]
+        assert hook.fallback_artifacts == ["./src/spk/glue.cpython-311-x86_64-linux-gnu.so"]
@@ -0,0 +1,117 @@
+import ast
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+
+from hatch_cython.config import Config
+from hatch_cython.config.helpers import HelperLibrary, parse_helpers
+from hatch_cython.config.toolchain import GCC
+from hatch_cython.plugin import CythonBuildHook
+from hatch_cython.temp import setup_py
+
+from .utils import override_dir
+
+
+def test_parse_helpers():
+    (helper,) = parse_helpers([{"name": "fastmath", "sources": ["include/*.cc"], "define_macros": [["FAST"]]}])
+    assert helper.define_macros == [("FAST", None)]
+    with pytest.raises(ValueError, match="no sources"):
+        parse_helpers([{"name": "fastmath"}])
+    with pytest.raises(ValueError, match="not a valid library name"):
+        parse_helpers([{"name": "../fastmath", "sources": ["a.c"]}])
+    with pytest.raises(ValueError, match="unique"):
+        parse_helpers([{"name": "a", "sources": ["a.c"]}, {"name": "a", "sources": ["b.c"]}])
+
+
+def test_helper_build_info():
+    cfg = Config(includes=["include"], compile_args=["-O2"], define_macros=[("A", "1")])
+    helper = HelperLibrary(name="fastmath", sources=["x.c"], compile_args=["-ffast-math"], define_macros=[["A", "2"]])
+    info = cfg.helper_build_info(helper, ["include/x.c"], ["include/x.h"])
+    assert info == {
+        "sources": ["include/x.c"],
+        "include_dirs": ["include"],
+        "macros": [("A", "2")],
+        "cflags": ["-ffast-math", "-O2"],
+        "obj_deps": {"": ["include/x.h"]},
+    }
+
+
+def test_helpers_setup():
+    helpers = [("fastmath", {"sources": ["include/x.cc"], "include_dirs": [], "macros": [], "cflags": []})]
+    code = setup_py(
+        {"name": "abc.a", "files": ["./abc/a.pyx"]},
+        options=Config(),
+        sdist=False,
+        helpers=helpers,
+        clib_dir="/cache/clib",
+    )
+    ast.parse(code)
+    assert "libraries=HELPERS" in code
+    assert "{'build_clib': '/cache/clib', 'build_temp': '/cache/clib'}" in code.replace('"', "'")
+    # each extension links the libraries it lists, not every one build_clib built
+    assert 'cmdclass={"build_ext": HelperBuildExt}' in code
+    atomic = setup_py(
+        {"name": "abc.a", "files": ["./abc/a.pyx"]},
+        options=Config(),
+        sdist=False,
+        atomic=True,
+        helpers=helpers,
+        clib_dir="/cache/clib",
+    )
+    ast.parse(atomic)
+    assert "class InplaceBuildExt(HelperBuildExt)" in atomic
+    assert atomic.count("cmdclass=") == 1
+
+
+def test_hook_helpers(tmp_path):
+    pkg = tmp_path / "src" / "spk"
+    (pkg / "_helpers").mkdir(parents=True)
+    (pkg / "__init__.py").write_text("")
+    (pkg / "a.pyx").write_text("# distutils: sources = src/spk/_helpers/vec.c\n")
+    (pkg / "_helpers" / "vec.c").write_text("int vec(void) { return 1; }\n")
+    (pkg / "_helpers" / "vec.h").write_text("int vec(void);\n")
+    options = {"helpers": [{"name": "vec", "sources": ["src/spk/_helpers/*.c"], "depends": ["src/spk/_helpers/*.h"]}]}
+    with override_dir(tmp_path):
+        hook = CythonBuildHook(
+            str(tmp_path),
+            {"options": options},
+            {},
+            SimpleNamespace(name="spk"),
+            directory=str(tmp_path / "dist"),
+            target_name="wheel",
+        )
+        (name, info), *_ = hook.helper_libraries
+        names = sorted(ex["name"] for ex in hook.grouped_included_files)
+    assert name == "vec"
+    assert info["sources"] == ["src/spk/_helpers/vec.c"]
+    assert info["obj_deps"] == {"": ["src/spk/_helpers/vec.h"]}
+    # the helper is linked in, not built as an extension of its own
+    assert names == ["spk.__init__", "spk.a"]
+
+
+def test_helpers_lto(tmp_path):
+    pkg = tmp_path / "src" / "spk"
+    (pkg / "_helpers").mkdir(parents=True)
+    (pkg / "__init__.py").write_text("")
+    (pkg / "a.pyx").write_text("")
+    (pkg / "_helpers" / "vec.c").write_text("int vec(void) { return 1; }\n")
+    options = {"lto": "thin", "helpers": [{"name": "vec", "sources": ["src/spk/_helpers/*.c"]}]}
+    with override_dir(tmp_path):
+        hook = CythonBuildHook(
+            str(tmp_path),
+            {"options": options},
+            {},
+            SimpleNamespace(name="spk"),
+            directory=str(tmp_path / "dist"),
+            target_name="wheel",
+        )
+        # discovery finds the helper sources before lto is resolved, as a build does
+        assert "src/spk/_helpers/vec.c" in hook.helper_sources
+        _ = hook.grouped_included_files
+        with patch("hatch_cython.config.config.compiler_family", lambda _: GCC):
+            with patch("hatch_cython.config.config.supports_flags", lambda *_, **__: True):
+                hook.options.resolve_lto(hook, str(tmp_path / "lto"))
+        (_, info), *_ = hook.helper_libraries
+    # compiled with lto, so calls into the helper inline across units
+    assert "-flto=auto" in info["cflags"]
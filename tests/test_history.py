@@ -0,0 +1,67 @@
+import pytest
+
+from hatch_cython.config.history import HistoryArgs, parse_history
+from hatch_cython.reports.costs import ExtensionCost
+from hatch_cython.reports.history import (
+    FULL,
+    NOOP,
+    PARTIAL,
+    BuildRecord,
+    baseline,
+    connect,
+    record_build,
+    regressions,
+)
+
+
+def build(seconds: float, size: int, compiled: int = 2, **kwargs):
+    costs = [
+        ExtensionCost(module=f"pkg.m{i}", compile_seconds=1.0 if i < compiled else 0.0, binary_size=size // 2)
+        for i in range(2)
+    ]
+    return BuildRecord(target="wheel", seconds=seconds, artifact_size=size, costs=costs, machine="test", **kwargs)
+
+
+def test_history_args():
+    assert not parse_history(False).enabled
+    assert parse_history({"fail": True}).enabled
+    with pytest.raises(ValueError):
+        HistoryArgs(builds=0)
+
+
+def test_build_kind():
+    assert build(1, 10).kind == FULL
+    assert build(1, 10, compiled=1).kind == PARTIAL
+    assert build(1, 10, compiled=0).kind == NOOP
+    assert build(1, 10, compiled=1).cache_hit_rate == 0.5
+
+
+def test_history_baseline(tmp_path):
+    args = HistoryArgs(enabled=True, builds=3, min_builds=2)
+    conn = connect(str(tmp_path / "cache" / "history.sqlite3"))
+    try:
+        current = build(10.0, 1000, phases={"discovery": 0.1})
+        assert baseline(conn, current, args.builds) is None
+        assert regressions(current, None, args) == []
+
+        for seconds in (100.0, 10.0, 11.0, 9.0):
+            record_build(conn, build(seconds, 1000), accepted=True)
+        # rejected builds, other kinds & other profiles are not part of the baseline
+        record_build(conn, build(50.0, 5000), accepted=False)
+        record_build(conn, build(1.0, 1000, compiled=0), accepted=True)
+        record_build(conn, build(1.0, 1000, profile="debug"), accepted=True)
+
+        base = baseline(conn, current, args.builds)
+        assert base == {"builds": 3, "seconds": 10.0, "artifact_size": 1000}
+        assert regressions(current, base, args) == []
+        assert regressions(build(13.0, 1100), base, args) == [("seconds", 10.0, 13.0), ("artifact_size", 1000, 1100)]
+        # partial builds only gate the size
+        assert regressions(build(13.0, 1000, compiled=1), base, args) == []
+        assert regressions(build(13.0, 1000), base, HistoryArgs(min_builds=4)) == []
+
+        assert conn.execute("SELECT COUNT(*) FROM extensions").fetchone() == (14,)
+        assert conn.execute("SELECT name, seconds FROM phases").fetchall() == []
+        record_build(conn, current, accepted=True)
+        assert conn.execute("SELECT name, seconds FROM phases").fetchall() == [("discovery", 0.1)]
+    finally:
+        conn.close()
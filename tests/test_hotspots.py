@@ -0,0 +1,125 @@
+import marshal
+import os
+from glob import glob
+from types import SimpleNamespace
+
+import pytest
+
+from hatch_cython.config.hotspots import (
+    COLLAPSED,
+    PSTATS,
+    HotspotArgs,
+    file_module,
+    hot_modules,
+    parse_hotspots,
+    select_hot,
+)
+from hatch_cython.plugin import CythonBuildHook
+
+from .utils import build_project, override_dir
+
+PROFILED = {
+    "/venv/lib/python3.11/site-packages/spk/hot.py": 8.0,
+    "/venv/lib/python3.11/site-packages/spk/sub/__init__.py": 1.5,
+    "/venv/lib/python3.11/site-packages/spk/cold.py": 0.5,
+    "/usr/lib/python3.11/json/decoder.py": 50.0,
+    "~": 10.0,
+}
+
+
+def write_pstats(path):
+    # {(file, line, function): (primitive calls, calls, tottime, cumtime, callers)}
+    stats = {(file, 1, "f"): (1, 1, seconds, seconds, {}) for file, seconds in PROFILED.items()}
+    path.write_bytes(marshal.dumps(stats))
+
+
+def write_collapsed(path):
+    path.write_text(
+        "\n".join(
+            (
+                "<module> (app.py:1);run (spk/hot.py:10);loop (spk/hot.py:20) 80",
+                "<module> (app.py:1);run (spk/hot.py:10);load (spk/sub/__init__.py:3) 15",
+                "<module> (app.py:1);glue (spk/cold.py:2) 5",
+                "<module> (app.py:1);decode (/usr/lib/python3.11/json/decoder.py:337) 500",
+                "process 1;spk/cold.py:glue:2 3",
+            )
+        )
+    )
+
+
+def test_hotspot_args():
+    assert not parse_hotspots(False).enabled
+    assert parse_hotspots("prof/prod.pstats").format == PSTATS
+    assert parse_hotspots({"profile": "prof/stacks.txt", "coverage": 0.9}).format == COLLAPSED
+    with pytest.raises(ValueError):
+        parse_hotspots(True)
+    with pytest.raises(ValueError):
+        parse_hotspots({"profile": "a.pstats", "coverage": 1.5})
+
+
+def test_file_module():
+    assert file_module("/site-packages/spk/sub/mod.py", "spk") == "spk.sub.mod"
+    assert file_module("C:\\app\\spk\\sub\\__init__.py", "spk") == "spk.sub"
+    assert file_module("/home/spk/venv/site-packages/spk/mod.cpython-311-x86_64-linux-gnu.so", "spk") == "spk.mod"
+    assert file_module("/usr/lib/json/decoder.py", "spk") is None
+    assert file_module("~", "spk") is None
+
+
+def test_select_hot():
+    modules = {"a": 8.0, "b": 1.5, "c": 0.5}
+    assert select_hot(modules, 0.95) == (["a", "b"], 0.95)
+    assert select_hot(modules, 0.5) == (["a"], 0.8)
+    assert select_hot(modules, 1.0)[0] == ["a", "b", "c"]
+    assert select_hot({}, 0.95) == ([], 0.0)
+
+
+def test_hot_modules(tmp_path):
+    write_pstats(tmp_path / "prod.pstats")
+    write_collapsed(tmp_path / "stacks.txt")
+    assert hot_modules(HotspotArgs(enabled=True, profile="prod.pstats"), str(tmp_path), "spk") == (
+        ["spk.hot", "spk.sub"],
+        0.95,
+    )
+    # 80 + 15 of 103 samples within spk fall short of 95%
+    assert hot_modules(HotspotArgs(enabled=True, profile="stacks.txt"), str(tmp_path), "spk") == (
+        ["spk.hot", "spk.sub", "spk.cold"],
+        1.0,
+    )
+    modules, covered = hot_modules(HotspotArgs(enabled=True, profile="stacks.txt", coverage=0.9), str(tmp_path), "spk")
+    assert modules == ["spk.hot", "spk.sub"]
+    assert covered == pytest.approx(95 / 103)
+
+
+def test_hotspot_targets(tmp_path):
+    pkg = tmp_path / "src" / "spk"
+    (pkg / "sub").mkdir(parents=True)
+    for f in ("__init__.py", "hot.py", "cold.py", "typed.pyx", "sub/__init__.py", "sub/other.py"):
+        (pkg / f).write_text("")
+    write_pstats(tmp_path / "prod.pstats")
+
+    with override_dir(tmp_path):
+        hook = CythonBuildHook(
+            str(tmp_path),
+            {"options": {"hotspots": "prod.pstats"}},
+            {},
+            SimpleNamespace(name="spk"),
+            directory=str(tmp_path / "dist"),
+            target_name="wheel",
+        )
+        assert hook.options.files.explicit_targets
+        assert sorted(hook.normalized_included_files) == [
+            "./src/spk/hot.py",
+            "./src/spk/sub/__init__.py",
+            "./src/spk/typed.pyx",
+        ]
+
+
+def test_hotspot_rebuild(tmp_path):
+    write_collapsed(tmp_path / "stacks.txt")
+    sources = {"hot.py": "def f():\n    return 1\n", "cold.py": "def g():\n    return 2\n"}
+    options = {"hotspots": {"profile": "stacks.txt", "coverage": 0.5}}
+    # the second build finds the .c generated by the first beside the hot module, which is not a source of it
+    for _ in range(2):
+        build_project(tmp_path, sources, options)
+        built = sorted(os.path.basename(f).split(".")[0] for f in glob(str(tmp_path / "src" / "spk" / "*.so")))
+        assert built == ["hot"]
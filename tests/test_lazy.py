@@ -0,0 +1,112 @@
+import ast
+import os
+import sys
+import warnings
+from importlib.machinery import EXTENSION_SUFFIXES
+from types import SimpleNamespace
+
+import pytest
+
+from hatch_cython.loader import lazy_loader_py
+from hatch_cython.plugin import CythonBuildHook
+
+from .utils import override_dir
+
+
+@pytest.fixture
+def finder(tmp_path, monkeypatch):
+    """Loads a lazy finder for spk.mod, whose build writes the 'extension' or fails"""
+    pure = tmp_path / "mod.py"
+    pure.write_text("")
+    build = tmp_path / "build" / "spk.mod"
+    build.mkdir(parents=True)
+    setup = build / "setup.py"
+    compiled = str(tmp_path / "mod")
+    setup.write_text(
+        "import os, sys\n"
+        "if os.environ.get('FAIL'):\n"
+        "    sys.exit(1)\n"
+        f"open({compiled + EXTENSION_SUFFIXES[0]!r}, 'w').close()\n"
+    )
+    modules = {
+        "spk.mod": {
+            "setup": str(setup),
+            "sources": [str(pure)],
+            "compiled": compiled,
+            "pure": str(pure),
+            "package": False,
+        }
+    }
+    namespace = {}
+    exec(compile(lazy_loader_py(modules, {}, str(tmp_path)), "loader", "exec"), namespace)  # noqa: S102
+    sys.meta_path.remove(namespace["HatchCythonLazyFinder"])
+    monkeypatch.delenv("HATCH_CYTHON_LAZY", raising=False)
+    return namespace, modules["spk.mod"]
+
+
+def test_lazy_background(finder):
+    namespace, module = finder
+    found = namespace["HatchCythonLazyFinder"]
+    assert found.find_spec("spk.other") is None
+    spec = found.find_spec("spk.mod")
+    # the pure module is served while the extension builds
+    assert spec.origin == module["pure"]
+    namespace["_builds"]["spk.mod"].join(30)
+    assert namespace["_compiled"](module) is not None
+    assert found.find_spec("spk.mod") is None
+
+
+def test_lazy_sync_and_failures(finder, monkeypatch):
+    namespace, module = finder
+    found = namespace["HatchCythonLazyFinder"]
+    monkeypatch.setenv("HATCH_CYTHON_LAZY", "0")
+    assert found.find_spec("spk.mod") is None
+    assert namespace["_compiled"](module) is None
+
+    monkeypatch.setenv("HATCH_CYTHON_LAZY", "sync")
+    monkeypatch.setenv("FAIL", "1")
+    with pytest.warns(RuntimeWarning, match="compiling spk.mod failed"):
+        assert found.find_spec("spk.mod") is None
+    # not retried until the sources change
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        found.find_spec("spk.mod")
+
+    monkeypatch.delenv("FAIL")
+    os.utime(module["pure"], (os.stat(module["pure"]).st_atime, os.stat(module["pure"]).st_mtime + 5))
+    assert found.find_spec("spk.mod") is None
+    assert namespace["_compiled"](module) is not None
+
+
+def test_lazy_editable(tmp_path):
+    pkg = tmp_path / "src" / "spk"
+    pkg.mkdir(parents=True)
+    for f in ("__init__.py", "arr.pyx", "arr.pxd", "glue.py"):
+        (pkg / f).write_text("")
+    with override_dir(tmp_path):
+        hook = CythonBuildHook(
+            str(tmp_path),
+            {"options": {"lazy": True}},
+            {},
+            SimpleNamespace(name="spk"),
+            directory=str(tmp_path / "dist"),
+            target_name="wheel",
+        )
+        build_data = {"artifacts": [], "force_include": {}, "force_include_editable": {}}
+        hook.initialize("editable", build_data)
+    assert build_data["artifacts"] == []
+    assert sorted(build_data["force_include_editable"].values()) == ["_hatch_cython_spk.pth", "_hatch_cython_spk.py"]
+    loader = next(k for k, v in build_data["force_include_editable"].items() if v.endswith(".py"))
+    with open(loader) as f:
+        tree = ast.parse(f.read())
+    modules = next(
+        ast.literal_eval(node.value)
+        for node in tree.body
+        if isinstance(node, ast.Assign) and node.targets[0].id == "MODULES"
+    )
+    assert sorted(modules) == ["spk", "spk.arr", "spk.glue"]
+    assert modules["spk"]["package"]
+    assert modules["spk.arr"]["pure"] is None
+    assert modules["spk.arr"]["sources"][1].endswith("arr.pxd")
+    assert os.path.exists(modules["spk.glue"]["setup"])
+    assert not list(pkg.glob("*.so"))
@@ -0,0 +1,54 @@
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+
+from hatch_cython.config import Config
+from hatch_cython.config.lto import lto_candidates
+from hatch_cython.config.toolchain import CLANG, GCC, MSVC, UNKNOWN
+
+from .utils import App, arch_platform
+
+
+def test_lto_candidates():
+    assert lto_candidates("off", GCC, "/cache") == []
+    assert lto_candidates("thin", GCC, "/cache")[0] == (["-flto=auto"], ["-flto=auto"])
+    assert lto_candidates("full", CLANG, "/cache") == [(["-flto"], ["-flto"])]
+    assert lto_candidates("full", MSVC, "/cache") == [(["/GL"], ["/LTCG"])]
+    assert lto_candidates("full", UNKNOWN, "/cache") == []
+
+    with arch_platform("x86_64", "linux"):
+        assert lto_candidates("thin", CLANG, "/cache")[0] == (
+            ["-flto=thin"],
+            ["-flto=thin", "-Wl,--thinlto-cache-dir=/cache"],
+        )
+    with arch_platform("arm64", "darwin"):
+        assert lto_candidates("thin", CLANG, "/cache")[0] == (
+            ["-flto=thin"],
+            ["-flto=thin", "-Wl,-cache_path_lto,/cache"],
+        )
+
+
+def test_invalid_lto():
+    with pytest.raises(ValueError):
+        Config(lto="partial")
+
+
+def test_resolve_lto(tmp_path):
+    cache = str(tmp_path / "lto")
+    cls = SimpleNamespace(app=App())
+
+    with patch("hatch_cython.config.config.compiler_family", lambda _: CLANG):
+        with patch("hatch_cython.config.config.supports_flags", lambda *_, **__: True):
+            with arch_platform("x86_64", "linux"):
+                cfg = Config(lto="thin", compile_args=["-O2"], extra_link_args=[])
+                cfg.resolve_lto(cls, cache)
+                assert sorted(cfg.compile_args_for_platform) == ["-O2", "-flto=thin"]
+                assert sorted(cfg.compile_links_for_platform) == ["-Wl,--thinlto-cache-dir=" + cache, "-flto=thin"]
+
+    with patch("hatch_cython.config.config.compiler_family", lambda _: GCC):
+        with patch("hatch_cython.config.config.supports_flags", lambda *_, **__: False):
+            cfg = Config(lto="full", compile_args=["-O2"], extra_link_args=[])
+            cfg.resolve_lto(cls, cache)
+            assert cfg.compile_args_for_platform == ["-O2"]
+            assert len(cls.app.warnings) == 1
@@ -0,0 +1,76 @@
+import ast
+import os
+import sys
+from unittest.mock import patch
+
+import pytest
+
+from hatch_cython.config import Config
+from hatch_cython.config.multiversion import MultiversionArgs
+from hatch_cython.loader import loader_py
+from hatch_cython.temp import setup_py
+
+from .utils import arch_platform
+
+MODULES = ["pkg.__init__", "pkg.a", "pkg.kernels.b"]
+
+
+def test_multiversion_variants():
+    mv = MultiversionArgs(levels=["x86-64-v2", "x86-64-v4", "x86-64-v3"], targets=["pkg.kernels.*"])
+    assert mv.levels == ["x86-64-v4", "x86-64-v3", "x86-64-v2"]
+
+    with arch_platform("x86_64", "linux"):
+        assert mv.enabled
+        assert mv.variants(MODULES) == {
+            "pkg.kernels.b": [
+                ("x86-64-v4", "pkg.kernels.b__x86_64_v4"),
+                ("x86-64-v3", "pkg.kernels.b__x86_64_v3"),
+                ("x86-64-v2", "pkg.kernels.b__x86_64_v2"),
+            ]
+        }
+        assert list(MultiversionArgs(levels=["x86-64-v3"]).variants(MODULES)) == ["pkg.a", "pkg.kernels.b"]
+        assert not MultiversionArgs().enabled
+
+    with arch_platform("arm64", "linux"):
+        assert mv.variants(MODULES) == {}
+    with arch_platform("x86_64", "windows"):
+        assert mv.variants(MODULES) == {}
+
+
+def test_multiversion_invalid_level():
+    with pytest.raises(ValueError):
+        MultiversionArgs(levels=["native"])
+
+
+def test_multiversion_setup():
+    setup = setup_py(
+        {"name": "pkg.a", "files": ["./pkg/a.pyx"]},
+        options=Config(compile_args=["-O2", "-march=x86-64"]),
+        sdist=False,
+        variants={"pkg.a": [("x86-64-v3", "pkg.a__x86_64_v3")]},
+        variant_dir="/cache/build/isa",
+    )
+    ast.parse(setup)
+    assert "VARIANTS = {'pkg.a': [('x86-64-v3', 'pkg.a__x86_64_v3')]}" in setup
+    assert "variant_dir = '/cache/build/isa' or" in setup
+    assert "filecmp.cmp(source, copied, shallow=False)" in setup
+
+
+def test_multiversion_loader_dispatch():
+    source = loader_py({}, {"pkg.a": [("x86-64-v3", "pkg.a__x86_64_v3")]})
+    namespace = {"__file__": "/site-packages/_hatch_cython_pkg.py"}
+    meta_path = list(sys.meta_path)
+    try:
+        exec(compile(source, "_hatch_cython_pkg.py", "exec"), namespace)  # noqa: S102
+    finally:
+        sys.meta_path[:] = meta_path
+
+    supported = namespace["_supported"]
+    with patch.dict(os.environ, {"HATCH_CYTHON_ISA": "x86-64-v3"}):
+        assert supported("x86-64-v2")
+        assert supported("x86-64-v3")
+        assert not supported("x86-64-v4")
+    with patch.dict(os.environ, {"HATCH_CYTHON_ISA": "baseline"}):
+        assert not supported("x86-64-v2")
+    # nothing is built, so the default import machinery takes over
+    assert namespace["HatchCythonFinder"].find_spec("pkg.a") is None
@@ -0,0 +1,42 @@
+import os
+from importlib.machinery import EXTENSION_SUFFIXES
+from types import SimpleNamespace
+
+from hatch_cython.config.files import ONLY_ENV, FileArgs
+from hatch_cython.plugin import CythonBuildHook
+
+from .utils import override_dir
+
+
+def test_select(monkeypatch):
+    modules = ["pkg.kernels.a", "pkg.kernels.b", "pkg.io"]
+    assert FileArgs().select(modules) is None
+    assert FileArgs(only=["pkg.kernels.*"]).select(modules) == {"pkg.kernels.a", "pkg.kernels.b"}
+    monkeypatch.setenv(ONLY_ENV, "pkg.io, pkg.kernels.b")
+    assert FileArgs(only=["pkg.kernels.*"]).select(modules) == {"pkg.io", "pkg.kernels.b"}
+
+
+def test_select_only(tmp_path, monkeypatch):
+    pkg = tmp_path / "src" / "spk"
+    pkg.mkdir(parents=True)
+    for f in ("__init__.py", "a.py", "b.py", "c.py"):
+        (pkg / f).write_text("x = 1\n")
+    suffix = EXTENSION_SUFFIXES[0]
+    (pkg / f"__init__{suffix}").write_text("")
+    (pkg / f"b{suffix}").write_text("")
+    # built before its source changed
+    os.utime(pkg / f"b{suffix}", (0, 0))
+    monkeypatch.setenv(ONLY_ENV, "spk.a")
+    with override_dir(tmp_path):
+        hook = CythonBuildHook(
+            str(tmp_path),
+            {"options": {}},
+            {},
+            SimpleNamespace(name="spk"),
+            directory=str(tmp_path / "dist"),
+            target_name="wheel",
+        )
+        assert hook.built_extension("spk.__init__") == f"./src/spk/__init__{suffix}"
+        hook.select_only()
+    # the modules never built are compiled as well, so the wheel is complete
+    assert hook.only == {"spk.a", "spk.c"}
@@ -0,0 +1,72 @@
+import ast
+from textwrap import dedent
+from types import SimpleNamespace
+
+from toml import loads
+
+from hatch_cython.config import parse_from_dict
+from hatch_cython.temp import setup_py
+
+from .utils import arch_platform, patch_path
+
+
+def getcfg():
+    data = """
+    [options]
+    compile_args = ["-Wcpp"]
+    define_macros = [["NDEBUG"], ["LEVEL", "1"]]
+    directives = { boundscheck = true }
+
+    [[options.overrides]]
+    matches = "*/kernels/*"
+    compile_args = ["-O3", "-ffast-math"]
+    define_macros = [["LEVEL", "3"]]
+    directives = { boundscheck = false, wraparound = false, cdivision = true }
+
+    [[options.overrides]]
+    matches = "*/kernels/simd*"
+    platforms = ["darwin"]
+    compile_args = ["-mcpu=apple-m1"]
+    """
+    return parse_from_dict(SimpleNamespace(config=loads(dedent(data))))
+
+
+def test_overrides():
+    kernel = {"name": "pkg.kernels.simd", "files": ["./src/pkg/kernels/simd.pyx"]}
+    plain = {"name": "pkg.plain", "files": ["./src/pkg/plain.py"]}
+
+    with arch_platform("x86_64", "linux"), patch_path("x86_64"):
+        cfg = getcfg()
+        assert cfg.extension_args(plain) == plain
+
+        ext = cfg.extension_args(kernel)
+        assert sorted(ext["extra_compile_args"]) == sorted(["-O3", "-ffast-math", "-Wcpp", "-I/usr/local/include"])
+        assert sorted(ext["extra_link_args"]) == sorted(["-L/usr/local/lib", "-L/usr/local/opt"])
+        assert ext["define_macros"] == [("NDEBUG", None), ("LEVEL", "3")]
+        assert ext["directives"] == {
+            "binding": True,
+            "language_level": 3,
+            "boundscheck": False,
+            "wraparound": False,
+            "cdivision": True,
+        }
+
+    with arch_platform("arm64", "darwin"), patch_path("arm64"):
+        cfg = getcfg()
+        ext = cfg.extension_args(kernel)
+        assert sorted(ext["extra_compile_args"]) == sorted(
+            ["-O3", "-ffast-math", "-Wcpp", "-I/opt/homebrew/include", "-mcpu=apple-m1"]
+        )
+
+
+def test_overrides_setup():
+    with arch_platform("x86_64", "linux"), patch_path("x86_64"):
+        cfg = getcfg()
+        exts = [
+            cfg.extension_args({"name": "pkg.kernels.a", "files": ["./src/pkg/kernels/a.pyx"]}),
+            cfg.extension_args({"name": "pkg.plain", "files": ["./src/pkg/plain.py"]}),
+        ]
+        setup = setup_py(*exts, options=cfg, sdist=False)
+    ast.parse(setup)
+    assert "DIRECTIVES = {'pkg.kernels.a': {" in setup
+    assert "compiler_directives=group," in setup
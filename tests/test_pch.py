@@ -0,0 +1,81 @@
+import ast
+import os
+import shutil
+import subprocess
+import sysconfig
+
+import pytest
+
+from hatch_cython.config import Config
+from hatch_cython.config.pch import parse_pch
+from hatch_cython.config.toolchain import CLANG, GCC, compiler_family
+from hatch_cython.pch import PCH_HEADER, Precompiled, read_depfile, up_to_date
+from hatch_cython.temp import setup_py
+
+CC = shutil.which("cc") or shutil.which("gcc")
+
+
+def test_parse_pch():
+    assert not parse_pch(False).enabled
+    pch = parse_pch({"headers": ["numpy/arrayobject.h"], "cxx_headers": ["arrow/python/pyarrow.h"]})
+    assert pch.for_language("c") == ["Python.h", "numpy/arrayobject.h"]
+    assert pch.for_language("c++") == ["Python.h", "numpy/arrayobject.h", "arrow/python/pyarrow.h"]
+    assert parse_pch(["Python.h"]).for_language("c") == ["Python.h"]
+    with pytest.raises(ValueError, match="as they are included"):
+        parse_pch({"headers": ["<numpy/arrayobject.h>"]})
+
+
+def test_depfile(tmp_path):
+    header = tmp_path / "a b.h"
+    header.write_text("")
+    depfile = tmp_path / "pch.d"
+    depfile.write_text(f"pch.gch: {str(header).replace(' ', chr(92) + ' ')} \\\n /usr/include/stdio.h\n")
+    assert read_depfile(str(depfile)) == [str(header), "/usr/include/stdio.h"]
+
+    depfile.write_text(f"pch.gch: {str(header).replace(' ', chr(92) + ' ')}\n")
+    pch = tmp_path / "pch.gch"
+    pch.write_text("")
+    assert up_to_date(str(pch), str(depfile))
+    os.utime(header, (os.path.getmtime(pch) + 10,) * 2)
+    assert not up_to_date(str(pch), str(depfile))
+
+
+def test_pch_setup():
+    code = setup_py(
+        {"name": "a", "files": ["a.pyx"]},
+        options=Config(),
+        sdist=False,
+        pch=({"c": ["Python.h"], "c++": ["Python.h"]}, "/cache/pch"),
+    )
+    ast.parse(code)
+    assert "precompile({'c': ['Python.h'], 'c++': ['Python.h']}, '/cache/pch')" in code
+
+
+@pytest.mark.skipif(CC is None or compiler_family([CC]) not in (GCC, CLANG), reason="requires gcc or clang")
+def test_precompiled(tmp_path):
+    (tmp_path / "inc").mkdir()
+    (tmp_path / "inc" / "answer.h").write_text("#define ANSWER 42\n")
+    args = [f"-I{sysconfig.get_paths()['include']}", f"-I{tmp_path / 'inc'}", "-fPIC"]
+    headers = {"c": ["Python.h", "answer.h"], "c++": []}
+
+    precompiled = Precompiled(headers, str(tmp_path / "pch"))
+    header = precompiled.header([CC], args, "c")
+    assert header is not None
+    assert {f"{PCH_HEADER}.gch", f"{PCH_HEADER}.pch"} & set(os.listdir(os.path.dirname(header)))
+    # once per build for the same compiler & arguments, another for other arguments
+    assert precompiled.header([CC], args, "c") == header
+    assert precompiled.header([CC], [*args, "-O2"], "c") not in (header, None)
+    # nothing to precompile
+    assert precompiled.header([CC], args, "c++") is None
+    # kept for the next build while its headers are unchanged
+    assert Precompiled(headers, str(tmp_path / "pch")).header([CC], args, "c") == header
+
+    src = tmp_path / "unit.c"
+    src.write_text('#include "Python.h"\nint answer(void) { return ANSWER; }\n')
+    obj = str(tmp_path / "unit.o")
+    command = [CC, "-include", header, "-Winvalid-pch", "-Werror", *args, "-c", str(src), "-o", obj]
+    assert subprocess.run(command, capture_output=True, check=False).returncode == 0  # noqa: S603
+
+    # headers that cannot be precompiled leave units compiled as they are
+    failing = Precompiled({"c": ["Python.h", "missing.h"]}, str(tmp_path / "pch"))
+    assert failing.header([CC], args, "c") is None
@@ -0,0 +1,74 @@
+import json
+import os
+import sys
+from importlib.machinery import EXTENSION_SUFFIXES
+from types import SimpleNamespace
+
+from hatch_cython.plugin import CythonBuildHook
+from hatch_cython.reports.plan import CACHED, EXCLUDED, REBUILD, format_plan, read_manifest, write_manifest
+
+from .utils import override_dir
+
+
+def test_manifest(tmp_path):
+    cache = str(tmp_path / "cache")
+    assert read_manifest(cache) == {"extensions": {}}
+    write_manifest(cache, {"a": "1", "b": "1"})
+    write_manifest(cache, {"b": "2"})
+    assert read_manifest(cache)["extensions"] == {"a": "1", "b": "2"}
+    # records of another Cython version are dropped
+    manifest = read_manifest(cache)
+    (tmp_path / "cache" / "manifest.json").write_text(json.dumps({**manifest, "cython": "0.29"}))
+    write_manifest(cache, {"b": "3"})
+    assert read_manifest(cache)["extensions"] == {"b": "3"}
+
+
+def test_plan(tmp_path):
+    pkg = tmp_path / "src" / "spk"
+    pkg.mkdir(parents=True)
+    for f in ("__init__.py", "a.py", "b.pyx", "c.py", "d.py", "skipped.py"):
+        (pkg / f).write_text("x = 1\n")
+    (pkg / "b.pyx").write_text('include "defs.pxi"\n')
+    (pkg / "defs.pxi").write_text("DEF N = 1\n")
+    suffix = EXTENSION_SUFFIXES[0]
+    build_lib = tmp_path / ".hatch" / "cython" / "build" / sys.implementation.cache_tag / "lib" / "spk"
+    build_lib.mkdir(parents=True)
+    for module in ("__init__", "a", "b", "c"):
+        (pkg / f"{module}{suffix}").write_text("")
+        (build_lib / f"{module}{suffix}").write_text("")
+    # built before their sources, or dependencies, changed
+    os.utime(pkg / f"a{suffix}", (0, 0))
+    os.utime(pkg / f"b{suffix}", (1, 1))
+    for f in ("__init__.py", "b.pyx", "c.py"):
+        os.utime(pkg / f, (0, 0))
+
+    costs = tmp_path / ".hatch" / "cython" / "costs"
+    costs.mkdir(parents=True)
+    (costs / "costs.json").write_text(json.dumps({"extensions": [{"module": "spk.a", "total_seconds": 2.5}]}))
+
+    with override_dir(tmp_path):
+        hook = CythonBuildHook(
+            str(tmp_path),
+            {"options": {"files": {"exclude": ["*/skipped.py"]}}},
+            {},
+            SimpleNamespace(name="spk"),
+            directory=str(tmp_path / "dist"),
+            target_name="wheel",
+        )
+        digests = hook.extension_digests
+        write_manifest(hook.cache_dir, {**digests, "spk.c": "previous arguments"})
+        plans = {p.module: p for p in hook.plan()}
+        text = format_plan(list(plans.values()))
+        os.remove(build_lib / f"__init__{suffix}")
+        assert next(p for p in hook.plan() if p.module == "spk.__init__").reasons == ["not in the build cache"]
+
+    assert plans["spk.__init__"].state == CACHED
+    assert plans["spk.a"].state == REBUILD
+    assert plans["spk.a"].reasons == ["source changed: ./src/spk/a.py"]
+    assert plans["spk.a"].estimated_seconds == 2.5
+    assert plans["spk.b"].reasons == ["dependency changed: src/spk/defs.pxi"]
+    assert plans["spk.c"].reasons == ["arguments changed"]
+    assert plans["spk.d"].reasons == ["not built yet"]
+    assert plans["spk.skipped"].state == EXCLUDED
+    assert plans["spk.skipped"].reasons == ["excluded by files.exclude"]
+    assert "4/5 extensions to build, ~2.5s (3 without previous builds to estimate from)" in text
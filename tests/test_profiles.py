@@ -0,0 +1,89 @@
+import os
+from textwrap import dedent
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+from toml import loads
+
+from hatch_cython.config import parse_from_dict
+from hatch_cython.config.profiles import PROFILE_ENV, apply_profile
+
+from .utils import arch_platform, patch_path
+
+
+def getcfg(data: str):
+    return parse_from_dict(SimpleNamespace(config=loads(dedent(data))))
+
+
+CONFIG = """
+[options]
+profile = "fast"
+compile_args = ["-Wcpp"]
+define_macros = [["LEVEL", "1"]]
+directives = { boundscheck = true, embedsignature = true }
+
+[options.profiles.bench]
+compile_args = ["-O1"]
+directives = { profile = true }
+"""
+
+
+def test_profile_overlay():
+    options = {
+        "compile_args": ["-Wall"],
+        "directives": {"a": 1},
+        "src": "pkg",
+        "profiles": {"custom": {"compile_args": ["-O1"], "directives": {"b": 2}, "src": "other"}},
+    }
+    assert apply_profile(options) == {"compile_args": ["-Wall"], "directives": {"a": 1}, "src": "pkg"}
+    assert apply_profile({**options, "profile": "custom"}) == {
+        "compile_args": ["-Wall", "-O1"],
+        "directives": {"a": 1, "b": 2},
+        "src": "other",
+        "profile": "custom",
+    }
+    with pytest.raises(ValueError, match="'missing' is not defined"):
+        apply_profile({"profile": "missing"})
+
+
+def test_builtin_profiles():
+    with patch.dict(os.environ), arch_platform("x86_64", "linux"), patch_path("x86_64"):
+        os.environ.pop(PROFILE_ENV, None)
+        cfg = getcfg(CONFIG)
+        assert cfg.profile == "fast"
+        assert "-O3" in cfg.compile_args_for_platform
+        assert "-O2" not in cfg.compile_args_for_platform
+        assert "-Wcpp" in cfg.compile_args_for_platform
+        assert cfg.define_macros == [("LEVEL", "1"), ("NDEBUG", None)]
+        assert cfg.directives["boundscheck"] is False
+        assert cfg.directives["embedsignature"] is True
+
+        with patch.dict(os.environ, {PROFILE_ENV: "debug"}):
+            cfg = getcfg(CONFIG)
+        assert cfg.profile == "debug"
+        args = cfg.compile_args_for_platform
+        assert "-O0" in args
+        assert "-g" in args
+        assert "-UNDEBUG" in args
+        assert "/Od" not in args
+        assert cfg.directives["boundscheck"] is True
+
+        with patch.dict(os.environ, {PROFILE_ENV: "profile"}):
+            cfg = getcfg(CONFIG)
+        assert ("CYTHON_TRACE", "1") in cfg.define_macros
+        assert cfg.directives["linetrace"] is True
+
+        with patch.dict(os.environ, {PROFILE_ENV: "bench"}):
+            cfg = getcfg(CONFIG)
+        assert "-O1" in cfg.compile_args_for_platform
+        assert cfg.directives["profile"] is True
+        assert "profiles" not in cfg.compile_kwargs
+
+    with patch.dict(os.environ, {PROFILE_ENV: "debug"}), arch_platform("x86_64", "windows"):
+        args = getcfg(CONFIG).compile_args_for_platform
+    # /Od replaces the default -O2 rather than precede it, which msvc would apply last
+    assert "/Od" in args
+    assert "/Zi" in args
+    assert "-O2" not in args
+    assert "-O0" not in args
@@ -0,0 +1,83 @@
+import os
+import shutil
+import subprocess
+import threading
+
+import pytest
+
+from hatch_cython.config.remote import WORKERS_ENV, parse_address, parse_remote
+from hatch_cython.remote import Pool, Worker, probe, refused, remote_compile, strip_preprocessor
+
+CC = shutil.which("cc") or shutil.which("gcc")
+
+
+def test_remote_args(monkeypatch):
+    assert not parse_remote(False).enabled
+    assert parse_remote(["build1:4000", "build2"]).workers == ["build1:4000", "build2"]
+    assert parse_address("build2") == ("build2", 3632)
+    assert parse_address("[::1]:4000") == ("::1", 4000)
+    with pytest.raises(ValueError):
+        parse_remote({"workers": ["build1:port"]})
+    monkeypatch.setenv(WORKERS_ENV, "a:1, b:2,")
+    assert parse_remote({"workers": ["c:3"]}).addresses == ["a:1", "b:2"]
+
+
+def test_arguments():
+    args = ["-I/usr/include/python3", "-DNDEBUG", "-include", "config.h", "-isystem", "/opt", "-O3", "-fPIC", "-UX"]
+    assert strip_preprocessor(args) == ["-O3", "-fPIC"]
+    assert refused(["x86_64-linux-gnu-gcc-12", "-pthread"], ["-O3"]) is None
+    assert refused(["/usr/bin/clang++"], ["-O2"]) is None
+    assert "not allowed" in refused(["sh", "-c"], [])
+    assert "not allowed" in refused(["gcc"], ["-fplugin=/tmp/evil.so"])
+    assert "not allowed" in refused(["gcc"], ["-o", "/etc/passwd"])
+
+
+def test_pool():
+    pool = Pool([("a:1", 2), ("b:1", 1)])
+    assert [pool.acquire() for _ in range(3)] == ["a:1", "b:1", "a:1"]
+    pool.release("b:1")
+    assert pool.acquire() == "b:1"
+    pool.fail("a:1")
+    pool.fail("b:1")
+    assert pool.acquire() is None
+
+
+@pytest.fixture
+def worker():
+    server = Worker(("127.0.0.1", 0), 2)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server.address
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.skipif(CC is None, reason="requires a c compiler")
+def test_remote_compile(tmp_path, worker):
+    (tmp_path / "inc").mkdir()
+    (tmp_path / "inc" / "answer.h").write_text("#define ANSWER 42\n")
+    src = tmp_path / "unit.c"
+    src.write_text('#include "answer.h"\nint answer(void) { return ANSWER + OFFSET; }\n')
+    obj = str(tmp_path / "unit.o")
+
+    available, unavailable = probe([worker, "127.0.0.1:1"])
+    assert available == [(worker, 2)]
+    assert unavailable == {"127.0.0.1:1": "unreachable"}
+
+    # the worker sees neither the header nor the macros, which are applied by preprocessing locally
+    pool = Pool(available)
+    cc_args = [f"-I{tmp_path / 'inc'}", "-DOFFSET=1", "-c"]
+    assert remote_compile(pool, [CC, "-fPIC"], str(src), obj, cc_args=cc_args, extra_postargs=["-O2"], timeout=30)
+    symbols = subprocess.run(["nm", obj], capture_output=True, text=True, check=False).stdout  # noqa: S603, S607
+    assert "answer" in symbols or not shutil.which("nm")
+
+    # units the worker cannot build are left for the local compiler
+    os.remove(obj)
+    native = ["-march=native"]
+    assert not remote_compile(pool, [CC], str(src), obj, cc_args=cc_args, extra_postargs=native, timeout=30)
+    assert not remote_compile(pool, [CC], str(src), obj, cc_args=["-c"], extra_postargs=[], timeout=30)
+    assert not os.path.exists(obj)
+
+    pool = Pool([("127.0.0.1:1", 4)])
+    assert not remote_compile(pool, [CC], str(src), obj, cc_args=cc_args, extra_postargs=[], timeout=30)
+    assert pool.acquire() is None
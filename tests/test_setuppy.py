@@ -25,12 +25,12 @@ if __name__ == "__main__":
     exts = [
         Extension(  ex.get("name"),
                     ex.get("files"),
-                    extra_compile_args=['-O2'],
-                    extra_link_args=['-I/etc/abc/linka.h'],
+                    extra_compile_args=ex.get("extra_compile_args", ['-O2']),
+                    extra_link_args=ex.get("extra_link_args", ['-I/etc/abc/linka.h']),
                     include_dirs=INCLUDES,
                     libraries=['/abc'],
                     library_dirs=['/def'],
-                    define_macros=[],
+                    define_macros=ex.get("define_macros", []),
 
         ) for ex in EXTENSIONS
     ]
@@ -0,0 +1,89 @@
+import os
+from types import SimpleNamespace
+
+import pytest
+
+from hatch_cython.config.shards import (
+    SHARD_ENV,
+    ShardManifest,
+    assign,
+    estimate_costs,
+    export_shard,
+    merge_shards,
+    parse_shard,
+)
+from hatch_cython.plugin import CythonBuildHook
+
+from .utils import override_dir
+
+
+def test_parse_shard():
+    assert parse_shard(None) is None
+    shard = parse_shard("2/4")
+    assert (shard.index, shard.count, shard.name) == (2, 4, "shard-2-of-4")
+    for invalid in ("0/4", "5/4", "2", "a/b"):
+        with pytest.raises(ValueError):
+            parse_shard(invalid)
+
+
+def test_assign():
+    costs = {"a": 10.0, "b": 6.0, "c": 5.0, "d": 4.0, "e": 1.0}
+    assert assign(costs, 2) == [["a", "d"], ["b", "c", "e"]]
+    assert assign(dict(reversed(costs.items())), 2) == assign(costs, 2)
+    assert assign(costs, 6)[-1] == []
+
+    # unknown modules are estimated from their size, at the rate of the known ones
+    units = {"a": ["a"], "bundle": ["b", "c"]}
+    assert estimate_costs(units, {"a": 100, "b": 50, "c": 30}, {"a": 2.0}) == {"a": 2.0, "bundle": 1.6}
+    assert estimate_costs(units, {"a": 100, "b": 50, "c": 30}, {}) == {"a": 100, "bundle": 80}
+
+
+def export(tmp_path, index, modules, fingerprint="fp", count=2):
+    build_lib = tmp_path / f"lib{index}"
+    for module in modules:
+        (build_lib / "pkg").mkdir(parents=True, exist_ok=True)
+        (build_lib / "pkg" / f"{module}.so").write_text(module)
+    manifest = ShardManifest(index, count, fingerprint, "split", modules=[f"pkg.{m}" for m in modules])
+    export_shard(str(build_lib), str(tmp_path / "shards"), manifest)
+
+
+def test_merge_shards(tmp_path):
+    base = tmp_path / "src"
+    modules = ["pkg.a", "pkg.b", "pkg.c"]
+    export(tmp_path, 1, ["a", "b"])
+    with pytest.raises(ValueError, match="missing shards 2"):
+        merge_shards(str(tmp_path / "shards"), str(base), modules, "fp")
+
+    export(tmp_path, 2, ["c"], fingerprint="other")
+    with pytest.raises(ValueError, match="shards 2 were built from other sources"):
+        merge_shards(str(tmp_path / "shards"), str(base), modules, "fp")
+
+    export(tmp_path, 2, [])
+    with pytest.raises(ValueError, match=r"no shard built pkg\.c"):
+        merge_shards(str(tmp_path / "shards"), str(base), modules, "fp")
+
+    export(tmp_path, 2, ["c"])
+    copied = merge_shards(str(tmp_path / "shards"), str(base), modules, "fp")
+    assert sorted(os.path.relpath(f, base) for f in copied) == [os.path.join("pkg", f"{m}.so") for m in "abc"]
+    assert (base / "pkg" / "c.so").read_text() == "c"
+
+
+def test_hook_shards(tmp_path, monkeypatch):
+    pkg = tmp_path / "src" / "spk"
+    pkg.mkdir(parents=True)
+    for i, f in enumerate(("__init__.py", "a.py", "b.py", "c.pyx", "d.pyx")):
+        (pkg / f).write_text("x = 1\n" * (i + 1) * 10)
+    monkeypatch.setenv(SHARD_ENV, "1/2")
+    with override_dir(tmp_path):
+        hook = CythonBuildHook(
+            str(tmp_path),
+            {"options": {"bundles": {"groups": [{"name": "spk._ab", "matches": ["spk.a", "spk.b"]}]}}},
+            {},
+            SimpleNamespace(name="spk"),
+            directory=str(tmp_path / "dist"),
+            target_name="wheel",
+        )
+        shards = hook.shards
+    assert sorted(m for shard in shards for m in shard) == ["spk.__init__", "spk.a", "spk.b", "spk.c", "spk.d"]
+    # bundle members are built together
+    assert any({"spk.a", "spk.b"} <= set(shard) for shard in shards)
@@ -0,0 +1,61 @@
+import ast
+import os
+from glob import glob
+from os import path
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+from Cython import __version__ as cython_version
+from packaging.version import Version
+
+from hatch_cython.config import Config
+from hatch_cython.temp import setup_py
+
+from .utils import App, build_project, run_python
+
+
+def test_resolve_shared_utility(tmp_path):
+    cls = SimpleNamespace(app=App())
+    cache = str(tmp_path / "shared")
+
+    assert Config().resolve_shared_utility(cls, "pkg", cache) is None
+
+    with patch("hatch_cython.config.config.__cythonversion__", "3.1.0"):
+        assert Config(shared_utility=True).resolve_shared_utility(cls, "pkg", cache) == (
+            "pkg._cyutility",
+            path.join(cache, "_cyutility.c"),
+        )
+        assert Config(shared_utility="pkg.utils._shared").resolve_shared_utility(cls, "pkg", cache) == (
+            "pkg.utils._shared",
+            path.join(cache, "_shared.c"),
+        )
+
+    with patch("hatch_cython.config.config.__cythonversion__", "3.0.11"):
+        assert Config(shared_utility=True).resolve_shared_utility(cls, "pkg", cache) is None
+        assert len(cls.app.warnings) == 1
+
+
+def test_shared_utility_setup():
+    setup = setup_py(
+        {"name": "pkg.a", "files": ["./pkg/a.pyx"]},
+        options=Config(cythonize_kwargs={"nthreads": 2}),
+        sdist=False,
+        shared_utility=("pkg._cyutility", "/cache/_cyutility.c"),
+    )
+    ast.parse(setup)
+    assert "Extension(  'pkg._cyutility',\n                    ['/cache/_cyutility.c']," in setup
+    assert "shared_utility_qualified_name='pkg._cyutility'" in setup
+    assert "nthreads=2" in setup
+
+
+@pytest.mark.skipif(Version(cython_version) < Version("3.1"), reason="requires Cython >= 3.1")
+def test_shared_utility_build(tmp_path):
+    # generators & memoryviews are utility code Cython shares
+    source = "def squares(double[:] values):\n    return list(v * v for v in values)\n"
+    build_project(tmp_path, {"a.pyx": source, "b.pyx": source}, {"shared_utility": True})
+    package = tmp_path / "src" / "spk"
+    modules = sorted(os.path.basename(f).split(".")[0] for f in glob(str(package / "*.so")))
+    assert modules == ["__init__", "_cyutility", "a", "b"]
+    code = "import array, spk.a, spk.b; v = array.array('d', [2]); print(spk.a.squares(v), spk.b.squares(v))"
+    assert run_python(code, str(tmp_path / "src")) == "[4.0] [4.0]"
@@ -0,0 +1,81 @@
+from importlib.machinery import EXTENSION_SUFFIXES
+
+import pytest
+
+from hatch_cython.speedups import (
+    FASTER,
+    SLOWER,
+    UNCHANGED,
+    Benchmark,
+    ModuleSpeedup,
+    bootstrap,
+    main,
+    measure,
+    parse_benchmark,
+    read_speedups,
+    run_job,
+)
+
+
+def test_parse_benchmark():
+    assert parse_benchmark("pkg.mod:bench") == Benchmark(target="pkg.mod:bench", module="pkg.mod")
+    assert parse_benchmark("pkg.io=benchmarks.io:Suite.run") == Benchmark(
+        target="benchmarks.io:Suite.run", module="pkg.io"
+    )
+    with pytest.raises(ValueError):
+        parse_benchmark("pkg.mod")
+
+
+def test_bootstrap():
+    pure = [2.0 + 0.01 * i for i in range(20)]
+    compiled = [1.0 + 0.01 * i for i in range(20)]
+    speedup, low, high = bootstrap([(pure, compiled)])
+    assert low < speedup < high
+    assert 1 < low
+    assert bootstrap([(pure, compiled)]) == (speedup, low, high)
+    assert bootstrap([(compiled, compiled)])[0] == 1.0
+
+    assert ModuleSpeedup("m", 2.0, 1.5, 2.5).verdict == FASTER
+    assert ModuleSpeedup("m", 0.5, 0.4, 0.6).verdict == SLOWER
+    assert ModuleSpeedup("m", 1.0, 0.9, 1.1).verdict == UNCHANGED
+
+
+def write_package(tmp_path):
+    pkg = tmp_path / "src" / "spk"
+    pkg.mkdir(parents=True)
+    (pkg / "__init__.py").write_text("")
+    (pkg / "loops.py").write_text("def bench():\n    return sum(range(100))\n")
+    return str(tmp_path / "src")
+
+
+def test_measure_pure_sources(tmp_path):
+    src = write_package(tmp_path)
+    measurements = measure([parse_benchmark("spk.loops:bench")], path=[src], processes=2, rounds=3, number=10)
+    assert len(measurements) == 1
+    m = measurements[0]
+    assert m.module == "spk.loops"
+    assert len(m.pure) == len(m.compiled) == 6
+    # nothing was built, so the compiled runs imported the sources too
+    assert not m.loaded
+
+    out = tmp_path / "speedups.json"
+    results = main(["spk.loops:bench", "--path", src, "--processes", "1", "--rounds", "3", "--output", str(out)])
+    assert [r.module for r in results] == ["spk.loops"]
+    assert read_speedups(str(out)) == results
+
+
+def test_pure_ignores_extensions(tmp_path):
+    src = write_package(tmp_path)
+    # a broken extension next to the source: only the pure runs can import the module
+    (tmp_path / "src" / "spk" / f"loops{EXTENSION_SUFFIXES[0]}").write_bytes(b"not an extension")
+    job = {
+        "benchmarks": [{"target": "spk.loops:bench", "module": "spk.loops"}],
+        "packages": ["spk"],
+        "rounds": 1,
+        "warmup": 0,
+        "number": 1,
+        "min_time": 0.01,
+    }
+    assert run_job({**job, "pure": True}, path=[src])[0]["compiled"] is False
+    with pytest.raises(Exception, match="compiled benchmark run failed"):
+        run_job({**job, "pure": False}, path=[src])
@@ -0,0 +1,67 @@
+from types import SimpleNamespace
+
+import pytest
+
+from hatch_cython.config import parse_from_dict
+from hatch_cython.config.tiers import COLD, DEFAULT, HOT, TierArgs, parse_tiers
+
+from .utils import arch_platform, patch_path
+
+
+def getcfg():
+    config = {
+        "options": {
+            "tiers": {
+                "hot": ["pkg.kernels.*"],
+                "cold": ["pkg.cli"],
+                "hot_args": ["-O3", {"arg": "-funroll-loops", "platforms": ["linux"]}],
+            },
+            "overrides": [{"matches": "*/kernels/debug*", "compile_args": ["-O0"]}],
+        }
+    }
+    return parse_from_dict(SimpleNamespace(config=config))
+
+
+def test_tier_args():
+    assert not parse_tiers(False).enabled
+    assert parse_tiers({"hot": ["pkg.*"]}).enabled
+    assert parse_tiers({"profile": "prod.txt"}).format == "collapsed"
+    with pytest.raises(ValueError):
+        parse_tiers({"coverage": 0})
+
+
+def test_tier():
+    tiers = TierArgs(enabled=True, hot=["pkg.kernels.*"], cold=["pkg.cli"])
+    assert tiers.tier("pkg.kernels.simd") == (HOT, "listed")
+    assert tiers.tier("pkg.cli") == (COLD, "listed")
+    assert tiers.tier("pkg.other") == (DEFAULT, "not listed")
+
+    profiled = TierArgs(enabled=True, profile="prod.pstats", coverage=0.8, cold=["pkg.io"])
+    profiled.use_profile({"pkg.parse": 8.0, "pkg.io": 1.0, "pkg.util": 1.0})
+    assert profiled.tier("pkg.parse") == (HOT, "80.0% of profiled time")
+    assert profiled.tier("pkg.util") == (DEFAULT, "10.0% of profiled time")
+    assert profiled.tier("pkg.io") == (COLD, "listed")
+    assert profiled.tier("pkg.__init__") == (COLD, "not profiled")
+
+
+def test_tier_extension_args():
+    kernel = {"name": "pkg.kernels.simd", "files": ["./src/pkg/kernels/simd.pyx"]}
+    debug = {"name": "pkg.kernels.debug", "files": ["./src/pkg/kernels/debug.pyx"]}
+    cli = {"name": "pkg.cli", "files": ["./src/pkg/cli.py"]}
+    plain = {"name": "pkg.plain", "files": ["./src/pkg/plain.py"]}
+
+    with arch_platform("x86_64", "linux"), patch_path("x86_64"):
+        cfg = getcfg()
+        assert cfg.extension_args(plain) == plain
+        assert sorted(cfg.extension_args(kernel)["extra_compile_args"]) == sorted(
+            ["-O3", "-funroll-loops", "-I/usr/local/include"]
+        )
+        assert sorted(cfg.extension_args(cli)["extra_compile_args"]) == sorted(["-Os", "-I/usr/local/include"])
+        # overrides apply after the tier
+        assert sorted(cfg.extension_args(debug)["extra_compile_args"]) == sorted(
+            ["-O0", "-funroll-loops", "-I/usr/local/include"]
+        )
+
+    with arch_platform("x86_64", "windows"), patch_path("x86_64"):
+        cfg = getcfg()
+        assert "/O1" in cfg.extension_args(cli)["extra_compile_args"]
@@ -0,0 +1,48 @@
+import json
+import os
+
+from hatch_cython.reports.trace import Tracer
+
+
+def test_trace(tmp_path):
+    tracer = Tracer()
+    with tracer.span("discovery", files=2):
+        pass
+    tracer.extend_build(
+        [
+            {"kind": "cythonize", "module": None, "c_file": "/p/a.c", "start": 1.0, "seconds": 0.5, "pid": 1, "tid": 1},
+            {
+                "kind": "compile",
+                "module": "pkg.a",
+                "source": "/p/a.c",
+                "start": 2.0,
+                "seconds": 1.0,
+                "pid": 2,
+                "tid": 3,
+            },
+            {"kind": "build", "module": "pkg.a", "start": 2.0, "seconds": 1.5, "pid": 2, "tid": 3},
+            {"kind": "build", "module": "pkg.b", "start": 2.0, "seconds": 1.5, "pid": 2, "tid": 4},
+        ]
+    )
+    output = tmp_path / "out" / "trace.json"
+    tracer.write(str(output))
+
+    with open(output) as f:
+        events = json.load(f)["traceEvents"]
+    slices = [(e["name"], e["pid"], e["tid"]) for e in events if e["ph"] == "X"]
+    assert slices[0] == ("discovery", os.getpid(), slices[0][2])
+    assert slices[1:] == [("cythonize a.c", 1, 1), ("compile a.c", 2, 3), ("build pkg.a", 2, 3), ("build pkg.b", 2, 4)]
+    compile_event = next(e for e in events if e["name"] == "compile a.c")
+    assert compile_event["ts"] == 2_000_000
+    assert compile_event["dur"] == 1_000_000
+    assert compile_event["args"] == {"module": "pkg.a", "source": "/p/a.c"}
+
+    names = {(e["name"], e["pid"], e["tid"]): e["args"]["name"] for e in events if e["ph"] == "M"}
+    assert names[("process_name", os.getpid(), 0)] == "hatch-cython hook"
+    assert names[("process_name", 1, 0)] == "cythonize worker"
+    assert names[("process_name", 2, 0)] == "setup.py build_ext"
+    assert names[("thread_name", 2, 3)] == "build worker 1"
+    assert names[("thread_name", 2, 4)] == "build worker 2"
+
+    tracer.reset()
+    assert tracer.events == []
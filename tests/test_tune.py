@@ -0,0 +1,92 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from hatch_cython.plugin import CythonBuildHook
+from hatch_cython.speedups import parse_benchmark
+from hatch_cython.tune import Tuner, main, parse_directive, search_space, select
+
+from .utils import override_dir
+
+
+def test_search_space():
+    assert parse_directive("boundscheck") == {"boundscheck": [True, False]}
+    assert parse_directive("infer_types=True, none") == {"infer_types": [True, None]}
+    assert parse_directive("language_level=2,3") == {"language_level": [2, 3]}
+    space = search_space({**parse_directive("wraparound"), **parse_directive("boundscheck")})
+    assert space == [
+        {"boundscheck": True, "wraparound": True},
+        {"boundscheck": True, "wraparound": False},
+        {"boundscheck": False, "wraparound": True},
+        {"boundscheck": False, "wraparound": False},
+    ]
+
+
+def test_select():
+    benchmarks = [parse_benchmark("pkg.a:bench"), parse_benchmark("pkg.b:bench")]
+    baseline = {"pkg.a:bench": [2.0 + 0.01 * i for i in range(10)], "pkg.b:bench": [1.0 + 0.01 * i for i in range(10)]}
+    faster = {"pkg.a:bench": [1.0 + 0.01 * i for i in range(10)], "pkg.b:bench": baseline["pkg.b:bench"]}
+    fastest = {"pkg.a:bench": [0.5 + 0.01 * i for i in range(10)], "pkg.b:bench": baseline["pkg.b:bench"]}
+    variants = [({"cdivision": True}, faster), ({"boundscheck": False}, fastest)]
+    best = select(benchmarks, baseline, variants, modules=["pkg.a", "pkg.b"])
+    # pkg.b is not faster with any variant, so it keeps the configured directives
+    assert list(best) == ["pkg.a"]
+    assert best["pkg.a"]["directives"] == {"boundscheck": False}
+    assert best["pkg.a"]["low"] > 1
+
+
+def test_select_benchmark_elsewhere(tmp_path):
+    # benchmarks living outside the tuned module name the module they measure
+    benchmarks = [parse_benchmark("pkg.kernels=benchmarks.k:run")]
+    baseline = {"benchmarks.k:run": [2.0 + 0.01 * i for i in range(10)]}
+    faster = {"benchmarks.k:run": [1.0 + 0.01 * i for i in range(10)]}
+    best = select(benchmarks, baseline, [({"boundscheck": False}, faster)], modules=["pkg.*"])
+    assert list(best) == ["pkg.*"]
+    assert best["pkg.*"]["directives"] == {"boundscheck": False}
+    # else they measure the module of the callable, which is not tuned
+    assert select([parse_benchmark("benchmarks.k:run")], baseline, [({}, faster)], modules=["pkg.*"]) == {}
+    with pytest.raises(SystemExit):
+        main(["--root", str(tmp_path), "--module", "pkg.kernels", "--bench", "benchmarks.k:run", "--test", "true"])
+
+
+def write_project(tmp_path):
+    pkg = tmp_path / "src" / "spk"
+    pkg.mkdir(parents=True)
+    for f in ("__init__.py", "arr.pyx", "glue.py"):
+        (pkg / f).write_text("")
+    (tmp_path / "pyproject.toml").write_text(
+        '[project]\nname = "spk"\nversion = "0.1"\n\n'
+        "[tool.hatch.build.targets.wheel.hooks.cython.options]\n"
+        'directives = { boundscheck = true }\n'
+    )
+
+
+def test_variant_config(tmp_path):
+    write_project(tmp_path)
+    tuner = Tuner(str(tmp_path), ["spk.arr"])
+    assert tuner.config == {"options": {"directives": {"boundscheck": True}}}
+    config = tuner.variant_config({"boundscheck": False})
+    assert config["options"]["tuned"] is False
+    assert config["options"]["overrides"] == [
+        {"matches": ["./src/spk/arr(/__init__)?\\.*"], "directives": {"boundscheck": False}}
+    ]
+    assert "overrides" not in tuner.variant_config(None)["options"]
+    assert "tuned" not in tuner.config["options"]
+
+
+def test_tuned_overrides(tmp_path):
+    write_project(tmp_path)
+    (tmp_path / "cython-tuned.json").write_text(json.dumps({"directives": {"spk.arr": {"boundscheck": False}}}))
+    with override_dir(tmp_path):
+        hook = CythonBuildHook(
+            str(tmp_path),
+            {"options": {"tuned": True, "directives": {"boundscheck": True}}},
+            {},
+            SimpleNamespace(name="spk"),
+            directory=str(tmp_path / "dist"),
+            target_name="wheel",
+        )
+        extensions = {ex["name"]: ex for ex in hook.extensions}
+        assert extensions["spk.arr"]["directives"]["boundscheck"] is False
+        assert "directives" not in extensions["spk.glue"]
@@ -0,0 +1,78 @@
+import os
+import sys
+
+import pytest
+
+from hatch_cython.config import Config
+from hatch_cython.filewatch import Inotify, Polling, relevant, wait
+from hatch_cython.temp import setup_py
+from hatch_cython.watch import Watch
+
+
+def write_project(tmp_path):
+    pkg = tmp_path / "src" / "spk"
+    pkg.mkdir(parents=True)
+    (pkg / "__init__.py").write_text("")
+    (pkg / "arr.pxd").write_text("cdef int f(int x)\n")
+    (pkg / "arr.pyx").write_text("cdef int f(int x):\n    return x\n")
+    (pkg / "use.pyx").write_text("from spk.arr cimport f\n")
+    (pkg / "other.py").write_text("")
+    (pkg / "gen.pyx.in").write_text("x = {{x}}\n")
+    (pkg / "gen.pyx").write_text("x = 1\n")
+    (tmp_path / "pyproject.toml").write_text('[project]\nname = "spk"\nversion = "0.1"\n')
+
+
+def test_relevant(tmp_path):
+    write_project(tmp_path)
+    pkg = tmp_path / "src" / "spk"
+    (pkg / "arr.c").write_text("/* Generated by Cython 3.0.0 */\n")
+    (pkg / "helper.c").write_text("int helper(void) { return 0; }\n")
+    assert relevant(str(pkg / "arr.pyx"))
+    assert relevant(str(pkg / "gen.pyx.in"))
+    assert relevant(str(tmp_path / "pyproject.toml"))
+    assert relevant(str(pkg / "helper.c"))
+    # written by the build
+    assert not relevant(str(pkg / "gen.pyx"))
+    assert not relevant(str(pkg / "arr.c"))
+    assert not relevant(str(pkg / "arr.cpython-311-x86_64-linux-gnu.so"))
+
+
+def test_affected(tmp_path):
+    write_project(tmp_path)
+    watch = Watch(str(tmp_path))
+    hook = watch.hook()
+    pkg = os.path.realpath(tmp_path / "src" / "spk")
+    assert watch.affected(hook, {os.path.join(pkg, "arr.pxd")}) == {"spk.arr", "spk.use"}
+    assert watch.affected(hook, {os.path.join(pkg, "use.pyx")}) == {"spk.use"}
+    assert watch.affected(hook, {os.path.join(pkg, "gen.pyx.in")}) == {"spk.gen"}
+    assert watch.affected(hook, {os.path.join(pkg, "unrelated.h")}) == set()
+    assert watch.affected(hook, {os.path.realpath(tmp_path / "pyproject.toml")}) is None
+
+
+@pytest.mark.parametrize("kind", ["polling", "inotify"])
+def test_watcher(tmp_path, kind):
+    if kind == "inotify" and not sys.platform.startswith("linux"):
+        pytest.skip("inotify is linux only")
+    write_project(tmp_path)
+    pkg = tmp_path / "src" / "spk"
+    paths = [(str(tmp_path), False), (str(pkg), True)]
+    watching = Polling(paths, interval=0.05) if kind == "polling" else Inotify(paths)
+    try:
+        (pkg / "arr.pyx").write_text("cdef int f(int x):\n    return x + 1\n")
+        (pkg / "gen.pyx").write_text("x = 2\n")
+        (pkg / "sub").mkdir()
+        (pkg / "sub" / "new.py").write_text("")
+        assert wait(watching, debounce=0.3) == {
+            os.path.realpath(pkg / "arr.pyx"),
+            os.path.realpath(pkg / "sub" / "new.py"),
+        }
+    finally:
+        watching.close()
+
+
+def test_atomic_setup_py():
+    ext = {"name": "abc.def", "files": ["./abc/def.pyx"]}
+    assert "InplaceBuildExt" not in setup_py(ext, options=Config(), sdist=False)
+    code = setup_py(ext, options=Config(), sdist=False, atomic=True)
+    assert 'cmdclass={"build_ext": InplaceBuildExt}' in code
+    compile(code, "setup.py", "exec")
@@ -1,9 +1,13 @@
 import os
-from contextlib import contextmanager
+import subprocess
+import sys
+from contextlib import ExitStack, contextmanager
 from types import SimpleNamespace
 from unittest.mock import patch
 
-from hatch_cython.types import UnionT
+from hatch_cython.plugin import CythonBuildHook
+from hatch_cython.types import DictT, UnionT
+from hatch_cython.utils import QuietApplication
 
 
 def true_if_eq(*vals):
@@ -20,6 +24,19 @@ true_x64_mac = true_if_eq("/usr/local/include", "/usr/local/lib", "/usr/local/op
 true_arm_mac = true_if_eq("/opt/homebrew/lib", "/opt/homebrew/include")
 
 
+class App:
+    """Records the warnings of the app resolving options"""
+
+    def __init__(self):
+        self.warnings = []
+
+    def display_info(self, *_):
+        pass
+
+    def display_warning(self, msg):
+        self.warnings.append(msg)
+
+
 @contextmanager
 def patch_path(arch: str, *extra: str):
     arches = {
@@ -41,6 +58,23 @@ def patch_brew(prefix):
         yield
 
 
+PLAT_PATCHED = (
+    "hatch_cython.utils",
+    "hatch_cython.config.defaults",
+    "hatch_cython.config.platform",
+    "hatch_cython.config.lto",
+    "hatch_cython.config.toolchain",
+    "hatch_cython.config.multiversion",
+    "hatch_cython.plugin",
+)
+AARCH_PATCHED = (
+    "hatch_cython.utils",
+    "hatch_cython.config.defaults",
+    "hatch_cython.config.platform",
+    "hatch_cython.config.multiversion",
+)
+
+
 @contextmanager
 def arch_platform(arch: str, platform: str, brew: UnionT[str, None] = True):
     def aarchgetter():
@@ -54,18 +88,16 @@ def arch_platform(arch: str, platform: str, brew: UnionT[str, None] = True):
         expect_brew = "/usr/local" if arch == "x86_64" else "/opt/homebrew"
 
     try:
-        with patch("hatch_cython.utils.plat", platformgetter):
-            with patch("hatch_cython.config.defaults.plat", platformgetter):
-                with patch("hatch_cython.config.platform.plat", platformgetter):
-                    with patch("hatch_cython.plugin.plat", platformgetter):
-                        with patch("hatch_cython.utils.aarch", aarchgetter):
-                            with patch("hatch_cython.config.defaults.aarch", aarchgetter):
-                                with patch("hatch_cython.config.platform.aarch", aarchgetter):
-                                    if brew:
-                                        with patch_brew(expect_brew):
-                                            yield
-                                    else:
-                                        yield
+        with ExitStack() as stack:
+            for mod in PLAT_PATCHED:
+                stack.enter_context(patch(f"{mod}.plat", platformgetter))
+            for mod in AARCH_PATCHED:
+                stack.enter_context(patch(f"{mod}.aarch", aarchgetter))
+            if brew:
+                with patch_brew(expect_brew):
+                    yield
+            else:
+                yield
     finally:
         print(f"Clean {arch}-{platform}")  # noqa: T201
         del aarchgetter, platformgetter
@@ -129,3 +161,26 @@ def override_env(d: dict):
     finally:
         for k, v in current.items():
             os.environ[k] = v
+
+
+def build_project(root, sources: DictT[str, str], options: dict) -> dict:
+    """Builds the `spk` package of `sources` in place with the hook, as hatchling's wheel build would
+
+    Returns:
+        dict: the build data
+    """
+    (root / "pyproject.toml").write_text('[project]\nname = "spk"\nversion = "0.1"\n')
+    for name, source in {"__init__.py": "", **sources}.items():
+        (root / "src" / "spk" / name).parent.mkdir(parents=True, exist_ok=True)
+        (root / "src" / "spk" / name).write_text(source)
+    hook = CythonBuildHook.for_project(str(root), config={"options": options}, app=QuietApplication())
+    build_data = {"artifacts": [], "force_include": {}}
+    with override_dir(root):
+        hook.initialize("standard", build_data)
+    return build_data
+
+
+def run_python(code: str, *path: str) -> str:
+    """The output of `code` run in a new interpreter importing from `path`"""
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(path)}
+    return subprocess.check_output([sys.executable, "-c", code], env=env, text=True).strip()  # noqa: S603